@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import CustomUser
+from django.utils import timezone
+from .models import AccountEmail, CustomUser, PendingSubscriber
 
 
 @admin.register(CustomUser)
@@ -18,4 +19,30 @@ class CustomUserAdmin(admin.ModelAdmin):
         ('Important dates', {
             'fields': ('last_login', 'date_joined')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(PendingSubscriber)
+class PendingSubscriberAdmin(admin.ModelAdmin):
+    list_display = ('email', 'list_id', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('email',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry']
+
+    @admin.action(description="Retry selected signups")
+    def retry(self, request, queryset):
+        queryset.update(status=PendingSubscriber.PENDING, attempts=0, run_after=timezone.now())
+
+
+@admin.register(AccountEmail)
+class AccountEmailAdmin(admin.ModelAdmin):
+    list_display = ('email', 'kind', 'status', 'attempts', 'run_after', 'created_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('email',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry']
+
+    @admin.action(description="Retry selected emails")
+    def retry(self, request, queryset):
+        queryset.update(status=AccountEmail.PENDING, attempts=0, run_after=timezone.now())
@@ -0,0 +1,53 @@
+"""
+JWT authentication without a user query per request.
+
+The token signature and expiry are checked as usual; the user is then read
+from the cache (shared Redis in production) instead of the database.
+Tokens carry a hash of the user's password (simplejwt's
+``CHECK_REVOKE_TOKEN``), which acts as the token version: a cached user is
+only returned while that hash still matches, so changing the password
+revokes every token issued before. Saving or deleting a user drops their
+cache entry (accounts.signals), so deactivation and password changes take
+effect on the next request; ``JWT_USER_CACHE_TIMEOUT`` bounds staleness
+from writes that skip signals, such as ``QuerySet.update()``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id):
+    return f"accounts:jwt-user:{user_id}"
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # The database path also checks is_active and the token version
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.JWT_USER_CACHE_TIMEOUT)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
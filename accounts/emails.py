@@ -0,0 +1,141 @@
+"""
+Account emails (verification, password reset), sent in the background.
+
+Views call ``enqueue_account_email`` with just the kind and the address, an
+insert that takes the same time whether or not the address belongs to an
+account, so neither SMTP latency nor account existence shows in the
+response. ``manage.py send_account_emails`` claims due emails, resolves
+each to its user, renders the message from ``accounts/emails/<kind>.txt``
+and sends the batch over a single SMTP connection, retrying failures with
+exponential backoff.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import AccountEmail
+
+logger = logging.getLogger(__name__)
+
+SUBJECTS = {
+    AccountEmail.VERIFY: "Verify your email - YourStore",
+    AccountEmail.PASSWORD_RESET: "Password Reset",
+}
+
+# Emails left sending this long are assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue_account_email(kind, email, request):
+    """Queue a ``kind`` email to ``email``; links point at the host of ``request``."""
+    AccountEmail.objects.create(kind=kind, email=email.strip(), base_url=request.build_absolute_uri("/").rstrip("/"))
+
+
+def verify_link(user, base_url):
+    return f"{base_url}{reverse('accounts:verify_email')}?token={AccessToken.for_user(user)}"
+
+
+def password_reset_link(user, base_url):
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    return base_url + reverse("accounts:password_reset_confirm", args=[uid, default_token_generator.make_token(user)])
+
+
+def build_message(email, user):
+    """The EmailMessage for ``email``, or None if there is nothing to send to ``user``."""
+    if email.kind == AccountEmail.VERIFY:
+        if user is None or user.is_active:
+            return None
+        link = verify_link(user, email.base_url)
+    else:
+        # Unknown addresses get nothing, same as before, but now the
+        # requester can't tell the difference from the response time
+        if user is None or not user.is_active:
+            return None
+        link = password_reset_link(user, email.base_url)
+    body = render_to_string(f"accounts/emails/{email.kind}.txt", {"user": user, "link": link})
+    return EmailMessage(SUBJECTS[email.kind], body, settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+def claim_emails(limit):
+    """Mark up to ``limit`` due emails as sending and return them."""
+    now = timezone.now()
+    AccountEmail.objects.filter(status=AccountEmail.SENDING, updated_at__lt=now - STALE_AFTER).update(
+        status=AccountEmail.PENDING,
+    )
+    with transaction.atomic():
+        emails = list(
+            AccountEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=AccountEmail.PENDING, run_after__lte=now)
+            .order_by("run_after")[:limit]
+        )
+        AccountEmail.objects.filter(pk__in=[e.pk for e in emails]).update(status=AccountEmail.SENDING, updated_at=now)
+    return emails
+
+
+def finish_email(email, status=AccountEmail.SENT, error=None):
+    """Record the outcome of an email, scheduling a retry on failure."""
+    if error is None:
+        email.status = status
+        email.last_error = ""
+        email.save(update_fields=["status", "last_error", "updated_at"])
+        return
+
+    email.attempts += 1
+    email.last_error = error
+    if email.attempts >= settings.ACCOUNT_EMAIL_MAX_ATTEMPTS:
+        email.status = AccountEmail.FAILED
+        logger.error("%s email to %s failed after %d attempts: %s", email.kind, email.email, email.attempts, error)
+    else:
+        email.status = AccountEmail.PENDING
+        email.run_after = timezone.now() + timedelta(seconds=settings.ACCOUNT_EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1))
+        logger.warning("%s email to %s failed (attempt %d), retrying: %s", email.kind, email.email, email.attempts, error)
+    email.save(update_fields=["status", "attempts", "last_error", "run_after", "updated_at"])
+
+
+def send_emails(emails, connection=None):
+    """Send ``emails`` over one connection; returns the number sent."""
+    User = get_user_model()
+    users = User.objects.in_bulk({email.email for email in emails}, field_name="email")
+    messages = []
+    for email in emails:
+        message = build_message(email, users.get(email.email))
+        if message is None:
+            finish_email(email, AccountEmail.SKIPPED)
+        else:
+            messages.append((email, message))
+    if not messages:
+        return 0
+
+    connection = connection or get_connection()
+    sent = 0
+    try:
+        connection.open()
+    except Exception as e:
+        for email, _message in messages:
+            finish_email(email, error=f"{type(e).__name__}: {e}")
+        return 0
+    try:
+        # One message per call so a failure is attributed to its email,
+        # while the connection stays open for the whole batch
+        for email, message in messages:
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                finish_email(email, error=f"{type(e).__name__}: {e}")
+            else:
+                finish_email(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.newsletter import BATCH_SIZE, flush_subscribers
+from accounts.utils.mailchimp import FakeClient, get_client
+
+
+class Command(BaseCommand):
+    help = "Send queued newsletter signups to Mailchimp in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=BATCH_SIZE * 4, help="Signups claimed at a time.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new signups.")
+        parser.add_argument("--sleep", type=float, default=10, help="Seconds between polls when idle.")
+        parser.add_argument("--fake", action="store_true", help="Use a fake client instead of Mailchimp (development).")
+
+    def handle(self, *args, **options):
+        client = FakeClient() if options["fake"] else get_client()
+        while True:
+            claimed, subscribed = flush_subscribers(client, options["limit"])
+            if claimed:
+                self.stdout.write(f"{subscribed}/{claimed} signup(s) subscribed")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
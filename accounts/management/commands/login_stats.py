@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.throttling import login_metrics
+
+
+class Command(BaseCommand):
+    help = "Show how many login attempts were checked against a password and how many were throttled."
+
+    def handle(self, *args, **options):
+        metrics = login_metrics()
+        total = sum(metrics.values())
+        for metric, count in metrics.items():
+            share = count / total * 100 if total else 0
+            self.stdout.write(f"{metric:<9} {count:10d} ({share:.1f}%)")
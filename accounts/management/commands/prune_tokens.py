@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from accounts.tokens import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired JWT outstanding and blacklisted tokens in batches. Schedule it daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows deleted per transaction.")
+        parser.add_argument("--vacuum", action="store_true", help="VACUUM ANALYZE the tables afterwards (PostgreSQL).")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(outstanding, blacklisted):
+            self.stdout.write(f"{outstanding} outstanding, {blacklisted} blacklisted token(s) deleted")
+
+        outstanding, blacklisted = prune_expired_tokens(options["batch_size"], on_batch=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {outstanding} outstanding and {blacklisted} blacklisted token(s) in {time.monotonic() - started:.1f}s"
+        ))
+
+        if options["vacuum"] and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                for model in (BlacklistedToken, OutstandingToken):
+                    cursor.execute(f"VACUUM ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.emails import claim_emails, send_emails
+
+
+class Command(BaseCommand):
+    help = "Send queued account emails (verification, password reset)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=100, help="Emails claimed and sent per connection.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new emails.")
+        parser.add_argument("--sleep", type=float, default=2, help="Seconds between polls when idle.")
+
+    def handle(self, *args, **options):
+        while True:
+            emails = claim_emails(options["batch"])
+            if emails:
+                started = time.monotonic()
+                sent = send_emails(emails)
+                self.stdout.write(f"{sent}/{len(emails)} email(s) sent in {time.monotonic() - started:.1f}s")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 23:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_pendingsubscriber'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('verify', 'Email verification'), ('password_reset', 'Password reset')], max_length=20)),
+                ('email', models.EmailField(max_length=254)),
+                ('base_url', models.URLField(help_text='Scheme and host of the request, for the links in the email.')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time the email may be sent (retry backoff).')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='accounts_ac_status_194e06_idx')],
+            },
+        ),
+    ]
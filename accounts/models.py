@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
+from django.utils import timezone
 from .managers import CustomUserManager
 from django.contrib.auth.models import Permission, Group
 
@@ -37,4 +38,82 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     objects = CustomUserManager()
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+
+class PendingSubscriber(models.Model):
+    """
+    A newsletter signup waiting to be added to the Mailchimp audience
+    (see accounts.newsletter). One row per email and list.
+    """
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SUBSCRIBED = "subscribed"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SUBSCRIBED, "Subscribed"),
+        (FAILED, "Failed"),
+    ]
+
+    email = models.EmailField()
+    list_id = models.CharField(max_length=50, help_text="Mailchimp audience ID.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Earliest time the signup may be sent (retry backoff).")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["email", "list_id"], name="unique_subscriber_per_list")]
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.email} ({self.status})"
+
+
+class AccountEmail(models.Model):
+    """
+    A queued account email (see accounts.emails). Only the kind and the
+    address are stored; the worker looks the user up and builds the link,
+    so queueing costs the same whether or not the account exists.
+    """
+
+    VERIFY = "verify"
+    PASSWORD_RESET = "password_reset"
+    KIND_CHOICES = [
+        (VERIFY, "Email verification"),
+        (PASSWORD_RESET, "Password reset"),
+    ]
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (SKIPPED, "Skipped"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    email = models.EmailField()
+    base_url = models.URLField(help_text="Scheme and host of the request, for the links in the email.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Earliest time the email may be sent (retry backoff).")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.email} ({self.status})"
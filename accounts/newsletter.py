@@ -0,0 +1,139 @@
+"""
+Newsletter signups, sent to Mailchimp in the background.
+
+``enqueue_subscriber`` only writes a PendingSubscriber row, so the signup
+request never waits on Mailchimp. ``manage.py flush_subscribers`` claims
+pending rows and adds them with ``lists.batch_list_members``, up to 500
+members per call (the API maximum). A failed call is retried with
+exponential backoff; an address Mailchimp rejects on its own is marked
+failed, and one that is already on the list counts as subscribed.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from shop.instrumentation import timed
+
+from .models import PendingSubscriber
+from .utils.mailchimp import is_client_error
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Rows left sending this long are assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=10)
+
+ALREADY_SUBSCRIBED = "ERROR_CONTACT_EXISTS"
+
+
+def enqueue_subscriber(email, list_id=None):
+    """
+    Queue ``email`` for the audience ``list_id``; returns the PendingSubscriber
+    and whether this call queued it. A signup that failed before is queued
+    again.
+    """
+    list_id = list_id or settings.MAILCHIMP_EMAIL_LIST_ID
+    subscriber, queued = PendingSubscriber.objects.get_or_create(email=email.strip().lower(), list_id=list_id)
+    if subscriber.status == PendingSubscriber.FAILED:
+        subscriber.status = PendingSubscriber.PENDING
+        subscriber.attempts = 0
+        subscriber.run_after = timezone.now()
+        subscriber.save(update_fields=["status", "attempts", "run_after", "updated_at"])
+        queued = True
+    return subscriber, queued
+
+
+def claim_subscribers(limit):
+    """Mark up to ``limit`` due signups as sending and return them."""
+    now = timezone.now()
+    PendingSubscriber.objects.filter(status=PendingSubscriber.SENDING, updated_at__lt=now - STALE_AFTER).update(
+        status=PendingSubscriber.PENDING,
+    )
+    with transaction.atomic():
+        subscribers = list(
+            PendingSubscriber.objects.select_for_update(skip_locked=True)
+            .filter(status=PendingSubscriber.PENDING, run_after__lte=now)
+            .order_by("run_after")[:limit]
+        )
+        PendingSubscriber.objects.filter(pk__in=[s.pk for s in subscribers]).update(
+            status=PendingSubscriber.SENDING, updated_at=now,
+        )
+    return subscribers
+
+
+def retry_later(subscribers, error):
+    """Put a batch back in the queue after a failed call, or give up on it."""
+    now = timezone.now()
+    for subscriber in subscribers:
+        subscriber.attempts += 1
+        subscriber.last_error = error
+        if subscriber.attempts >= settings.NEWSLETTER_MAX_ATTEMPTS:
+            subscriber.status = PendingSubscriber.FAILED
+        else:
+            subscriber.status = PendingSubscriber.PENDING
+            subscriber.run_after = now + timedelta(seconds=settings.NEWSLETTER_RETRY_DELAY * 2 ** (subscriber.attempts - 1))
+        subscriber.updated_at = now
+    PendingSubscriber.objects.bulk_update(subscribers, ["status", "attempts", "last_error", "run_after", "updated_at"])
+
+
+def send_batch(client, list_id, subscribers):
+    """Add ``subscribers`` (at most BATCH_SIZE) to ``list_id``; returns the number subscribed."""
+    try:
+        with timed("http"):
+            response = client.lists.batch_list_members(list_id, {
+                "members": [{"email_address": s.email, "status": "subscribed"} for s in subscribers],
+                "update_existing": False,
+            })
+    except Exception as e:
+        # Connection errors and timeouts escape the Mailchimp client as-is
+        if not (is_client_error(e) or isinstance(e, requests.RequestException)):
+            raise
+        error = getattr(e, "text", None) or str(e) or type(e).__name__
+        logger.warning("Mailchimp batch of %d for %s failed, retrying: %s", len(subscribers), list_id, error)
+        retry_later(subscribers, error)
+        return 0
+
+    errors = {
+        error["email_address"].lower(): error
+        for error in response.get("errors", [])
+        if error.get("error_code") != ALREADY_SUBSCRIBED
+    }
+    now = timezone.now()
+    rejected = [s for s in subscribers if s.email in errors]
+    for subscriber in rejected:
+        subscriber.status = PendingSubscriber.FAILED
+        subscriber.last_error = errors[subscriber.email].get("error", "")
+        subscriber.updated_at = now
+    PendingSubscriber.objects.bulk_update(rejected, ["status", "last_error", "updated_at"])
+    PendingSubscriber.objects.filter(pk__in=[s.pk for s in subscribers if s.email not in errors]).update(
+        status=PendingSubscriber.SUBSCRIBED, last_error="", updated_at=now,
+    )
+    return len(subscribers) - len(rejected)
+
+
+def flush_subscribers(client, limit=BATCH_SIZE * 4):
+    """Send up to ``limit`` due signups, one call per list and 500 members; returns (claimed, subscribed)."""
+    subscribers = claim_subscribers(limit)
+    by_list = defaultdict(list)
+    for subscriber in subscribers:
+        by_list[subscriber.list_id].append(subscriber)
+    batches = [
+        (list_id, members[start:start + BATCH_SIZE])
+        for list_id, members in by_list.items()
+        for start in range(0, len(members), BATCH_SIZE)
+    ]
+    subscribed = 0
+    for i, (list_id, batch) in enumerate(batches):
+        try:
+            subscribed += send_batch(client, list_id, batch)
+        except Exception as e:
+            # Don't leave this and the unsent batches claimed until STALE_AFTER
+            retry_later([s for _list_id, rest in batches[i:] for s in rest], f"{type(e).__name__}: {e}")
+            raise
+    return len(subscribers), subscribed
@@ -1,9 +1,19 @@
 from allauth.socialaccount.signals import social_account_added, social_account_updated, pre_social_login
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
+from .authentication import forget_user
+
 User = get_user_model()
 
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Password changes and deactivation must reach the cached API user."""
+    forget_user(instance.pk)
+
 @receiver(social_account_added)
 def handle_social_account_added(request, sociallogin, **kwargs):
     user = sociallogin.user
@@ -1,7 +1,28 @@
-from django.test import TestCase, Client
+import io
+from datetime import timedelta
+
+import requests
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from unittest.mock import patch, MagicMock
+from rest_framework.test import APIRequestFactory
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .authentication import CachedJWTAuthentication
+from .emails import claim_emails, send_emails
+from .models import AccountEmail, PendingSubscriber
+from .newsletter import enqueue_subscriber, flush_subscribers
+from .throttling import SlidingWindow, login_metrics
+from .utils.mailchimp import FakeClient
+from .tokens import prune_expired_tokens
 
 User = get_user_model()
 
@@ -144,3 +165,261 @@ class AllAuthConfigurationTest(TestCase):
             "Custom adapter should be configured"
         )
 
+
+class CachedJWTAuthenticationTest(TestCase):
+    """Test that API authentication reads the user from the cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="api@example.com", username="api", password="old-password")
+        self.auth = CachedJWTAuthentication()
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, token):
+        request = self.factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.auth.authenticate(request)
+
+    def test_cached_user_costs_no_queries(self):
+        """Only the first request loads the user from the database."""
+        token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(token)[0], self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(token)[0], self.user)
+
+    def test_password_change_revokes_tokens(self):
+        """Tokens issued before a password change are rejected."""
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        self.user.set_password("new-password")
+        self.user.save()
+        with self.assertRaisesMessage(Exception, "password has been changed"):
+            self.authenticate(token)
+        self.assertEqual(self.authenticate(AccessToken.for_user(self.user))[0], self.user)
+
+    def test_deactivation_takes_effect(self):
+        """A deactivated user's cached entry is dropped."""
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaisesMessage(Exception, "inactive"):
+            self.authenticate(token)
+
+
+class TokenLogoutTest(TestCase):
+    """Test the API logout endpoint and the pruning of expired tokens."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="out@example.com", username="out", password="password")
+
+    def test_logout_blacklists_refresh_token(self):
+        """A refresh token can't be used after logging out with it."""
+        refresh = str(RefreshToken.for_user(self.user))
+        response = self.client.post(reverse("accounts:token_logout"), {"refresh": refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+        response = self.client.post(reverse("accounts:token_refresh"), {"refresh": refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_prune_expired_tokens(self):
+        """Expired tokens and their blacklist entries are deleted in batches; live ones stay."""
+        now = timezone.now()
+        for i in range(5):
+            token = OutstandingToken.objects.create(user=self.user, jti=f"old-{i}", token="x", expires_at=now - timedelta(days=1))
+            if i % 2:
+                BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(user=self.user, jti="live", token="x", expires_at=now + timedelta(days=1))
+        batches = []
+        self.assertEqual(prune_expired_tokens(batch_size=2, on_batch=lambda *counts: batches.append(counts)), (5, 2))
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(list(OutstandingToken.objects.values_list("jti", flat=True)), ["live"])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+    def test_command(self):
+        OutstandingToken.objects.create(user=self.user, jti="old", token="x", expires_at=timezone.now() - timedelta(days=1))
+        out = io.StringIO()
+        call_command("prune_tokens", stdout=out)
+        self.assertIn("Pruned 1 outstanding", out.getvalue())
+
+
+@override_settings(MAILCHIMP_EMAIL_LIST_ID="list1", NEWSLETTER_MAX_ATTEMPTS=2, NEWSLETTER_RETRY_DELAY=0)
+class NewsletterQueueTest(TestCase):
+    """Test that newsletter signups are queued and sent to Mailchimp in batches."""
+
+    def test_subscribe_view_only_queues(self):
+        """The view writes a pending row and returns without calling Mailchimp."""
+        with patch("accounts.utils.mailchimp.get_client") as get_client:
+            response = self.client.post(reverse("accounts:newsletter_subscribe"), {"email": "Reader@Example.com "})
+        self.assertRedirects(response, reverse("accounts:mailchimp_confirm"), fetch_redirect_response=False)
+        get_client.assert_not_called()
+        self.assertEqual(PendingSubscriber.objects.get().email, "reader@example.com")
+
+        response = self.client.post(reverse("accounts:newsletter_subscribe"), {"email": "reader@example.com"})
+        self.assertEqual(response.context["reason"], "pending")
+        self.assertEqual(PendingSubscriber.objects.count(), 1)
+
+    def test_flush_in_batches_of_500(self):
+        """Signups are sent 500 per call; existing members count as subscribed."""
+        PendingSubscriber.objects.bulk_create(
+            [PendingSubscriber(email=f"user{i}@example.com", list_id="list1") for i in range(1200)]
+        )
+        client = FakeClient(existing={"user3@example.com"}, invalid={"user7@example.com"})
+        self.assertEqual(flush_subscribers(client, limit=2000), (1200, 1199))
+        self.assertEqual([len(emails) for _list_id, emails in client.calls], [500, 500, 200])
+        self.assertEqual(PendingSubscriber.objects.filter(status=PendingSubscriber.SUBSCRIBED).count(), 1199)
+        failed = PendingSubscriber.objects.get(status=PendingSubscriber.FAILED)
+        self.assertEqual(failed.email, "user7@example.com")
+        self.assertIn("invalid", failed.last_error)
+        self.assertEqual(flush_subscribers(client), (0, 0))
+
+    def test_failed_call_retried_then_given_up(self):
+        """A failing call is retried with backoff until NEWSLETTER_MAX_ATTEMPTS."""
+        enqueue_subscriber("retry@example.com")
+        client = FakeClient(fail_calls=1)
+        with self.assertLogs("accounts.newsletter", "WARNING"):
+            self.assertEqual(flush_subscribers(client), (1, 0))
+        subscriber = PendingSubscriber.objects.get()
+        self.assertEqual((subscriber.status, subscriber.attempts), (PendingSubscriber.PENDING, 1))
+        self.assertEqual(flush_subscribers(client), (1, 1))
+        self.assertEqual(PendingSubscriber.objects.get().status, PendingSubscriber.SUBSCRIBED)
+
+        enqueue_subscriber("down@example.com")
+        client = FakeClient(fail_calls=2)
+        with self.assertLogs("accounts.newsletter", "WARNING"):
+            flush_subscribers(client)
+            flush_subscribers(client)
+        self.assertEqual(PendingSubscriber.objects.get(email="down@example.com").status, PendingSubscriber.FAILED)
+        self.assertTrue(enqueue_subscriber("down@example.com")[1])
+
+    def test_network_errors_retried(self):
+        """Connection errors and timeouts from the client are retried like API errors."""
+        enqueue_subscriber("offline@example.com")
+        client = FakeClient()
+        client.lists.batch_list_members = MagicMock(side_effect=requests.ConnectionError("connection refused"))
+        with self.assertLogs("accounts.newsletter", "WARNING"):
+            self.assertEqual(flush_subscribers(client), (1, 0))
+        subscriber = PendingSubscriber.objects.get()
+        self.assertEqual((subscriber.status, subscriber.attempts), (PendingSubscriber.PENDING, 1))
+        self.assertIn("connection refused", subscriber.last_error)
+
+    def test_unexpected_error_releases_claimed_rows(self):
+        """A bug in one batch doesn't leave the claimed signups stuck in sending."""
+        enqueue_subscriber("a@example.com", list_id="one")
+        enqueue_subscriber("b@example.com", list_id="two")
+        client = FakeClient()
+        client.lists.batch_list_members = MagicMock(side_effect=KeyError("members"))
+        with self.assertRaises(KeyError):
+            flush_subscribers(client)
+        self.assertEqual(
+            set(PendingSubscriber.objects.values_list("status", "attempts")), {(PendingSubscriber.PENDING, 1)},
+        )
+
+    def test_command(self):
+        enqueue_subscriber("cmd@example.com")
+        out = io.StringIO()
+        call_command("flush_subscribers", fake=True, stdout=out)
+        self.assertIn("1/1 signup(s) subscribed", out.getvalue())
+
+
+@override_settings(ACCOUNT_EMAIL_RETRY_DELAY=0)
+class AccountEmailQueueTest(TestCase):
+    """Test that account emails are queued by the views and sent by the worker."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="member@example.com", username="member", password="password")
+
+    def reset(self, email):
+        return self.client.post(reverse("accounts:password_reset"), {"email": email})
+
+    def test_password_reset_does_not_look_up_the_user(self):
+        """Known and unknown addresses cost the same queries, none of them on users."""
+        for email in ("member@example.com", "nobody@example.com"):
+            with CaptureQueriesContext(connection) as queries:
+                self.reset(email)
+            self.assertFalse([q for q in queries if User._meta.db_table in q["sql"]])
+        self.assertEqual(AccountEmail.objects.count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_sends_over_one_connection(self):
+        """Known users get their link; unknown addresses are skipped."""
+        self.reset("member@example.com")
+        self.reset("nobody@example.com")
+        self.client.post(reverse("accounts:register"), {
+            "username": "newbie", "email": "newbie@example.com",
+            "password1": "a-Long-passw0rd!", "password2": "a-Long-passw0rd!",
+        })
+        with patch("django.core.mail.backends.locmem.EmailBackend.open") as open_connection:
+            self.assertEqual(send_emails(claim_emails(10)), 2)
+        open_connection.assert_called_once()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["member@example.com", "newbie@example.com"])
+        reset = next(m for m in mail.outbox if m.subject == "Password Reset")
+        self.assertIn("http://testserver/accounts/reset/", reset.body)
+        verify = next(m for m in mail.outbox if m.to == ["newbie@example.com"])
+        self.assertIn("/verify/?token=", verify.body)
+        self.assertEqual(AccountEmail.objects.get(email="nobody@example.com").status, AccountEmail.SKIPPED)
+
+    def test_failures_retried(self):
+        self.reset("member@example.com")
+        with patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("down")), \
+                self.assertLogs("accounts.emails", "WARNING"):
+            self.assertEqual(send_emails(claim_emails(10)), 0)
+        email = AccountEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (AccountEmail.PENDING, 1))
+        self.assertEqual(send_emails(claim_emails(10)), 1)
+        self.assertEqual(AccountEmail.objects.get().status, AccountEmail.SENT)
+
+
+@override_settings(LOGIN_THROTTLE_IP=(5, 300), LOGIN_THROTTLE_ACCOUNT=(3, 900))
+class LoginThrottleTest(TestCase):
+    """Test that login attempts are throttled before the password is checked."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="victim@example.com", username="victim", password="right-password")
+
+    def html_login(self, username, password="wrong", ip="10.0.0.1"):
+        return self.client.post(reverse("accounts:login"), {"username": username, "password": password}, REMOTE_ADDR=ip)
+
+    def api_login(self, email, password="wrong", ip="10.0.0.1"):
+        return self.client.post(reverse("accounts:token_obtain_pair"), {"email": email, "password": password}, REMOTE_ADDR=ip)
+
+    def test_account_throttled_without_hashing(self):
+        """Past the account limit, authenticate() isn't called, from any IP."""
+        for i in range(3):
+            self.assertEqual(self.html_login("victim@example.com", ip=f"10.0.0.{i}").status_code, 200)
+        with patch("accounts.views.authenticate") as authenticate:
+            response = self.html_login("victim@example.com", password="right-password", ip="10.0.0.9")
+        self.assertEqual(response.status_code, 429)
+        authenticate.assert_not_called()
+        self.assertEqual(login_metrics(), {"hashed": 3, "rejected": 1})
+
+    def test_ip_throttled_across_accounts(self):
+        """One address trying many accounts hits the IP limit."""
+        for i in range(5):
+            self.api_login(f"user{i}@example.com")
+        response = self.api_login("victim@example.com", password="right-password")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(self.api_login("victim@example.com", password="right-password", ip="10.0.0.2").status_code, 200)
+
+    def test_success_clears_account_count(self):
+        for _ in range(2):
+            self.api_login("victim@example.com")
+        self.assertEqual(self.api_login("victim@example.com", password="right-password").status_code, 200)
+        for _ in range(2):
+            self.api_login("victim@example.com", ip="10.0.0.3")
+        self.assertEqual(self.api_login("victim@example.com", password="right-password", ip="10.0.0.3").status_code, 200)
+
+    def test_sliding_window(self):
+        """The previous window's hits count in proportion to its overlap."""
+        now = [1000.0]
+        window = SlidingWindow("test", 4, 100, clock=lambda: now[0])
+        for _ in range(4):
+            window.hit("x")
+        self.assertGreater(window.wait("x"), 0)
+        now[0] = 1150.0  # halfway through the next window: 4 * 0.5 = 2 still count
+        self.assertEqual(window.count("x"), 2)
+        self.assertEqual(window.wait("x"), 0)
+        now[0] = 1250.0
+        self.assertEqual(window.count("x"), 0)
@@ -0,0 +1,126 @@
+"""
+Login throttling, checked before any password is hashed.
+
+Attempts are counted per client IP and per account name in sliding windows
+kept in the shared cache: the current fixed window's count plus the
+previous window's, weighted by how much of it still overlaps the sliding
+window. Two counters per key, no per-attempt history, and ``incr`` is
+atomic on Redis.
+
+``check_login`` rejects an attempt while either count is at its limit,
+without calling ``authenticate()``, so a credential-stuffing burst costs a
+couple of cache reads per request instead of a PBKDF2 run. Counts of
+rejected and hashed attempts are kept for ``manage.py login_stats``.
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("hashed", "rejected")
+
+
+class SlidingWindow:
+    """At most ``limit`` hits per ``period`` seconds for each identifier."""
+
+    def __init__(self, scope, limit, period, clock=time.time):
+        self.scope = scope
+        self.limit = limit
+        self.period = period
+        self.clock = clock
+
+    def _keys(self, ident):
+        now = self.clock()
+        window, elapsed = divmod(now, self.period)
+        key = f"accounts:login:{self.scope}:{ident}:"
+        return key + str(int(window)), key + str(int(window) - 1), elapsed / self.period
+
+    def count(self, ident):
+        current, previous, progress = self._keys(ident)
+        counts = cache.get_many([current, previous])
+        return counts.get(current, 0) + counts.get(previous, 0) * (1 - progress)
+
+    def wait(self, ident):
+        """Seconds until another hit is allowed, or 0 if it is allowed now."""
+        if self.count(ident) < self.limit:
+            return 0
+        _current, _previous, progress = self._keys(ident)
+        return max(1, int(self.period * (1 - progress)))
+
+    def hit(self, ident):
+        current, _previous, _progress = self._keys(ident)
+        # Kept for two periods: it is the previous window for the next one
+        cache.add(current, 0, self.period * 2)
+        try:
+            cache.incr(current)
+        except ValueError:
+            cache.set(current, 1, self.period * 2)
+
+    def reset(self, ident):
+        current, previous, _progress = self._keys(ident)
+        cache.delete_many([current, previous])
+
+
+def windows():
+    return (
+        SlidingWindow("ip", *settings.LOGIN_THROTTLE_IP),
+        SlidingWindow("account", *settings.LOGIN_THROTTLE_ACCOUNT),
+    )
+
+
+def client_ip(request):
+    """The client address, trusting REST_FRAMEWORK["NUM_PROXIES"] proxies in X-Forwarded-For."""
+    return BaseThrottle().get_ident(request)
+
+
+def account_ident(username):
+    # Hashed so addresses don't end up in cache keys
+    return hashlib.sha256((username or "").strip().lower().encode()).hexdigest()[:32]
+
+
+def _idents(request, username):
+    return (client_ip(request), account_ident(username))
+
+
+def _count(metric):
+    key = f"accounts:login:metrics:{metric}"
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def check_login(request, username):
+    """
+    Record a login attempt for ``username`` from ``request``. Returns 0 if
+    the password may be checked, or the seconds to wait if the attempt is
+    rejected.
+    """
+    idents = _idents(request, username)
+    for window, ident in zip(windows(), idents):
+        wait = window.wait(ident)
+        if wait:
+            _count("rejected")
+            logger.info("Login throttled by %s for %ss", window.scope, wait)
+            return wait
+    for window, ident in zip(windows(), idents):
+        window.hit(ident)
+    _count("hashed")
+    return 0
+
+
+def login_succeeded(request, username):
+    """Forget the account's failed attempts (the IP's still count)."""
+    _ip_window, account_window = windows()
+    account_window.reset(account_ident(username))
+
+
+def login_metrics():
+    values = cache.get_many([f"accounts:login:metrics:{metric}" for metric in METRICS])
+    return {metric: values.get(f"accounts:login:metrics:{metric}", 0) for metric in METRICS}
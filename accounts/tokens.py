@@ -0,0 +1,36 @@
+"""
+Pruning of simplejwt's token_blacklist tables.
+
+Every refresh token issued gets an OutstandingToken row and logging out adds
+a BlacklistedToken; neither is ever removed by simplejwt itself. Once a token
+has expired it fails validation regardless, so both rows can go.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+def prune_expired_tokens(batch_size=1000, now=None, on_batch=None):
+    """
+    Delete expired outstanding tokens and their blacklist entries,
+    ``batch_size`` at a time. Returns ``(outstanding, blacklisted)`` counts.
+    """
+    now = now or timezone.now()
+    deleted = [0, 0]
+    last_pk = 0
+    while True:
+        # expires_at is not indexed; walking the primary key keeps each
+        # batch an index range scan instead of a scan of the whole table
+        ids = list(
+            OutstandingToken.objects.filter(pk__gt=last_pk, expires_at__lte=now)
+            .order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        last_pk = ids[-1]
+        with transaction.atomic():
+            deleted[1] += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            deleted[0] += OutstandingToken.objects.filter(pk__in=ids).delete()[0]
+        if on_batch:
+            on_batch(*deleted)
+    return tuple(deleted)
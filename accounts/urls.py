@@ -1,14 +1,14 @@
 from django.urls import path
-from .views import RegisterAPIView, register, verify_email, jwt_login, logout_template, password_reset_request, password_reset_confirm, newsletter_subscribe, mailchimp_failed, mailchimp_confirm, contact, social_login
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .views import RegisterAPIView, ThrottledTokenObtainPairView, register, verify_email, jwt_login, logout_template, password_reset_request, password_reset_confirm, newsletter_subscribe, mailchimp_failed, mailchimp_confirm, contact, social_login
+from rest_framework_simplejwt.views import TokenBlacklistView, TokenRefreshView
 
 app_name = 'accounts'
 
 urlpatterns = [
     path('api/register/', RegisterAPIView.as_view(), name='api_register'),
-    path('api/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/login/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/logout/', TokenRefreshView.as_view(), name='token_logout'),
+    path('api/logout/', TokenBlacklistView.as_view(), name='token_logout'),
     path('register/', register, name='register'),
     path('verify/', verify_email, name="verify_email"),
     path('login/', jwt_login, name='login'),
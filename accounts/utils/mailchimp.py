@@ -1,38 +1,69 @@
-import mailchimp_marketing as MailchimpMarketing
+from functools import lru_cache
+
 from django.conf import settings
-from mailchimp_marketing.api_client import ApiClientError
-from mailchimp_marketing import Client
 
-client = Client()
-client.set_config({
-    "api_key": settings.MAILCHIMP_API_KEY,
-    "server": settings.MAILCHIMP_DATA_CENTER,  # e.g. "us20"
-})
 
-def subscribe_user(email, list_id=None):
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    The Mailchimp client, created on first use so importing this module
+    (and the views that use it) stays cheap.
+    """
+    from mailchimp_marketing import Client
+
+    client = Client()
+    client.set_config({
+        "api_key": settings.MAILCHIMP_API_KEY,
+        "server": settings.MAILCHIMP_DATA_CENTER,  # e.g. "us20"
+    })
+    return client
+
+
+def is_client_error(error):
+    """Whether ``error`` came from the Mailchimp client (as opposed to our code)."""
+    from mailchimp_marketing.api_client import ApiClientError
+
+    return isinstance(error, (ApiClientError, FakeClient.Error))
+
+
+class FakeClient:
     """
-    Subscribe a user to a Mailchimp audience list.
-    :param email: subscriber's email address
-    :param list_id: optional Mailchimp list ID (defaults to settings.MAILCHIMP_AUDIENCE_ID)
+    Stands in for the Mailchimp client in tests and ``--fake`` runs.
+    ``lists.batch_list_members`` answers like the API: addresses in
+    ``existing`` come back as ERROR_CONTACT_EXISTS, addresses in ``invalid``
+    as a member error, and the first ``fail_calls`` calls raise ``Error``.
     """
-    if list_id is None:
-        list_id = settings.MAILCHIMP_EMAIL_LIST_ID
-
-    try:
-        response = client.lists.add_list_member(
-            list_id,
-            {
-                "email_address": email,
-                "status": "subscribed",
-            }
-        )
-        return {"success": True, "response": response}
-    except ApiClientError as error:
-        error_json = error.text or ""
-        if "Member Exists" in error_json:
-            return {"success": False, "reason": "exists"}
-        elif "pending" in error_json.lower():
-            return {"success": False, "reason": "pending"}
-        else:
-            return {"success": False, "reason": "other", "error": error_json}
 
+    class Error(Exception):
+        pass
+
+    class Lists:
+        def __init__(self, client):
+            self.client = client
+
+        def batch_list_members(self, list_id, body):
+            client = self.client
+            emails = [member["email_address"] for member in body["members"]]
+            client.calls.append((list_id, emails))
+            if client.fail_calls:
+                client.fail_calls -= 1
+                raise FakeClient.Error("503 Service Unavailable")
+            response = {"new_members": [], "updated_members": [], "errors": []}
+            for email in emails:
+                if email in client.invalid:
+                    response["errors"].append({"email_address": email, "error": f"{email} looks fake or invalid", "error_code": "ERROR_GENERIC"})
+                elif email in client.existing:
+                    response["errors"].append({"email_address": email, "error": f"{email} is already a list member", "error_code": "ERROR_CONTACT_EXISTS"})
+                else:
+                    client.existing.add(email)
+                    response["new_members"].append({"email_address": email, "status": "subscribed"})
+            response["total_created"] = len(response["new_members"])
+            response["error_count"] = len(response["errors"])
+            return response
+
+    def __init__(self, existing=(), invalid=(), fail_calls=0):
+        self.existing = set(existing)
+        self.invalid = set(invalid)
+        self.fail_calls = fail_calls
+        self.calls = []
+        self.lists = self.Lists(self)
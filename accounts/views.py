@@ -1,6 +1,10 @@
+import math
+
 from django.shortcuts import render, redirect
 from rest_framework import generics, serializers
+from rest_framework.exceptions import Throttled
 from rest_framework.permissions import AllowAny
+from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import RegisterSerializer
 from django.contrib.auth import get_user_model
 from django.contrib import messages
@@ -8,10 +12,14 @@ from django.contrib.auth import authenticate, login
 from django.contrib.auth import logout
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.core.mail import send_mail
-from django.urls import reverse
-from django.utils.encoding import force_bytes, force_str
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from .utils.mailchimp import subscribe_user
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from .emails import enqueue_account_email
+from .models import AccountEmail, PendingSubscriber
+from .newsletter import enqueue_subscriber
+from .throttling import check_login, login_succeeded
 from rest_framework_simplejwt.tokens import AccessToken
 from .forms import CustomUserCreationForm, LoginForm, ContactForm
 from django.conf import settings
@@ -29,6 +37,20 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     new_password = serializers.CharField(min_length=8)
 
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """TokenObtainPairView behind the login throttle (accounts.throttling)."""
+
+    def post(self, request, *args, **kwargs):
+        username = request.data.get(User.USERNAME_FIELD)
+        wait = check_login(request, username)
+        if wait:
+            raise Throttled(wait)
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == 200:
+            login_succeeded(request, username)
+        return response
+
+
 class RegisterAPIView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
@@ -44,17 +66,8 @@ def register(request):
             user.is_active = False  # require email verification
             user.save()
 
-            token = AccessToken.for_user(user)
-            verify_link = request.build_absolute_uri(
-                reverse("accounts:verify_email")
-            ) + f"?token={str(token)}"
-
-            send_mail(
-                subject="Verify your email - YourStore",
-                message=f"Welcome to YourStore!\n\nClick to verify: {verify_link}\n\nThis link expires in 1 hour.",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-            )
+            # Sent by the send_account_emails worker
+            enqueue_account_email(AccountEmail.VERIFY, user.email, request)
             return render(request, "accounts/registration_pending.html", {"email": user.email})
     else:
         form = CustomUserCreationForm()
@@ -105,14 +118,21 @@ def verify_email(request):
 #     return render(request, "accounts/login.html")
 
 def jwt_login(request):
+    status = 200
     if request.method == "POST":
         form = LoginForm(request.POST)
         if form.is_valid():
             username = form.cleaned_data["username"]
             password = form.cleaned_data["password"]
-            user = authenticate(request, username=username, password=password)
-            if user is not None:
+            # Throttled attempts never reach the (deliberately slow) password hasher
+            wait = check_login(request, username)
+            user = None if wait else authenticate(request, username=username, password=password)
+            if wait:
+                messages.error(request, f"Too many login attempts. Please try again in {math.ceil(wait / 60)} minute(s).")
+                status = 429
+            elif user is not None:
                 if user.is_active:
+                    login_succeeded(request, username)
                     # Issue JWT tokens
                     login(request, user)
                     # Get the 'next' parameter from GET or POST
@@ -129,7 +149,7 @@ def jwt_login(request):
 
     # Pass the 'next' parameter to the template context
     next_url = request.GET.get('next', '')
-    return render(request, "accounts/login.html", {"form": form, "next": next_url})
+    return render(request, "accounts/login.html", {"form": form, "next": next_url}, status=status)
 
 
 def logout_template(request):
@@ -139,21 +159,11 @@ def logout_template(request):
 
 def password_reset_request(request):
     if request.method == "POST":
-        email = request.POST.get("email")
-        try:
-            user = User.objects.get(email=email)
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            token = token_generator.make_token(user)
-            # uri_path = "{% url 'accounts:reset_password' %}"
-            reset_link = request.build_absolute_uri(f"/accounts/reset/{uid}/{token}/")
-            send_mail(
-                "Password Reset",
-                f"Click here to reset your password: {reset_link}",
-                "support@yourstore.com",
-                [email],
-            )
-        except User.DoesNotExist:
-            pass  # don't reveal if email exists
+        email = request.POST.get("email") or ""
+        # Queued without looking the user up, so the response doesn't
+        # reveal (even by timing) whether the email exists
+        if email.strip():
+            enqueue_account_email(AccountEmail.PASSWORD_RESET, email, request)
         return render(request, "accounts/password_reset_request_done.html")
     return render(request, "accounts/password_reset_request.html")
 
@@ -178,29 +188,30 @@ def password_reset_confirm(request, uidb64, token):
 
 def newsletter_subscribe(request):
     if request.method == "POST":
-        email = request.POST.get("email")
-        result = subscribe_user(email)
-
-        if result['success']:
-           return redirect("accounts:mailchimp_confirm")
-        elif result['reason']:
-            # email already subscribed
+        email = (request.POST.get("email") or "").strip()
+        try:
+            validate_email(email)
+        except ValidationError:
             return render(request, "accounts/mailchimp_failed.html", {
-                "reason": "exists",
+                "reason": "other",
                 "email": email,
             })
-        elif result['pending']:
+
+        # Mailchimp is called by the flush_subscribers worker, not here
+        subscriber, queued = enqueue_subscriber(email)
+        if not queued and subscriber.status == PendingSubscriber.SUBSCRIBED:
             # email already subscribed
             return render(request, "accounts/mailchimp_failed.html", {
-                "reason": "pending",
+                "reason": "exists",
                 "email": email,
             })
-        else:
-            # some other error
+        elif not queued and subscriber.status in (PendingSubscriber.PENDING, PendingSubscriber.SENDING):
+            # signed up before and still queued
             return render(request, "accounts/mailchimp_failed.html", {
-                "reason": "other",
+                "reason": "pending",
                 "email": email,
             })
+        return redirect("accounts:mailchimp_confirm")
 
     return render(request, "accounts/newsletter_form.html")
 
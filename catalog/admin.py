@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Product, Category, ProductImage, CategoryImage
+from django.utils import timezone
+from .models import Product, Category, ProductImage, CategoryImage, RenditionJob
 
 
 class CategoryImageInline(admin.TabularInline):  # or admin.StackedInline
@@ -16,12 +17,16 @@ class ProductImageInline(admin.TabularInline):  # or admin.StackedInline
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('title', 'price', 'affiliate_link', 'is_active')
     list_filter = ('is_active', 'category')
-    search_fields = ('title', 'slug')
+    search_fields = ('title', 'slug', 'asin')
     prepopulated_fields = {"slug": ("title",)}
+    readonly_fields = ('availability', 'amazon_synced_at')
     fieldsets = (
         ('Product Info', {
             'fields': ('title', 'category', 'slug', 'price')
         }),
+        ('Amazon', {
+            'fields': ('asin', 'availability', 'amazon_synced_at')
+        }),
         ('Description & Links', {
             'fields': ('description', 'affiliate_link')
         }),
@@ -37,4 +42,17 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug')   # ✅ show name & slug in admin list
     search_fields = ('name', 'slug')  # ✅ allow searching categories
     prepopulated_fields = {"slug": ("name",)}
-    inlines = [CategoryImageInline]
\ No newline at end of file
+    inlines = [CategoryImageInline]
+
+
+@admin.register(RenditionJob)
+class RenditionJobAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('file_name',)
+    readonly_fields = ('storage', 'new', 'old', 'attempts', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry']
+
+    @admin.action(description="Retry selected jobs")
+    def retry(self, request, queryset):
+        queryset.update(status=RenditionJob.PENDING, attempts=0, run_after=timezone.now())
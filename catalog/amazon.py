@@ -0,0 +1,210 @@
+"""
+Product refresh from the Amazon Product Advertising API.
+
+``sync_products`` walks products with an ASIN that haven't been synced within
+``max_age``, asks GetItems about them ten at a time (the API maximum) under a
+token-bucket rate limit, and writes back only the fields that changed. Each
+batch stamps ``amazon_synced_at``, so an interrupted run picks up where it
+stopped the next time it is started.
+
+The API is reached through a small client interface, ``get_items(asins)``
+returning ``{asin: record}``, so tests can use ``RecordedClient`` with
+responses saved by ``RecordingClient``.
+"""
+import json
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Product
+from .versioning import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+GETITEMS_BATCH_SIZE = 10
+SYNCED_FIELDS = ["title", "price", "availability"]
+UNAVAILABLE = "Unavailable"
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second on average, with bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available; returns the time slept."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                self.sleep(wait)
+                self.tokens = 1
+                self.updated = self.clock()
+            self.tokens -= 1
+            return wait
+
+
+def item_record(item):
+    """The fields we sync, from an ``amazon_paapi`` Item."""
+    record = {"asin": item.asin, "title": None, "price": None, "availability": UNAVAILABLE, "url": item.detail_page_url}
+    if item.item_info and item.item_info.title:
+        record["title"] = item.item_info.title.display_value
+    listings = item.offers.listings if item.offers and item.offers.listings else []
+    if listings:
+        listing = listings[0]
+        if listing.price:
+            record["price"] = str(listing.price.amount)
+        if listing.availability and listing.availability.message:
+            record["availability"] = listing.availability.message
+    return record
+
+
+class PaapiClient:
+    """GetItems through python-amazon-paapi. Rate limiting is left to the caller."""
+
+    def __init__(self, key=None, secret=None, tag=None, country=None):
+        from amazon_paapi import AmazonApi
+
+        self.api = AmazonApi(
+            key or settings.AMAZON_PAAPI_KEY,
+            secret or settings.AMAZON_PAAPI_SECRET,
+            tag or settings.AMAZON_PAAPI_TAG,
+            country or settings.AMAZON_PAAPI_COUNTRY,
+            throttling=0,
+        )
+
+    def get_items(self, asins):
+        from amazon_paapi.errors import ItemsNotFound
+
+        try:
+            items = self.api.get_items(list(asins))
+        except ItemsNotFound:
+            return {}
+        return {item.asin: item_record(item) for item in items}
+
+
+class RecordingClient:
+    """Wraps a client and saves every response to ``path`` for RecordedClient."""
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.responses = {}
+
+    def get_items(self, asins):
+        records = self.client.get_items(asins)
+        self.responses.update(records)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.responses, f, indent=2, sort_keys=True)
+        return records
+
+
+class RecordedClient:
+    """Offline client answering from responses saved by RecordingClient."""
+
+    def __init__(self, responses):
+        if isinstance(responses, str):
+            with open(responses, encoding="utf-8") as f:
+                responses = json.load(f)
+        self.responses = responses
+        self.calls = []
+
+    def get_items(self, asins):
+        asins = list(asins)
+        if len(asins) > GETITEMS_BATCH_SIZE:
+            raise ValueError(f"GetItems accepts at most {GETITEMS_BATCH_SIZE} ASINs")
+        self.calls.append(asins)
+        return {asin: self.responses[asin] for asin in asins if asin in self.responses}
+
+
+def apply_record(product, record):
+    """Update ``product`` from an API record; returns the names of the fields that changed."""
+    values = {"availability": UNAVAILABLE}
+    if record:
+        values["availability"] = (record.get("availability") or UNAVAILABLE)[
+            :Product._meta.get_field("availability").max_length
+        ]
+        if record.get("title"):
+            values["title"] = record["title"][:Product._meta.get_field("title").max_length]
+        if record.get("price") is not None:
+            values["price"] = Decimal(str(record["price"]))
+    changed = []
+    for field, value in values.items():
+        if getattr(product, field) != value:
+            setattr(product, field, value)
+            changed.append(field)
+    return changed
+
+
+def products_due(max_age):
+    """Products with an ASIN that were never synced or not within ``max_age``."""
+    return Product.objects.filter(asin__isnull=False).exclude(asin="").filter(
+        Q(amazon_synced_at__isnull=True) | Q(amazon_synced_at__lt=timezone.now() - max_age)
+    )
+
+
+def sync_products(client, bucket, queryset, limit=None, retries=3, on_batch=None):
+    """
+    Refresh ``queryset`` from ``client`` in GetItems-sized batches.
+    Returns counts of products checked and updated and API calls made.
+    """
+    from amazon_paapi.errors import TooManyRequests
+
+    stats = {"checked": 0, "updated": 0, "calls": 0}
+    last_pk = 0
+    while limit is None or stats["checked"] < limit:
+        size = GETITEMS_BATCH_SIZE if limit is None else min(GETITEMS_BATCH_SIZE, limit - stats["checked"])
+        batch = list(queryset.filter(pk__gt=last_pk).order_by("pk").only("pk", "asin", "amazon_synced_at", *SYNCED_FIELDS)[:size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        for attempt in range(retries + 1):
+            bucket.acquire()
+            stats["calls"] += 1
+            try:
+                records = client.get_items([p.asin for p in batch])
+                break
+            except TooManyRequests:
+                if attempt == retries:
+                    raise
+                logger.warning("GetItems throttled, backing off (attempt %d)", attempt + 1)
+                time.sleep(2 ** attempt)
+
+        # bulk_update writes the same columns for every row, so group the
+        # products by which fields actually changed
+        now = timezone.now()
+        groups = {}
+        for product in batch:
+            changed = apply_record(product, records.get(product.asin))
+            if changed:
+                product.updated_at = product.amazon_synced_at = now
+                groups.setdefault(tuple(changed), []).append(product)
+        for fields, products in groups.items():
+            Product.objects.bulk_update(products, [*fields, "updated_at", "amazon_synced_at"])
+            stats["updated"] += len(products)
+        unchanged = [p.pk for p in batch if p.amazon_synced_at != now]
+        Product.objects.filter(pk__in=unchanged).update(amazon_synced_at=now)
+
+        stats["checked"] += len(batch)
+        if on_batch:
+            on_batch(stats)
+
+    if stats["updated"]:
+        bump_catalog_version()
+    return stats
@@ -0,0 +1,119 @@
+"""
+Read-only catalog API (mounted at /api/v1/).
+
+List responses are cached per full URL under the catalog version from
+catalog.versioning, so any product or category write invalidates them
+without tracking individual keys. On a miss, lists are built from the
+serializers' lean mode (``.values()`` rows) rather than model instances.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework import viewsets
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+
+from .models import Category, Product, ProductImage
+from .serializers import CategorySerializer, ProductListSerializer, ProductSerializer
+from .versioning import catalog_version
+
+
+class ProductCursorPagination(CursorPagination):
+    page_size = 24
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
+
+
+class CategoryCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("name",)
+
+
+class CatalogCacheMixin:
+    """Cache successful GET responses' data per absolute URL and catalog version."""
+
+    def cache_key(self, request):
+        url = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False).hexdigest()
+        return f"catalog:{catalog_version()}:api:{self.basename}:{url}"
+
+    def cached_response(self, request, compute):
+        key = self.cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            response = compute()
+            if response.status_code != 200:
+                return response
+            data = response.data
+            cache.set(key, data, settings.CATALOG_API_CACHE_TIMEOUT)
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
+
+
+class LeanListMixin:
+    """
+    Build ``list`` from the serializer's ``lean_queryset``/``lean_data``
+    while ``lean`` is set. ``get_queryset`` should leave out prefetches the
+    lean rows don't need.
+    """
+
+    lean = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.lean:
+            return super().list(request, *args, **kwargs)
+        serializer_class = self.get_serializer_class()
+        rows = serializer_class.lean_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(serializer_class.lean_data(page, request))
+
+
+class ProductViewSet(CatalogCacheMixin, LeanListMixin, viewsets.ReadOnlyModelViewSet):
+    """Active products, newest first. Filter with ``?category=<slug>``."""
+
+    lookup_field = "slug"
+    pagination_class = ProductCursorPagination
+
+    def get_queryset(self):
+        products = Product.objects.filter(is_active=True).select_related("category")
+        category = self.request.query_params.get("category")
+        if category:
+            products = products.filter(category__slug=category)
+        if self.action == "list":
+            if self.lean:
+                return products
+            return products.prefetch_related(Prefetch(
+                "images", queryset=ProductImage.objects.order_by("pk")[:1], to_attr="primary_images",
+            ))
+        return products.prefetch_related(Prefetch("images", queryset=ProductImage.objects.order_by("pk")))
+
+    def get_serializer_class(self):
+        return ProductListSerializer if self.action == "list" else ProductSerializer
+
+
+class CategoryViewSet(CatalogCacheMixin, LeanListMixin, viewsets.ReadOnlyModelViewSet):
+    """Categories with their images, active product count and price range."""
+
+    lookup_field = "slug"
+    pagination_class = CategoryCursorPagination
+    serializer_class = CategorySerializer
+
+    def get_queryset(self):
+        if self.action == "list" and self.lean:
+            return Category.objects.all()
+        return Category.objects.with_stats().prefetch_related("images")
+
+
+router = DefaultRouter()
+router.register("products", ProductViewSet, basename="product")
+router.register("categories", CategoryViewSet, basename="category")
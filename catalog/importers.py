@@ -0,0 +1,392 @@
+"""
+Bulk catalog import/export used by the ``import_*``/``export_*`` management
+commands.
+
+Imports bypass ``Model.save`` for speed, so they do by hand what the save
+path and catalog.signals would otherwise do: queue renditions, touch the
+affected products and bump the catalog version.
+"""
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.utils import timezone
+from django.utils.text import slugify
+from PIL import Image
+
+from .models import Category, Product, ProductImage, RenditionJob
+from .renditions import job_for_upload
+from .slugs import SlugAllocator, existing_slugs
+from .versioning import bump_catalog_version
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".avif", ".gif"}
+
+# Large files are uploaded in parts, several at a time, on top of the pool of
+# concurrent files.
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+MULTIPART_CONCURRENCY = 4
+
+
+def scan_image_directory(root):
+    """``(product_slug, path)`` for every image in ``root/<product-slug>/``."""
+    entries = []
+    for slug in sorted(os.listdir(root)):
+        directory = os.path.join(root, slug)
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                entries.append((slug, os.path.join(directory, filename)))
+    return entries
+
+
+def read_image_manifest(path):
+    """``(product_slug, path)`` rows from a CSV with ``product_slug`` and ``path`` columns."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            (row["product_slug"].strip(), os.path.join(base, row["path"].strip()))
+            for row in csv.DictReader(f)
+        ]
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def media_storage():
+    """
+    A fresh default storage for the import, with a multipart TransferConfig
+    when it is S3. (boto3 clients are per thread in S3Boto3Storage, so the
+    instance is safe to share across the upload pool.)
+    """
+    storage = storages.create_storage(settings.STORAGES["default"])
+    if hasattr(storage, "transfer_config"):
+        from boto3.s3.transfer import TransferConfig
+
+        storage.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=MULTIPART_CONCURRENCY,
+        )
+    return storage
+
+
+def _upload(storage, name, path):
+    """
+    Store ``path`` as ``name`` unless it is already there; returns
+    (uploaded, stored_name, width, height). The storage may save under
+    another name (a collision or a concurrent upload), so rows use the
+    name it returns.
+    """
+    with Image.open(path) as img:
+        width, height = img.size
+    if storage.exists(name):
+        return False, name, width, height
+    with open(path, "rb") as f:
+        stored_name = storage.save(name, File(f, name=os.path.basename(path)))
+    return True, stored_name, width, height
+
+
+def import_product_images(entries, storage=None, workers=8, batch_size=500):
+    """
+    Attach the images in ``entries`` (``(product_slug, path)`` pairs) to their
+    products. Files are deduplicated by content: a file already attached to
+    the product is skipped, and identical files are uploaded once and shared.
+    Returns a dict of counts.
+    """
+    storage = storage or media_storage()
+    field = ProductImage._meta.get_field("image")
+    upload_to = field.upload_to
+    stats = {"files": len(entries), "unknown_product": 0, "duplicate": 0, "uploaded": 0, "created": 0}
+
+    products = Product.objects.in_bulk({slug for slug, _path in entries}, field_name="slug")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = dict(zip(
+            (path for _slug, path in entries),
+            executor.map(hash_file, [path for _slug, path in entries]),
+        ))
+
+        existing = {
+            (product_id, upload_to.digest_from_name(name))
+            for product_id, name in ProductImage.objects.filter(
+                product__in=[p.pk for p in products.values()],
+            ).values_list("product_id", "image")
+        }
+
+        rows = []  # (product_id, name)
+        files = {}  # name -> path, one per distinct content
+        names = {}  # digest -> name
+        for slug, path in entries:
+            product = products.get(slug)
+            if product is None:
+                stats["unknown_product"] += 1
+                continue
+            digest = digests[path]
+            key = (product.pk, digest[:upload_to.hash_length])
+            if key in existing:
+                stats["duplicate"] += 1
+                continue
+            existing.add(key)
+            if digest not in names:
+                names[digest] = upload_to.name_for(path, digest)
+                files[names[digest]] = path
+            rows.append((product.pk, names[digest]))
+
+        results = dict(zip(files, executor.map(lambda item: _upload(storage, *item), files.items())))
+
+    stats["uploaded"] = sum(uploaded for uploaded, _name, _w, _h in results.values())
+    stored = {name: (stored_name, width, height) for name, (_uploaded, stored_name, width, height) in results.items()}
+    # Files that were already stored may already have their renditions, or
+    # a job queued for them
+    ready = set(ProductImage.objects.filter(
+        image__in=[name for name, (uploaded, *_rest) in results.items() if not uploaded],
+        renditions_ready=True,
+    ).values_list("image", flat=True))
+    queued = set(RenditionJob.objects.filter(
+        file_name__in=[stored_name for stored_name, _w, _h in stored.values()],
+        status__in=[RenditionJob.PENDING, RenditionJob.RUNNING],
+    ).values_list("file_name", flat=True))
+    images = [
+        ProductImage(
+            product_id=product_id,
+            image=stored[name][0],
+            picture_width=stored[name][1],
+            picture_height=stored[name][2],
+            renditions_ready=stored[name][0] in ready,
+        )
+        for product_id, name in rows
+    ]
+    ProductImage.objects.bulk_create(images, batch_size=batch_size)
+    RenditionJob.objects.bulk_create(
+        [
+            job_for_upload(field, storage, stored_name, width, height)
+            for stored_name, width, height in stored.values()
+            if stored_name not in ready and stored_name not in queued
+        ],
+        batch_size=batch_size,
+    )
+    stats["created"] = len(images)
+
+    if images:
+        Product.objects.filter(pk__in={product_id for product_id, _name in rows}).update(updated_at=timezone.now())
+        bump_catalog_version()
+    return stats
+
+
+PRODUCT_FIELDS = ["slug", "title", "category", "description", "price", "affiliate_link", "is_active"]
+PRODUCT_UPDATE_FIELDS = ["title", "category", "description", "price", "affiliate_link", "is_active", "updated_at"]
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+
+
+class RowError(ValueError):
+    pass
+
+
+def check_length(field_name, value):
+    """Reject values the database would refuse for ``field_name`` (and abort the chunk)."""
+    max_length = Product._meta.get_field(field_name).max_length
+    if max_length and len(value) > max_length:
+        raise RowError(f"{field_name} is longer than {max_length} characters")
+
+
+def parse_price(value):
+    """A finite Decimal that fits the price column."""
+    field = Product._meta.get_field("price")
+    try:
+        price = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise RowError(f"invalid price {value!r}")
+    if not price.is_finite():
+        raise RowError(f"invalid price {value!r}")
+    try:
+        price = price.quantize(Decimal(1).scaleb(-field.decimal_places))
+    except InvalidOperation:
+        price = None
+    if price is None or len(price.as_tuple().digits) > field.max_digits:
+        raise RowError(f"price {value!r} is too large")
+    return price
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_rows(f, fmt, errors=None):
+    """
+    Yield ``(line_number, dict)`` from a CSV or JSON Lines file object without
+    loading it. JSON lines that aren't an object are skipped and recorded in
+    ``errors`` as ``(line_number, message)``.
+    """
+    if fmt == "jsonl":
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = e
+            if isinstance(row, dict):
+                yield number, row
+            elif errors is not None:
+                errors.append((number, f"invalid JSON: {row}" if isinstance(row, ValueError) else "not a JSON object"))
+    else:
+        for number, row in enumerate(csv.DictReader(f), start=2):
+            yield number, row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class ProductImporter:
+    """
+    Upserts products keyed on slug, one ``bulk_create`` per chunk.
+
+    Categories are looked up in an in-memory slug map loaded once (and
+    created in bulk per chunk when ``create_categories`` is set).
+
+    Only rows with an explicit slug update existing products. Rows without
+    one get a new product, with a slug from a SlugAllocator seeded with the
+    table's slugs (as ``Model.save`` does), so a title never overwrites an
+    unrelated product. A slug used by an earlier row of the file is reported
+    as an error rather than merged into it.
+    """
+
+    def __init__(self, create_categories=False):
+        self.create_categories = create_categories
+        self.categories = dict(Category.objects.values_list("slug", "pk"))
+        self.slugs = SlugAllocator(max_length=Product._meta.get_field("slug").max_length)
+        self.seen = set()
+        self.errors = []
+        self.imported = 0
+
+    @staticmethod
+    def explicit_slug(row):
+        return str(row.get("slug") or "").strip()
+
+    def product_slug(self, row):
+        slug = self.explicit_slug(row)
+        if slug:
+            check_length("slug", slug)
+            if slug in self.seen:
+                raise RowError(f"slug {slug!r} is already used by an earlier row")
+            self.slugs.taken.add(slug)
+        else:
+            slug = self.slugs.allocate(row["title"])
+        self.seen.add(slug)
+        return slug
+
+    def category_slug(self, row):
+        value = str(row.get("category") or "").strip()
+        if not value:
+            raise RowError("category is required")
+        return slugify(value)
+
+    def build(self, row, category_ids):
+        title = str(row.get("title") or "").strip()
+        if not title:
+            raise RowError("title is required")
+        check_length("title", title)
+        price = parse_price(row.get("price"))
+        affiliate_link = str(row.get("affiliate_link") or "")
+        check_length("affiliate_link", affiliate_link)
+        category_slug = self.category_slug(row)
+        if category_slug not in category_ids:
+            raise RowError(f"unknown category {category_slug!r}")
+        is_active = row.get("is_active", True)
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower() in TRUE_VALUES
+        return Product(
+            slug=self.product_slug(row),
+            title=title,
+            category_id=category_ids[category_slug],
+            description=row.get("description") or "",
+            price=price,
+            affiliate_link=affiliate_link,
+            is_active=bool(is_active),
+        )
+
+    def ensure_categories(self, rows):
+        if not self.create_categories:
+            return
+        missing = {}
+        for _number, row in rows:
+            try:
+                slug = self.category_slug(row)
+            except RowError:
+                continue
+            if slug not in self.categories:
+                missing.setdefault(slug, str(row["category"]).strip())
+        if missing:
+            Category.objects.bulk_create(
+                [Category(slug=slug, name=name) for slug, name in missing.items()],
+                ignore_conflicts=True,
+            )
+            self.categories.update(Category.objects.filter(slug__in=missing).values_list("slug", "pk"))
+
+    def import_chunk(self, rows):
+        """Upsert one chunk of ``(line_number, row)``; returns the number written."""
+        self.ensure_categories(rows)
+        titles = [row.get("title") or "" for _number, row in rows if not self.explicit_slug(row)]
+        self.slugs.taken.update(existing_slugs(Product, [title for title in titles if title.strip()]))
+        updates, inserts = [], []
+        for number, row in rows:
+            try:
+                product = self.build(row, self.categories)
+            except RowError as e:
+                self.errors.append((number, str(e)))
+                continue
+            (updates if self.explicit_slug(row) else inserts).append(product)
+        Product.objects.bulk_create(
+            updates,
+            update_conflicts=True,
+            unique_fields=["slug"],
+            update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+        Product.objects.bulk_create(inserts)
+        self.imported += len(updates) + len(inserts)
+        return len(updates) + len(inserts)
+
+    def finish(self):
+        if self.imported:
+            bump_catalog_version()
+
+
+def export_products(f, fmt, chunk_size=2000):
+    """Stream every product to ``f`` as CSV or JSON Lines; returns the row count."""
+    rows = (
+        Product.objects.order_by("pk")
+        .values_list("slug", "title", "category__slug", "description", "price", "affiliate_link", "is_active")
+        .iterator(chunk_size=chunk_size)
+    )
+    count = 0
+    if fmt == "jsonl":
+        for row in rows:
+            record = dict(zip(PRODUCT_FIELDS, row))
+            record["price"] = str(record["price"])
+            f.write(json.dumps(record) + "\n")
+            count += 1
+    else:
+        writer = csv.writer(f)
+        writer.writerow(PRODUCT_FIELDS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
@@ -0,0 +1,102 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from catalog.models import Category, CategoryImage, Product, ProductImage
+from catalog.serializers import CategorySerializer, ProductListSerializer
+from shop.renderers import FastJSONRenderer, orjson
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/s of the regular list serializers + JSONRenderer against their lean "
+        "mode + FastJSONRenderer, on generated rows that are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000, help="Products to generate.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per variant; the best is reported.")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson is not installed; the lean variant renders with the stdlib encoder.")
+        try:
+            with transaction.atomic():
+                self.generate(options["rows"])
+                self.compare(options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def generate(self, rows):
+        categories = Category.objects.bulk_create(
+            [Category(name=f"Bench category {i}", slug=f"bench-category-{i}") for i in range(max(1, rows // 50))]
+        )
+        CategoryImage.objects.bulk_create([
+            CategoryImage(category=category, image=f"category_images/bench-{category.pk}.png", picture_width=10, picture_height=10)
+            for category in categories
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                category=categories[i % len(categories)],
+                title=f"Bench product {i}",
+                slug=f"bench-product-{i}",
+                price=Decimal(i % 1000) + Decimal("0.99"),
+                asin=f"BENCH{i:05d}"[:10],
+            )
+            for i in range(rows)
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f"product_images/bench-{product.pk}-{n}.png", picture_width=10, picture_height=10)
+            for product in products
+            for n in range(2)
+        ])
+
+    def compare(self, repeat):
+        request = RequestFactory().get("/api/v1/")
+        products = Product.objects.filter(slug__startswith="bench-product-").order_by("-created_at", "-id")
+        categories = Category.objects.filter(slug__startswith="bench-category-").order_by("name")
+
+        def drf_products():
+            queryset = products.select_related("category").prefetch_related(Prefetch(
+                "images", queryset=ProductImage.objects.order_by("pk")[:1], to_attr="primary_images",
+            ))
+            return JSONRenderer().render(ProductListSerializer(queryset, many=True).data)
+
+        def lean_products():
+            rows = ProductListSerializer.lean_queryset(products)
+            return FastJSONRenderer().render(ProductListSerializer.lean_data(rows, request))
+
+        def drf_categories():
+            queryset = categories.with_stats().prefetch_related("images")
+            return JSONRenderer().render(CategorySerializer(queryset, many=True, context={"request": request}).data)
+
+        def lean_categories():
+            rows = CategorySerializer.lean_queryset(categories)
+            return FastJSONRenderer().render(CategorySerializer.lean_data(rows, request))
+
+        for label, count, drf, lean in (
+            ("products", products.count(), drf_products, lean_products),
+            ("categories", categories.count(), drf_categories, lean_categories),
+        ):
+            drf_rate = count / self.best(drf, repeat)
+            lean_rate = count / self.best(lean, repeat)
+            self.stdout.write(f"{label:<11} serializer {drf_rate:10.0f} rows/s   lean {lean_rate:10.0f} rows/s")
+            self.stdout.write(self.style.SUCCESS(f"{label:<11} {lean_rate / drf_rate:.1f}x"))
+
+    def best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
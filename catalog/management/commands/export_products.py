@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.importers import detect_format, export_products
+
+
+class Command(BaseCommand):
+    help = "Stream every product to a CSV or JSON Lines file (the import_products format)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Output file (default: stdout).")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = detect_format(path, options["format"])
+        started = time.monotonic()
+        if path == "-":
+            count = export_products(self.stdout, fmt, options["chunk_size"])
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                count = export_products(f, fmt, options["chunk_size"])
+        elapsed = time.monotonic() - started
+        self.stderr.write(f"{count} product(s) exported in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} rows/s)")
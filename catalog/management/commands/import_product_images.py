@@ -0,0 +1,37 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importers import import_product_images, read_image_manifest, scan_image_directory
+
+
+class Command(BaseCommand):
+    help = (
+        "Attach product images from a directory (<dir>/<product-slug>/<image>) or a CSV "
+        "manifest (product_slug,path), uploading them to media storage in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Image directory or CSV manifest.")
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent uploads.")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        if os.path.isdir(source):
+            entries = scan_image_directory(source)
+        elif os.path.isfile(source):
+            entries = read_image_manifest(source)
+        else:
+            raise CommandError(f"{source} does not exist")
+
+        started = time.monotonic()
+        stats = import_product_images(entries, workers=options["workers"])
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{stats['files']} file(s): {stats['uploaded']} uploaded, {stats['created']} image(s) created, "
+            f"{stats['duplicate']} duplicate(s), {stats['unknown_product']} for unknown products"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported in {elapsed:.1f}s ({stats['files'] / elapsed if elapsed else 0:.0f} files/s)"
+        ))
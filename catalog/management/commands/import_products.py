@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.importers import ProductImporter, chunked, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV or JSON Lines file, keyed on slug. "
+        "Columns: slug (optional), title, category (slug, or a name that slugifies to it), description, price, "
+        "affiliate_link, is_active."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for stdin.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per bulk upsert.")
+        parser.add_argument("--create-categories", action="store_true", help="Create categories that don't exist.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = detect_format(path, options["format"])
+        importer = ProductImporter(create_categories=options["create_categories"])
+        started = time.monotonic()
+
+        f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        with f:
+            for chunk in chunked(read_rows(f, fmt, importer.errors), options["chunk_size"]):
+                with transaction.atomic():
+                    importer.import_chunk(chunk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"{importer.imported} product(s) imported ({importer.imported / elapsed:.0f} rows/s)")
+        importer.finish()
+
+        for number, error in importer.errors[:20]:
+            self.stderr.write(f"line {number}: {error}")
+        if len(importer.errors) > 20:
+            self.stderr.write(f"... and {len(importer.errors) - 20} more")
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{importer.imported} product(s) imported, {len(importer.errors)} row(s) skipped in {elapsed:.1f}s"
+        ))
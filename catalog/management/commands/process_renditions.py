@@ -0,0 +1,33 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.renditions import claim_jobs, make_executor, process_jobs
+
+
+class Command(BaseCommand):
+    help = "Encode queued image renditions in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encoder processes.")
+        parser.add_argument("--batch", type=int, help="Jobs claimed at a time (default: 4 per worker).")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs.")
+        parser.add_argument("--sleep", type=float, default=5, help="Seconds between polls when idle.")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        batch = options["batch"] or workers * 4
+        with make_executor(workers) as executor:
+            while True:
+                jobs = claim_jobs(batch)
+                if jobs:
+                    started = time.monotonic()
+                    succeeded = process_jobs(jobs, executor)
+                    self.stdout.write(
+                        f"{succeeded}/{len(jobs)} job(s) rendered in {time.monotonic() - started:.1f}s"
+                    )
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
@@ -0,0 +1,44 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalog.amazon import PaapiClient, RecordedClient, RecordingClient, TokenBucket, products_due, sync_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh title, price and availability of products with an ASIN from the Amazon "
+        "Product Advertising API. Only products not synced within --max-age are fetched, so "
+        "an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age", type=float, default=24, help="Hours before a product is due again.")
+        parser.add_argument("--limit", type=int, help="Stop after this many products.")
+        parser.add_argument("--replay", metavar="PATH", help="Answer from recorded responses instead of the API.")
+        parser.add_argument("--record", metavar="PATH", help="Save API responses for --replay.")
+
+    def handle(self, *args, **options):
+        if options["replay"]:
+            client = RecordedClient(options["replay"])
+        else:
+            client = PaapiClient()
+            if options["record"]:
+                client = RecordingClient(client, options["record"])
+        bucket = TokenBucket(settings.AMAZON_PAAPI_RATE, settings.AMAZON_PAAPI_BURST)
+        queryset = products_due(timedelta(hours=options["max_age"]))
+        started = time.monotonic()
+
+        def progress(stats):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{stats['checked']} checked, {stats['updated']} updated, "
+                f"{stats['calls']} call(s) ({stats['checked'] / elapsed if elapsed else 0:.1f} products/s)"
+            )
+
+        stats = sync_products(client, bucket, queryset, limit=options["limit"], on_batch=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {stats['checked']} product(s), {stats['updated']} changed, in {time.monotonic() - started:.1f}s"
+        ))
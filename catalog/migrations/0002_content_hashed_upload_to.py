@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 23:12
+
+import pictures.models
+import shop.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='categoryimage',
+            name='image',
+            field=pictures.models.PictureField(aspect_ratios=[None], breakpoints={'l': 1200, 'm': 992, 's': 768, 'xl': 1400, 'xs': 576}, container_width=1200, file_types=['AVIF'], grid_columns=12, height_field='picture_height', pixel_densities=[1, 2], upload_to=shop.storage.ContentHashedUploadTo('category_image/'), width_field='picture_width'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=pictures.models.PictureField(aspect_ratios=[None], breakpoints={'l': 1200, 'm': 992, 's': 768, 'xl': 1400, 'xs': 576}, container_width=1200, file_types=['AVIF'], grid_columns=12, height_field='picture_height', pixel_densities=[1, 2], upload_to=shop.storage.ContentHashedUploadTo('product_images/'), width_field='picture_width'),
+        ),
+    ]
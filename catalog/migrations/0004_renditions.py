@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 23:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    """Images uploaded before the queue had their renditions made on save."""
+    for model_name in ("ProductImage", "CategoryImage"):
+        apps.get_model("catalog", model_name).objects.update(renditions_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoryimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether the resized avif renditions have been generated.'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether the resized avif renditions have been generated.'),
+        ),
+        migrations.CreateModel(
+            name='RenditionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(db_index=True, help_text='Name of the original image in storage.', max_length=255)),
+                ('storage', models.JSONField(help_text='Deconstructed storage of the original image.')),
+                ('new', models.JSONField(blank=True, default=list, help_text='Deconstructed renditions to create.')),
+                ('old', models.JSONField(blank=True, default=list, help_text='Deconstructed renditions to delete.')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time the job may run (retry backoff).')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='catalog_ren_status_634c1f_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
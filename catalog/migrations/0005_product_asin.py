@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='amazon_synced_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When the product was last refreshed from Amazon.', null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='asin',
+            field=models.CharField(blank=True, help_text='Amazon Standard Identification Number, for syncing from the Product Advertising API.', max_length=10, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='availability',
+            field=models.CharField(blank=True, help_text='Availability message from Amazon.', max_length=100),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 00:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_upload_to_path'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='productimage',
+            options={'ordering': ['pk'], 'verbose_name': 'Product Image', 'verbose_name_plural': 'Product Images'},
+        ),
+    ]
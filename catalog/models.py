@@ -1,18 +1,42 @@
 from django.db import models
-from django.utils.text import slugify
+from django.db.models import Count, Max, Min, Q
 from django.urls import reverse
+from django.utils import timezone
 from pictures.models import PictureField
+from shop.uploads import ContentHashedUploadTo
+from .slugs import unique_slug
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_stats(self):
+        """
+        Annotate ``product_count`` (active products), ``image_count`` and the
+        ``min_price``/``max_price`` of active products, in one GROUP BY.
+        """
+        active = Q(products__is_active=True)
+        return self.annotate(
+            # Joining both relations multiplies the rows, hence distinct
+            product_count=Count("products", filter=active, distinct=True),
+            image_count=Count("images", distinct=True),
+            min_price=Min("products__price", filter=active),
+            max_price=Max("products__price", filter=active),
+        )
 
 
 class Category(models.Model):
     name = models.CharField(max_length=120, unique=True, help_text="Category name of the product.")
     slug = models.SlugField(max_length=140, unique=True, help_text="URL-friendly identifier generated from the name.")
-    
+    updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp of the last change to the category or its images.")
+
+    objects = CategoryQuerySet.as_manager()
+
+    STAT_FIELDS = ("product_count", "image_count", "min_price", "max_price")
+
     class Meta:
         verbose_name_plural = "categories"
 
     def save(self, *args, **kwargs):
-        if not self.slug: self.slug = slugify(self.name)
+        if not self.slug: self.slug = unique_slug(self, self.name)
         super().save(*args, **kwargs)
 
     def __str__(self): return self.name
@@ -20,12 +44,13 @@ class Category(models.Model):
 class CategoryImage(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="images")
     image = PictureField(
-        upload_to="category_image/",
+        upload_to=ContentHashedUploadTo("category_image/"),
         width_field="picture_width",
         height_field="picture_height"
     )
     picture_width = models.PositiveIntegerField(editable=False)
     picture_height = models.PositiveIntegerField(editable=False)
+    renditions_ready = models.BooleanField(default=False, editable=False, help_text="Whether the resized avif renditions have been generated.")
 
     def __str__(self):
         return f"Image for {self.category.name}"
@@ -41,8 +66,12 @@ class Product(models.Model):
     description = models.TextField(blank=True, help_text="Detailed description of the product.")
     price = models.DecimalField( max_digits=10, decimal_places=2, help_text="Price of the product.")
     affiliate_link = models.URLField(blank=True,  help_text="Affiliate purchase link.")
+    asin = models.CharField(max_length=10, unique=True, null=True, blank=True, help_text="Amazon Standard Identification Number, for syncing from the Product Advertising API.")
+    availability = models.CharField(max_length=100, blank=True, help_text="Availability message from Amazon.")
+    amazon_synced_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="When the product was last refreshed from Amazon.")
     is_active = models.BooleanField(default=True, help_text="Whether the product is active and visible.")
     created_at = models.DateTimeField(auto_now_add=True, help_text="Timestamp when the product was created.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp of the last change to the product or its images.")
 
     class Meta:
         ordering = ["-created_at", "title"]
@@ -54,9 +83,9 @@ class Product(models.Model):
         return reverse("catalog:detail", args=[self.slug])
 
     def save(self, *args, **kwargs):
-        """Auto-generate slug from title if not provided."""
+        """Auto-generate a unique slug from title if not provided."""
         if not self.slug:
-            self.slug = slugify(self.title)
+            self.slug = unique_slug(self, self.title)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -71,17 +100,56 @@ class ProductImage(models.Model):
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images", help_text="The product this image belongs to.")
     image = PictureField(
-        upload_to="product_images/",
+        upload_to=ContentHashedUploadTo("product_images/"),
         width_field="picture_width",
         height_field="picture_height"
     )
     picture_width = models.PositiveIntegerField(editable=False)
     picture_height = models.PositiveIntegerField(editable=False)
+    renditions_ready = models.BooleanField(default=False, editable=False, help_text="Whether the resized avif renditions have been generated.")
 
     class Meta:
+        # The first image is the product's main image, here and in the API
+        ordering = ["pk"]
         verbose_name = "Product Image"
         verbose_name_plural = "Product Images"
 
     def __str__(self):
         return f"Image for {self.product.title}"
 
+
+
+class RenditionJob(models.Model):
+    """
+    A queued django-pictures processing call (see catalog.renditions).
+    The arguments are the deconstructed storage and pictures passed to
+    ``PICTURES["PROCESSOR"]``, stored as JSON.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    file_name = models.CharField(max_length=255, db_index=True, help_text="Name of the original image in storage.")
+    storage = models.JSONField(help_text="Deconstructed storage of the original image.")
+    new = models.JSONField(default=list, blank=True, help_text="Deconstructed renditions to create.")
+    old = models.JSONField(default=list, blank=True, help_text="Deconstructed renditions to delete.")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Earliest time the job may run (retry backoff).")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"Renditions for {self.file_name} ({self.status})"
@@ -0,0 +1,157 @@
+"""
+Background generation of django-pictures renditions.
+
+``enqueue_rendition`` is installed as ``PICTURES["PROCESSOR"]``, so saving an
+image only records a RenditionJob instead of encoding every avif size inside
+the admin request. ``manage.py process_renditions`` claims pending jobs and
+encodes them in a process pool, retrying failures with exponential backoff.
+
+Until its job has run, an image's ``renditions_ready`` flag is False and the
+``catalog_picture`` template tag falls back to the original file.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+from pictures.models import PictureFieldFile
+from pictures.utils import reconstruct
+
+from .models import Category, CategoryImage, Product, ProductImage, RenditionJob
+from .versioning import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# image model -> (owner model, foreign key to it)
+IMAGE_MODELS = {ProductImage: (Product, "product_id"), CategoryImage: (Category, "category_id")}
+
+# Jobs left running this long are assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue_rendition(storage, file_name, new=None, old=None):
+    """``PICTURES["PROCESSOR"]``: queue the work once the upload is committed."""
+    transaction.on_commit(lambda: RenditionJob.objects.create(
+        storage=storage,
+        file_name=file_name,
+        new=new or [],
+        old=old or [],
+    ))
+
+
+def job_for_upload(field, storage, file_name, width, height):
+    """
+    An unsaved RenditionJob for an image stored without going through
+    ``FieldFile.save`` (bulk imports), using the known dimensions instead of
+    reading the file back from storage.
+    """
+    sources = PictureFieldFile.get_picture_files(
+        file_name=file_name, img_width=width, img_height=height, storage=storage, field=field,
+    )
+    new = [
+        picture.deconstruct()
+        for file_types in sources.values()
+        for srcset in file_types.values()
+        for picture in srcset.values()
+    ]
+    return RenditionJob(storage=storage.deconstruct(), file_name=file_name, new=new)
+
+
+def mark_ready(file_name):
+    """
+    Flag the images using ``file_name`` as having renditions. Their products
+    and categories are touched and the catalog version bumped, so the pages'
+    ETags change and stop answering 304 with the fallback markup.
+    """
+    now = timezone.now()
+    flipped = False
+    for model, (owner, foreign_key) in IMAGE_MODELS.items():
+        images = model.objects.filter(image=file_name, renditions_ready=False)
+        owner_ids = set(images.values_list(foreign_key, flat=True))
+        if owner_ids:
+            images.update(renditions_ready=True)
+            owner.objects.filter(pk__in=owner_ids).update(updated_at=now)
+            flipped = True
+    if flipped:
+        bump_catalog_version()
+
+
+def process_rendition(storage, file_name, new, old):
+    """
+    Encode a job's renditions in a pool process. This is what django-pictures
+    does in its own queue adapters (pictures.tasks._process_picture in
+    1.7.1, which is pinned), written against the public ``reconstruct`` and
+    ``SimplePicture.save``/``delete`` rather than the private function.
+    """
+    storage = reconstruct(*storage)
+    if new:
+        with storage.open(file_name) as f, Image.open(f) as img:
+            for picture in new:
+                reconstruct(*picture).save(img)
+    for picture in old:
+        reconstruct(*picture).delete()
+
+
+def claim_jobs(limit):
+    """Mark up to ``limit`` due jobs as running and return them."""
+    now = timezone.now()
+    RenditionJob.objects.filter(status=RenditionJob.RUNNING, updated_at__lt=now - STALE_AFTER).update(
+        status=RenditionJob.PENDING,
+    )
+    with transaction.atomic():
+        jobs = list(
+            RenditionJob.objects.select_for_update(skip_locked=True)
+            .filter(status=RenditionJob.PENDING, run_after__lte=now)
+            .order_by("run_after")[:limit]
+        )
+        RenditionJob.objects.filter(pk__in=[job.pk for job in jobs]).update(status=RenditionJob.RUNNING, updated_at=now)
+    return jobs
+
+
+def finish_job(job, error=None):
+    """Record the outcome of a job, scheduling a retry on failure."""
+    if error is None:
+        job.status = RenditionJob.DONE
+        job.last_error = ""
+        job.save(update_fields=["status", "last_error", "updated_at"])
+        mark_ready(job.file_name)
+        return
+
+    job.attempts += 1
+    job.last_error = error
+    if job.attempts >= settings.RENDITION_MAX_ATTEMPTS:
+        job.status = RenditionJob.FAILED
+        logger.error("Renditions for %s failed after %d attempts: %s", job.file_name, job.attempts, error)
+    else:
+        job.status = RenditionJob.PENDING
+        job.run_after = timezone.now() + timedelta(seconds=settings.RENDITION_RETRY_DELAY * 2 ** (job.attempts - 1))
+        logger.warning("Renditions for %s failed (attempt %d), retrying: %s", job.file_name, job.attempts, error)
+    job.save(update_fields=["status", "attempts", "last_error", "run_after", "updated_at"])
+
+
+def process_jobs(jobs, executor):
+    """Encode the jobs' renditions in ``executor``; returns the number that succeeded."""
+    futures = [
+        (job, executor.submit(process_rendition, job.storage, job.file_name, job.new, job.old))
+        for job in jobs
+    ]
+    succeeded = 0
+    for job, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            finish_job(job, f"{type(e).__name__}: {e}")
+        else:
+            finish_job(job)
+            succeeded += 1
+    return succeeded
+
+
+def make_executor(workers):
+    # Children only touch storage; don't let them inherit the parent's DB sockets
+    connections.close_all()
+    return ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
@@ -1,9 +1,32 @@
 """
 Serializers for Product and Category models
+
+The list serializers also have a lean mode for the API's hot paths:
+``lean_queryset`` turns a queryset into ``.values()`` rows carrying
+everything the output needs (annotated counts, image file names) and
+``lean_data`` finishes them into the same dicts ``.data`` would produce,
+without building model instances or serializer fields per row.
 """
+from collections import defaultdict
 
+from django.db.models import F, OuterRef, Subquery
 from rest_framework import serializers
+
 from .models import Product, Category, ProductImage, CategoryImage
+from .versioning import category_stats
+
+
+def _image_url(storage, name, request=None):
+    """What DRF's ImageField renders for a stored file name."""
+    if not name:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _decimal(value):
+    """What DRF's DecimalField renders for our two-decimal-place prices."""
+    return None if value is None else f"{value:.2f}"
 
 
 class CategoryImageSerializer(serializers.ModelSerializer):
@@ -14,14 +37,54 @@ class CategoryImageSerializer(serializers.ModelSerializer):
 
 class CategorySerializer(serializers.ModelSerializer):
     images = CategoryImageSerializer(many=True, read_only=True)
-    product_count = serializers.SerializerMethodField()
+    # Annotated by CategoryQuerySet.with_stats (see catalog.api.CategoryViewSet)
+    product_count = serializers.IntegerField(read_only=True)
+    image_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'amazon_id', 'slug', 'images', 'product_count']
+        fields = ['id', 'name', 'slug', 'images', 'product_count', 'image_count', 'min_price', 'max_price']
+
+    @staticmethod
+    def lean_queryset(queryset):
+        # The stats come from the cached catalog.versioning.category_stats
+        return queryset.values('id', 'name', 'slug')
+
+    @staticmethod
+    def lean_data(rows, request=None):
+        """Add the stats and images to ``rows`` from ``lean_queryset``, with one query for all the images."""
+        rows = list(rows)
+        stats = category_stats()
+        storage = CategoryImage._meta.get_field('image').storage
+        images = defaultdict(list)
+        for pk, category_id, name in CategoryImage.objects.filter(
+            category__in=[row['id'] for row in rows],
+        ).order_by('pk').values_list('pk', 'category_id', 'image'):
+            images[category_id].append({'id': pk, 'image': _image_url(storage, name, request)})
+        data = []
+        for row in rows:
+            row_stats = stats.get(row['id'], {})
+            data.append({
+                'id': row['id'],
+                'name': row['name'],
+                'slug': row['slug'],
+                'images': images[row['id']],
+                'product_count': row_stats.get('product_count', 0),
+                'image_count': row_stats.get('image_count', 0),
+                'min_price': _decimal(row_stats.get('min_price')),
+                'max_price': _decimal(row_stats.get('max_price')),
+            })
+        return data
+
+
+class CategorySummarySerializer(serializers.ModelSerializer):
+    """Category as nested in a product, without the per-category queries."""
 
-    def get_product_count(self, obj):
-        return obj.products.count()
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug']
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -31,7 +94,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
-    category = CategorySerializer(read_only=True)
+    category = CategorySummarySerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
 
     class Meta:
@@ -44,9 +107,11 @@ class ProductSerializer(serializers.ModelSerializer):
             'price',
             'description',
             'images',
-            'affliliate_link',
+            'affiliate_link',
+            'availability',
             'is_active',
             'created_at',
+            'updated_at',
             'slug',
         ]
 
@@ -69,7 +134,37 @@ class ProductListSerializer(serializers.ModelSerializer):
         ]
 
     def get_main_image(self, obj):
-        image = obj.images.first()
-        if image:
-            return image.image.url
+        # ``primary_images`` is prefetched by catalog.api.ProductViewSet
+        images = getattr(obj, 'primary_images', None)
+        if images is None:
+            images = obj.images.all()[:1]
+        if images:
+            return images[0].image.url
         return None
+
+    @staticmethod
+    def lean_queryset(queryset):
+        return queryset.values(
+            'id', 'asin', 'title', 'price', 'created_at', 'slug',
+            category_name=F('category__name'),
+            main_image=Subquery(ProductImage.objects.filter(product=OuterRef('pk')).order_by('pk').values('image')[:1]),
+        )
+
+    @staticmethod
+    def lean_data(rows, request=None):
+        """Finish ``lean_queryset`` rows: prices as strings, image names as URLs."""
+        storage = ProductImage._meta.get_field('image').storage
+        return [
+            {
+                'id': row['id'],
+                'asin': row['asin'],
+                'title': row['title'],
+                'category_name': row['category_name'],
+                'price': _decimal(row['price']),
+                'main_image': _image_url(storage, row['main_image']),
+                # Left as a datetime; the renderer writes the same ISO 8601 as DRF
+                'created_at': row['created_at'],
+                'slug': row['slug'],
+            }
+            for row in rows
+        ]
@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Category, CategoryImage, Product, ProductImage, RenditionJob
+from .versioning import bump_catalog_version
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    """Invalidate cached catalog stamps after any product or category write."""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_changed(sender, instance, **kwargs):
+    """Images are part of the product page, so touch the product."""
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=CategoryImage)
+@receiver(post_delete, sender=CategoryImage)
+def category_image_changed(sender, instance, **kwargs):
+    """Images are shown in the category listings, so touch the category."""
+    Category.objects.filter(pk=instance.category_id).update(updated_at=timezone.now())
+    bump_catalog_version()
+
+
+@receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=CategoryImage)
+def image_uploaded(sender, instance, **kwargs):
+    """A new upload has no renditions until its RenditionJob has run."""
+    if instance.image and not instance.image._committed:
+        instance.renditions_ready = False
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=CategoryImage)
+def image_saved(sender, instance, **kwargs):
+    """Catch the worker finishing before the image row was written."""
+    if not instance.renditions_ready and RenditionJob.objects.filter(
+        file_name=instance.image.name, status=RenditionJob.DONE,
+    ).exists():
+        sender.objects.filter(pk=instance.pk).update(renditions_ready=True)
+        instance.renditions_ready = True
@@ -0,0 +1,74 @@
+"""
+Unique slug allocation for products and categories.
+
+``allocate_slugs`` fetches every existing slug that could collide with a
+batch of titles in one prefix query and hands out ``-2``, ``-3``... suffixes
+in memory, instead of saving row by row until the unique constraint stops
+complaining.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+class SlugAllocator:
+    """
+    Hands out slugs that are not in ``taken`` (and not handed out before),
+    truncated so the suffix still fits in ``max_length``.
+    """
+
+    def __init__(self, taken=(), max_length=50):
+        self.taken = set(taken)
+        self.max_length = max_length
+        self.next_suffix = {}
+
+    def base(self, text):
+        return slugify(text)[:self.max_length].strip("-") or "item"
+
+    def allocate(self, text):
+        base = self.base(text)
+        slug = base
+        n = self.next_suffix.get(base, 2)
+        while slug in self.taken:
+            suffix = f"-{n}"
+            slug = base[:self.max_length - len(suffix)].strip("-") + suffix
+            n += 1
+        self.next_suffix[base] = n
+        self.taken.add(slug)
+        return slug
+
+
+def existing_slugs(model, texts, field="slug", exclude=None):
+    """
+    Every value of ``field`` in ``model`` that a slug for one of ``texts``
+    could collide with, in one query. ``exclude`` is a queryset filter for
+    rows to ignore (e.g. the instance being saved).
+    """
+    max_length = model._meta.get_field(field).max_length
+    base = SlugAllocator(max_length=max_length).base
+    # Truncated bases share a prefix with their suffixed forms, so a
+    # startswith on the shortest form a suffix can leave covers every clash
+    prefixes = {base(text)[:max(1, max_length - 6)] for text in texts}
+    if not prefixes:
+        return set()
+    queryset = model._default_manager.filter(reduce(or_, (Q(**{f"{field}__startswith": p}) for p in prefixes)))
+    if exclude:
+        queryset = queryset.exclude(**exclude)
+    return set(queryset.values_list(field, flat=True))
+
+
+def allocate_slugs(model, texts, field="slug", exclude=None):
+    """Unique slugs for ``texts`` (in order) against the rows of ``model``, with one query for all of them."""
+    allocator = SlugAllocator(
+        existing_slugs(model, texts, field=field, exclude=exclude),
+        max_length=model._meta.get_field(field).max_length,
+    )
+    return [allocator.allocate(text) for text in texts]
+
+
+def unique_slug(instance, text, field="slug"):
+    """Slug for a single unsaved/renamed instance, e.g. from ``save()``."""
+    exclude = {"pk": instance.pk} if instance.pk else None
+    return allocate_slugs(type(instance), [text], field=field, exclude=exclude)[0]
@@ -0,0 +1,19 @@
+from django import template
+from django.utils.html import format_html
+from pictures.templatetags.pictures import picture
+
+register = template.Library()
+
+
+@register.simple_tag
+def catalog_picture(image, alt=""):
+    """
+    Responsive ``<picture>`` for a ProductImage/CategoryImage, or a plain
+    ``<img>`` of the original until its renditions have been generated.
+    """
+    if image.renditions_ready:
+        return picture(image.image, img_alt=alt, img_loading="lazy")
+    return format_html(
+        '<img src="{}" alt="{}" width="{}" height="{}" loading="lazy">',
+        image.image.url, alt, image.picture_width, image.picture_height,
+    )
@@ -1,3 +1,702 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import engines
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from shop.querybudget import QueryBudgetTestMixin
+from shop.renderers import FastJSONRenderer
+
+from .amazon import RecordedClient, RecordingClient, TokenBucket, products_due, sync_products
+from .importers import import_product_images, read_image_manifest, scan_image_directory
+from .models import Category, CategoryImage, Product, ProductImage, RenditionJob
+from .renditions import claim_jobs, process_jobs
+from .serializers import CategorySerializer, ProductListSerializer
+from .slugs import allocate_slugs, unique_slug
+from .versioning import attach_category_stats, bump_catalog_version, catalog_version, category_stats
+
+
+class ConditionalGetTest(TestCase):
+    """Test ETag / Last-Modified handling on catalog pages."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Electronics", slug="electronics")
+        self.product = Product.objects.create(
+            category=self.category, title="Smartphone", slug="smartphone", price=Decimal("199.00")
+        )
+        # The first visit sets the CSRF cookie, which is part of every ETag.
+        self.client.get(reverse("core:home"))
+
+    def assertNotModified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        return response
+
+    def test_listing_pages_return_304(self):
+        """Product and category listings honour If-None-Match."""
+        self.assertNotModified(reverse("catalog:list"))
+        self.assertNotModified(reverse("catalog:product_list_by_category", args=["electronics"]))
+        self.assertNotModified(reverse("catalog:category_list_by_category", args=["electronics"]))
+
+    def test_detail_and_home_return_304(self):
+        """Product detail and home page honour If-None-Match."""
+        self.assertNotModified(reverse("catalog:detail", args=["smartphone"]))
+        self.assertNotModified(reverse("core:home"))
+
+    def test_last_modified_for_anonymous_viewers(self):
+        """Anonymous requests get Last-Modified and honour If-Modified-Since."""
+        url = reverse("catalog:detail", args=["smartphone"])
+        response = self.client.get(url)
+        self.assertTrue(response.has_header("Last-Modified"))
+        cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_etag_changes_when_product_changes(self):
+        """Saving a product invalidates the listing ETag."""
+        url = reverse("catalog:list")
+        etag = self.client.get(url)["ETag"]
+        self.product.price = Decimal("149.00")
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_changes_when_product_deleted(self):
+        """Deleting a product invalidates the listing ETag."""
+        other = Product.objects.create(category=self.category, title="Tablet", slug="tablet", price=Decimal("1"))
+        url = reverse("catalog:list")
+        etag = self.client.get(url)["ETag"]
+        other.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_varies_by_viewer(self):
+        """Logging in changes the ETag, since the navbar changes."""
+        from django.contrib.auth import get_user_model
+        url = reverse("catalog:list")
+        etag = self.client.get(url)["ETag"]
+        user = get_user_model().objects.create_user(email="a@example.com", username="a", password="pw")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class RenditionPipelineTest(TestCase):
+    """Test queuing image renditions and encoding them in the worker."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = self.settings(STORAGES={
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": media}},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        category = Category.objects.create(name="Shoes", slug="shoes")
+        self.product = Product.objects.create(category=category, title="Runner", slug="runner", price=Decimal("50.00"))
+
+    def upload(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), "red").save(buffer, format="PNG")
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductImage.objects.create(
+                product=self.product, image=SimpleUploadedFile("runner.png", buffer.getvalue()),
+            )
+
+    def test_upload_queues_job(self):
+        """Saving an image records a job instead of encoding renditions inline."""
+        image = self.upload()
+        job = RenditionJob.objects.get(file_name=image.image.name)
+        self.assertTrue(job.new)
+        self.assertFalse(image.renditions_ready)
+        for picture in image.image.get_picture_files_list():
+            self.assertFalse(image.image.storage.exists(picture.name))
+
+    def test_worker_renders_and_marks_ready(self):
+        """The worker encodes every rendition and flags the image as ready."""
+        image = self.upload()
+        version = catalog_version()
+        updated_at = Product.objects.get(pk=self.product.pk).updated_at
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(process_jobs(claim_jobs(10), executor), 1)
+        image.refresh_from_db()
+        self.assertTrue(image.renditions_ready)
+        # Pages showing the fallback markup get new validators
+        self.assertNotEqual(catalog_version(), version)
+        self.assertGreater(Product.objects.get(pk=self.product.pk).updated_at, updated_at)
+        self.assertEqual(RenditionJob.objects.get().status, RenditionJob.DONE)
+        for picture in image.image.get_picture_files_list():
+            self.assertTrue(image.image.storage.exists(picture.name))
+
+    def test_failed_job_retried_then_given_up(self):
+        """Failures are retried with backoff until RENDITION_MAX_ATTEMPTS."""
+        job = RenditionJob.objects.create(storage=default_storage.deconstruct(), file_name="missing.png", new=[["x", [], {}]])
+        with self.settings(RENDITION_MAX_ATTEMPTS=2), ThreadPoolExecutor(max_workers=1) as executor, \
+                self.assertLogs("catalog.renditions", "WARNING"):
+            process_jobs(claim_jobs(10), executor)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (RenditionJob.PENDING, 1))
+            self.assertGreater(job.run_after, timezone.now())
+            self.assertEqual(claim_jobs(10), [])
+
+            RenditionJob.objects.update(run_after=timezone.now())
+            process_jobs(claim_jobs(10), executor)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (RenditionJob.FAILED, 2))
+            self.assertTrue(job.last_error)
+
+    def test_template_falls_back_to_original(self):
+        """Until renditions exist, the tag renders the original image."""
+        image = self.upload()
+        template = engines["django"].from_string("{% load catalog_pictures %}{% catalog_picture image 'Runner' %}")
+        html = template.render({"image": image})
+        self.assertIn(f'src="{image.image.url}"', html)
+        self.assertNotIn("<picture", html)
+        image.renditions_ready = True
+        self.assertIn("<picture", template.render({"image": image}))
+
+
+class ProcessRenditionsCommandTest(TransactionTestCase):
+    """Test the worker command end to end with its process pool."""
+
+    def test_command_renders_queued_images(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        storages = {
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": media}},
+        }
+        with self.settings(STORAGES=storages):
+            category = Category.objects.create(name="Shoes", slug="shoes")
+            product = Product.objects.create(category=category, title="Runner", slug="runner", price=Decimal("50.00"))
+            buffer = io.BytesIO()
+            Image.new("RGB", (1200, 800), "blue").save(buffer, format="PNG")
+            image = ProductImage.objects.create(product=product, image=SimpleUploadedFile("runner.png", buffer.getvalue()))
+
+            call_command("process_renditions", workers=2, stdout=io.StringIO())
+
+            image.refresh_from_db()
+            self.assertTrue(image.renditions_ready)
+            for picture in image.image.get_picture_files_list():
+                self.assertTrue(image.image.storage.exists(picture.name))
+
+
+class RenamingStorage(FileSystemStorage):
+    """Saves every file under another name, like a storage resolving a collision."""
+
+    def get_available_name(self, name, max_length=None):
+        root, ext = os.path.splitext(name)
+        return f"{root}-renamed{ext}"
+
+
+class ImportProductImagesTest(TestCase):
+    """Test the bulk product image importer against a filesystem storage."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.addCleanup(shutil.rmtree, self.source)
+        override = self.settings(STORAGES={
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": self.media}},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        category = Category.objects.create(name="Shoes", slug="shoes")
+        self.runner = Product.objects.create(category=category, title="Runner", slug="runner", price=Decimal("50.00"))
+        self.boot = Product.objects.create(category=category, title="Boot", slug="boot", price=Decimal("80.00"))
+
+    def write_image(self, slug, filename, color):
+        os.makedirs(os.path.join(self.source, slug), exist_ok=True)
+        path = os.path.join(self.source, slug, filename)
+        Image.new("RGB", (600, 400), color).save(path)
+        return path
+
+    def test_import_directory(self):
+        """Images are uploaded once per content and attached with renditions queued."""
+        self.write_image("runner", "front.png", "red")
+        self.write_image("runner", "copy-of-front.png", "red")
+        self.write_image("runner", "side.png", "green")
+        self.write_image("boot", "front.png", "red")
+        self.write_image("sandal", "front.png", "blue")
+
+        out = io.StringIO()
+        call_command("import_product_images", self.source, workers=2, stdout=out)
+
+        self.assertEqual(self.runner.images.count(), 2)
+        self.assertEqual(self.boot.images.count(), 1)
+        self.assertEqual(len(os.listdir(os.path.join(self.media, "product_images"))), 2)
+        image = self.runner.images.get(image__startswith="product_images/front.")
+        self.assertEqual((image.picture_width, image.picture_height), (600, 400))
+        self.assertFalse(image.renditions_ready)
+        self.assertEqual(RenditionJob.objects.filter(file_name=image.image.name).count(), 1)
+        self.assertIn("1 for unknown products", out.getvalue())
+
+    def test_reimport_skips_existing(self):
+        """Running the import again creates nothing new."""
+        self.write_image("runner", "front.png", "red")
+        entries = scan_image_directory(self.source)
+        import_product_images(entries, workers=2)
+        stats = import_product_images(entries, workers=2)
+        self.assertEqual((stats["created"], stats["duplicate"], stats["uploaded"]), (0, 1, 0))
+        self.assertEqual(self.runner.images.count(), 1)
+
+    def test_rows_use_the_name_storage_saved(self):
+        """If the storage saves under another name, the row points at that file."""
+        self.write_image("runner", "front.png", "red")
+        import_product_images(scan_image_directory(self.source), storage=RenamingStorage(location=self.media))
+        image = self.runner.images.get()
+        self.assertTrue(image.image.name.endswith("-renamed.png"))
+        self.assertTrue(os.path.isfile(os.path.join(self.media, image.image.name)))
+        self.assertEqual(RenditionJob.objects.get().file_name, image.image.name)
+
+    def test_pending_job_not_duplicated(self):
+        """Attaching a stored file that already has a queued job doesn't queue another."""
+        self.write_image("runner", "front.png", "red")
+        import_product_images(scan_image_directory(self.source))
+        shutil.rmtree(os.path.join(self.source, "runner"))
+        self.write_image("boot", "front.png", "red")
+        stats = import_product_images(scan_image_directory(self.source))
+        self.assertEqual((stats["created"], stats["uploaded"]), (1, 0))
+        self.assertEqual(RenditionJob.objects.count(), 1)
+
+    def test_manifest(self):
+        """A CSV manifest maps relative paths to product slugs."""
+        self.write_image("anything", "a.png", "red")
+        manifest = os.path.join(self.source, "manifest.csv")
+        with open(manifest, "w") as f:
+            f.write("product_slug,path\nboot,anything/a.png\n")
+        self.assertEqual(read_image_manifest(manifest), [("boot", os.path.join(self.source, "anything/a.png"))])
+        call_command("import_product_images", manifest, stdout=io.StringIO())
+        self.assertEqual(self.boot.images.count(), 1)
+
+
+class ProductImportExportTest(TestCase):
+    """Test the CSV/JSONL product importer and exporter."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Shoes", slug="shoes")
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_import_csv_upserts_on_slug(self):
+        """Existing slugs are updated, new ones created, bad rows reported."""
+        Product.objects.create(category=self.category, title="Old", slug="runner", price=Decimal("1.00"))
+        path = self.write("products.csv", (
+            "slug,title,category,price,is_active\n"
+            "runner,Runner,shoes,50.00,true\n"
+            ",Boot,shoes,80,false\n"
+            ",Boot,shoes,81,true\n"
+            ",Sandal,hats,10,true\n"
+            ",Clog,shoes,cheap,true\n"
+        ))
+        err = io.StringIO()
+        call_command("import_products", path, chunk_size=2, stdout=io.StringIO(), stderr=err)
+
+        runner = Product.objects.get(slug="runner")
+        self.assertEqual((runner.title, runner.price), ("Runner", Decimal("50.00")))
+        self.assertFalse(Product.objects.get(slug="boot").is_active)
+        self.assertEqual(Product.objects.get(slug="boot-2").price, Decimal("81"))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertIn("line 5: unknown category 'hats'", err.getvalue())
+        self.assertIn("line 6: invalid price 'cheap'", err.getvalue())
+
+    def test_reimport_is_idempotent(self):
+        """Importing the same file with slugs twice updates rather than duplicates."""
+        path = self.write("products.jsonl", (
+            '{"slug": "boot", "title": "Boot", "category": "shoes", "price": 80}\n'
+            '{"slug": "boot-2", "title": "Boot", "category": "shoes", "price": 81}\n'
+        ))
+        call_command("import_products", path, stdout=io.StringIO())
+        call_command("import_products", path, stdout=io.StringIO())
+        self.assertEqual(sorted(Product.objects.values_list("slug", flat=True)), ["boot", "boot-2"])
+
+    def test_titles_never_overwrite_existing_products(self):
+        """Rows without a slug get a fresh one, skipping slugs in the table."""
+        Product.objects.create(category=self.category, title="Boot (old)", slug="boot", price=Decimal("1.00"))
+        path = self.write("products.csv", "title,category,price\nBoot,shoes,80\n")
+        call_command("import_products", path, stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(slug="boot").title, "Boot (old)")
+        self.assertEqual(Product.objects.get(slug="boot-2").price, Decimal("80"))
+
+    def test_slug_collisions_within_file_reported(self):
+        """A slug already used by an earlier row is an error, not a merge."""
+        path = self.write("products.csv", (
+            "slug,title,category,price\n"
+            ",Boot,shoes,80\n"
+            "boot,Other boot,shoes,81\n"
+            "cap,Cap,shoes,5\n"
+            "cap,Cap again,shoes,6\n"
+        ))
+        err = io.StringIO()
+        call_command("import_products", path, chunk_size=1, stdout=io.StringIO(), stderr=err)
+        self.assertEqual(Product.objects.get(slug="boot").price, Decimal("80"))
+        self.assertEqual(Product.objects.get(slug="cap").price, Decimal("5"))
+        self.assertIn("line 3: slug 'boot' is already used by an earlier row", err.getvalue())
+        self.assertIn("line 5: slug 'cap' is already used by an earlier row", err.getvalue())
+
+    def test_bad_rows_reported_not_fatal(self):
+        """Malformed lines and values the database would refuse become row errors."""
+        path = self.write("products.jsonl", (
+            '{"title": "Boot", "category": "shoes", "price": 80}\n'
+            '{"title": "Broken", \n'
+            '["not", "an", "object"]\n'
+            '{"title": "Nan", "category": "shoes", "price": "NaN"}\n'
+            '{"title": "Inf", "category": "shoes", "price": "Infinity"}\n'
+            '{"title": "Huge", "category": "shoes", "price": "1e20"}\n'
+            '{"title": "%s", "category": "shoes", "price": 1}\n'
+            '{"title": "Cap", "category": "shoes", "price": 5}\n'
+        ) % ("x" * 201))
+        err = io.StringIO()
+        call_command("import_products", path, stdout=io.StringIO(), stderr=err)
+        self.assertEqual(sorted(Product.objects.values_list("slug", flat=True)), ["boot", "cap"])
+        for message in (
+            "line 2: invalid JSON", "line 3: not a JSON object", "line 4: invalid price 'NaN'",
+            "line 5: invalid price 'Infinity'", "line 6: price '1e20' is too large",
+            "line 7: title is longer than 200 characters",
+        ):
+            self.assertIn(message, err.getvalue())
+
+    def test_create_categories(self):
+        """Unknown categories are created when asked to."""
+        path = self.write("products.csv", "title,category,price\nCap,Hats,5\n")
+        call_command("import_products", path, create_categories=True, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Product.objects.get(slug="cap").category.name, "Hats")
+
+    def test_export_round_trip(self):
+        """The export can be fed back to the importer."""
+        Product.objects.create(category=self.category, title="Runner", slug="runner", price=Decimal("50.00"))
+        path = os.path.join(self.directory, "out.csv")
+        call_command("export_products", path, stderr=io.StringIO())
+        with open(path) as f:
+            self.assertEqual(list(csv.DictReader(f))[0]["slug"], "runner")
+
+        out = io.StringIO()
+        call_command("export_products", format="jsonl", stdout=out, stderr=io.StringIO())
+        record = json.loads(out.getvalue())
+        self.assertEqual((record["category"], record["price"]), ("shoes", "50.00"))
+
+        Product.objects.all().delete()
+        call_command("import_products", path, stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(slug="runner").price, Decimal("50.00"))
+
+
+class SlugAllocationTest(TestCase):
+    """Test unique slug allocation for products and categories."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Shoes")
+
+    def create(self, title):
+        return Product.objects.create(category=self.category, title=title, price=Decimal("1.00"))
+
+    def test_save_suffixes_duplicate_titles(self):
+        """Saving products with the same title gives each a unique slug."""
+        slugs = [self.create("Running Shoe").slug for _ in range(3)]
+        self.assertEqual(slugs, ["running-shoe", "running-shoe-2", "running-shoe-3"])
+        self.assertEqual(Category.objects.create(name="Shoes!").slug, "shoes-2")
+
+    def test_batch_uses_one_query(self):
+        """A batch of titles is checked against the table in one query."""
+        self.create("Boot")
+        self.create("Boot")
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(Product, ["Boot", "Boot", "Sandal", "Bootee"])
+        self.assertEqual(slugs, ["boot-3", "boot-4", "sandal", "bootee"])
+
+    def test_long_titles_fit_max_length(self):
+        """Suffixes replace the end of slugs that are already at max_length."""
+        title = "x" * 80
+        first, second = self.create(title).slug, self.create(title).slug
+        self.assertEqual(len(first), 50)
+        self.assertEqual(second, "x" * 48 + "-2")
+
+    def test_resave_keeps_slug(self):
+        """An instance never collides with itself."""
+        product = self.create("Boot")
+        self.assertEqual(unique_slug(product, "Boot"), "boot")
+
+
+class AmazonSyncTest(TestCase):
+    """Test the Product Advertising API sync against recorded responses."""
+
+    def setUp(self):
+        category = Category.objects.create(name="Shoes", slug="shoes")
+        self.products = [
+            Product.objects.create(
+                category=category, title=f"Shoe {i}", slug=f"shoe-{i}", price=Decimal("10.00"),
+                asin=f"B0000000{i:02d}", availability="In Stock",
+            )
+            for i in range(25)
+        ]
+        Product.objects.create(category=category, title="No ASIN", slug="no-asin", price=Decimal("1.00"))
+        self.responses = {
+            p.asin: {"asin": p.asin, "title": p.title, "price": "10.00", "availability": "In Stock"}
+            for p in self.products
+        }
+        self.bucket = TokenBucket(rate=1000, capacity=10)
+
+    def test_batches_of_ten_and_changed_fields_only(self):
+        """ASINs are fetched ten per call and only changed rows are written."""
+        self.responses["B000000003"]["price"] = "12.50"
+        del self.responses["B000000007"]
+        client = RecordedClient(self.responses)
+        stats = sync_products(client, self.bucket, products_due(timedelta(hours=24)))
+
+        self.assertEqual([len(call) for call in client.calls], [10, 10, 5])
+        self.assertEqual((stats["checked"], stats["updated"]), (25, 2))
+        self.assertEqual(Product.objects.get(asin="B000000003").price, Decimal("12.50"))
+        self.assertEqual(Product.objects.get(asin="B000000007").availability, "Unavailable")
+        self.assertFalse(Product.objects.filter(asin__isnull=False, amazon_synced_at__isnull=True).exists())
+
+    def test_resumes_after_interruption(self):
+        """A second run only fetches the products the first one didn't reach."""
+        sync_products(RecordedClient(self.responses), self.bucket, products_due(timedelta(hours=24)), limit=12)
+        client = RecordedClient(self.responses)
+        stats = sync_products(client, self.bucket, products_due(timedelta(hours=24)))
+        self.assertEqual(stats["checked"], 13)
+        self.assertNotIn("B000000000", sum(client.calls, []))
+
+    def test_long_values_truncated(self):
+        """Over-long titles and availability messages are cut to their field's max_length."""
+        self.responses["B000000004"]["title"] = "T" * 500
+        self.responses["B000000004"]["availability"] = "Usually ships within 1 to 2 months. " * 10
+        sync_products(RecordedClient(self.responses), self.bucket, products_due(timedelta(hours=24)))
+        product = Product.objects.get(asin="B000000004")
+        self.assertEqual(len(product.title), Product._meta.get_field("title").max_length)
+        self.assertEqual(len(product.availability), Product._meta.get_field("availability").max_length)
+
+    def test_token_bucket(self):
+        """Calls beyond the burst wait for tokens to refill."""
+        now = [0.0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(4):
+            bucket.acquire()
+        self.assertEqual(slept, [0.5, 0.5])
+
+    def test_command_replays_recorded_responses(self):
+        """The command runs offline from a file saved by RecordingClient."""
+        path = os.path.join(tempfile.mkdtemp(), "responses.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        recorder = RecordingClient(RecordedClient(self.responses), path)
+        recorder.get_items(["B000000001"])
+        with open(path) as f:
+            self.assertIn("B000000001", json.load(f))
+
+        self.responses["B000000001"]["title"] = "Renamed"
+        with open(path, "w") as f:
+            json.dump(self.responses, f)
+        with self.settings(AMAZON_PAAPI_RATE=1000, AMAZON_PAAPI_BURST=10):
+            call_command("sync_amazon_products", replay=path, stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(asin="B000000001").title, "Renamed")
+
+
+class CatalogApiTest(TestCase):
+    """Test the read-only catalog API."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Shoes", slug="shoes")
+        for i in range(5):
+            product = Product.objects.create(
+                category=self.category, title=f"Shoe {i}", slug=f"shoe-{i}", price=Decimal("10.00"), asin=f"B00000000{i}",
+            )
+            for _ in range(2):
+                ProductImage.objects.create(product=product, image=f"product_images/shoe-{i}.png", picture_width=10, picture_height=10)
+        Product.objects.create(category=self.category, title="Hidden", slug="hidden", price=Decimal("1.00"), is_active=False)
+
+    def test_product_list(self):
+        """The list is paginated by cursor in a single query."""
+        url = reverse("v1:product-list")
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([p["slug"] for p in data["results"]], ["shoe-4", "shoe-3"])
+        self.assertEqual(data["results"][0]["category_name"], "Shoes")
+        self.assertTrue(data["results"][0]["main_image"].endswith("shoe-4.png"))
+        self.assertIn("cursor=", data["next"])
+
+        following = self.client.get(data["next"]).json()
+        self.assertEqual([p["slug"] for p in following["results"]], ["shoe-2", "shoe-1"])
+
+    def test_product_detail(self):
+        """Detail includes the ASIN, affiliate link and all images."""
+        data = self.client.get(reverse("v1:product-detail", args=["shoe-1"])).json()
+        self.assertEqual(data["asin"], "B000000001")
+        self.assertIn("affiliate_link", data)
+        self.assertEqual(len(data["images"]), 2)
+        self.assertEqual(self.client.get(reverse("v1:product-detail", args=["hidden"])).status_code, 404)
+
+    def test_categories(self):
+        """Categories report their active product count."""
+        data = self.client.get(reverse("v1:category-list")).json()
+        self.assertEqual(data["results"][0]["product_count"], 5)
+
+    def test_responses_cached_until_catalog_changes(self):
+        """Repeat requests are served from cache; a write invalidates them."""
+        url = reverse("v1:product-list")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        Product.objects.filter(slug="shoe-0").update(title="Renamed")
+        bump_catalog_version()
+        titles = [p["title"] for p in self.client.get(url).json()["results"]]
+        self.assertIn("Renamed", titles)
+
+
+class LeanSerializerTest(TestCase):
+    """Test that the lean serializer mode renders what the regular serializers do."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.category = Category.objects.create(name="Bags", slug="bags")
+        CategoryImage.objects.create(category=self.category, image="category_images/bags.png", picture_width=10, picture_height=10)
+        for i in range(3):
+            product = Product.objects.create(category=self.category, title=f"Bag {i}", slug=f"bag-{i}", price=Decimal("12.50"))
+            if i:
+                ProductImage.objects.create(product=product, image=f"product_images/bag-{i}.png", picture_width=10, picture_height=10)
+        Product.objects.create(category=self.category, title="Gone", slug="gone", price=Decimal("1.00"), is_active=False)
+
+    def render(self, data):
+        return json.loads(FastJSONRenderer().render(data))
+
+    def test_products_match(self):
+        queryset = Product.objects.order_by("pk")
+        drf = ProductListSerializer(queryset.select_related("category"), many=True).data
+        lean = ProductListSerializer.lean_data(ProductListSerializer.lean_queryset(queryset))
+        self.assertEqual(self.render(lean), json.loads(JSONRenderer().render(drf)))
+
+    def test_categories_match(self):
+        request = self.factory.get("/")
+        queryset = Category.objects.order_by("pk")
+        drf = CategorySerializer(queryset.with_stats(), many=True, context={"request": request}).data
+        category_stats()
+        with self.assertNumQueries(2):
+            lean = CategorySerializer.lean_data(CategorySerializer.lean_queryset(queryset), request)
+        self.assertEqual(self.render(lean), json.loads(JSONRenderer().render(drf)))
+        self.assertEqual(lean[0]["product_count"], 3)
+        self.assertTrue(lean[0]["images"][0]["image"].endswith("/category_images/bags.png"))
+
+    def test_renderer_falls_back_without_orjson(self):
+        data = {"price": Decimal("1.50"), "at": timezone.now()}
+        with mock.patch("shop.renderers.orjson", None):
+            self.assertEqual(self.render(data), json.loads(JSONRenderer().render(data)))
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("bench_catalog_serializers", rows=20, repeat=1, stdout=out)
+        self.assertIn("rows/s", out.getvalue())
+        self.assertEqual(Product.objects.count(), 4)
+
+
+class CategoryStatsTest(TestCase):
+    """Test the per-category stats shared by the listings and the API."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Hats", slug="hats")
+        self.empty = Category.objects.create(name="Gloves", slug="gloves")
+        for i, price in enumerate(["5.00", "20.00", "12.50"]):
+            product = Product.objects.create(category=self.category, title=f"Hat {i}", slug=f"hat-{i}", price=Decimal(price))
+            ProductImage.objects.create(product=product, image=f"product_images/hat-{i}.png", picture_width=10, picture_height=10)
+        Product.objects.create(category=self.category, title="Old hat", slug="old-hat", price=Decimal("99.00"), is_active=False)
+        for i in range(2):
+            CategoryImage.objects.create(category=self.category, image=f"category_images/hats-{i}.png", picture_width=10, picture_height=10)
+
+    def test_with_stats(self):
+        """Counts and the price range only cover active products, in one query."""
+        with self.assertNumQueries(1):
+            hats, gloves = Category.objects.with_stats().order_by("-name")
+        self.assertEqual((hats.product_count, hats.image_count), (3, 2))
+        self.assertEqual((hats.min_price, hats.max_price), (Decimal("5.00"), Decimal("20.00")))
+        self.assertEqual((gloves.product_count, gloves.image_count, gloves.min_price), (0, 0, None))
+
+    def test_cached_until_catalog_changes(self):
+        attach_category_stats([self.category])
+        with self.assertNumQueries(0):
+            self.assertEqual(category_stats()[self.category.pk]["product_count"], 3)
+        Product.objects.create(category=self.category, title="New hat", slug="new-hat", price=Decimal("1.00"))
+        self.assertEqual(category_stats()[self.category.pk]["product_count"], 4)
+
+    def test_views_and_api(self):
+        response = self.client.get(reverse("catalog:list"))
+        self.assertContains(response, "Hats <small")
+        self.assertContains(self.client.get(reverse("catalog:category_list_by_category", args=["hats"])), "3 products")
+        data = self.client.get(reverse("v1:category-list")).json()["results"]
+        self.assertEqual(
+            [(c["slug"], c["product_count"], c["min_price"], c["max_price"]) for c in data],
+            [("gloves", 0, None, None), ("hats", 3, "5.00", "20.00")],
+        )
+        detail = self.client.get(reverse("v1:category-detail", args=["hats"])).json()
+        self.assertEqual(detail["image_count"], 2)
+
+
+class CatalogQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """Test that the catalog pages stay within their query budgets with many rows."""
+
+    def setUp(self):
+        for i in range(4):
+            category = Category.objects.create(name=f"Range {i}", slug=f"range-{i}")
+            CategoryImage.objects.create(category=category, image="category_images/range.png", picture_width=10, picture_height=10)
+            for j in range(6):
+                product = Product.objects.create(category=category, title=f"Item {i}-{j}", slug=f"item-{i}-{j}", price=Decimal("3.00"))
+                ProductImage.objects.create(product=product, image=f"product_images/item-{i}-{j}.png", picture_width=10, picture_height=10)
+
+    def test_pages(self):
+        for path in (
+            reverse("core:home"),
+            reverse("catalog:list"),
+            reverse("catalog:category_list_by_category", args=["range-1"]),
+            reverse("catalog:detail", args=["item-1-1"]),
+            reverse("catalog:search") + "?q=Item",
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.assertViewWithinBudget(path).status_code, 200)
+
+    def test_main_image_is_first_by_pk(self):
+        """Templates and the API agree on the main image: the lowest pk."""
+        product = Product.objects.get(slug="item-1-1")
+        ProductImage.objects.create(product=product, image="product_images/second.png", picture_width=10, picture_height=10)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("catalog:detail", args=["item-1-1"]))
+        image_queries = [q["sql"] for q in queries.captured_queries if 'FROM "catalog_productimage"' in q["sql"]]
+        self.assertTrue(image_queries)
+        for sql in image_queries:
+            self.assertIn('ORDER BY "catalog_productimage"."id" ASC', sql)
@@ -0,0 +1,101 @@
+"""
+Cheap version stamps for catalog pages.
+
+A stamp is the latest ``updated_at`` and the row count of a set of products
+or categories; it changes whenever a row in the set is saved, added or
+deleted. Stamps are cached under a catalog version number that the signals
+in catalog.signals bump on every write, so a conditional GET normally costs
+a cache lookup and no queries.
+
+Per-category stats (``category_stats``) are cached the same way, so the
+listing sidebars and the API share one GROUP BY per catalog version.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Category, Product
+
+VERSION_KEY = "catalog:version"
+STAMP_TIMEOUT = 60  # bounds staleness when the cache is not shared between workers
+
+
+def catalog_version():
+    """Return the current catalog version number."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a flushed cache never reuses an old version.
+        cache.add(VERSION_KEY, int(time.time()), None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached stamp (and anything else keyed on the version)."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time()), None)
+
+
+def _cached(key, compute):
+    key = f"catalog:{catalog_version()}:{key}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, STAMP_TIMEOUT)
+    return value
+
+
+def product_stamp(category_slug=None):
+    """Return ``(updated_at, count)`` for all products or one category's products."""
+    def compute():
+        products = Product.objects.order_by()
+        if category_slug:
+            products = products.filter(category__slug=category_slug)
+        stamp = products.aggregate(updated=Max("updated_at"), count=Count("pk"))
+        return stamp["updated"], stamp["count"]
+
+    return _cached(f"products:{category_slug or '*'}", compute)
+
+
+def category_stamp():
+    """Return ``(updated_at, count)`` for all categories."""
+    def compute():
+        stamp = Category.objects.aggregate(updated=Max("updated_at"), count=Count("pk"))
+        return stamp["updated"], stamp["count"]
+
+    return _cached("categories", compute)
+
+
+def product_detail_stamp(slug):
+    """Return ``(product updated_at, category updated_at)``, or ``(None, None)`` if missing."""
+    def compute():
+        row = (
+            Product.objects.filter(slug=slug, is_active=True)
+            .values_list("updated_at", "category__updated_at")
+            .first()
+        )
+        return row or (None, None)
+
+    return _cached(f"product:{slug}", compute)
+
+
+def category_stats():
+    """Return ``{category_id: {stat: value}}`` from ``CategoryQuerySet.with_stats``."""
+    def compute():
+        rows = Category.objects.with_stats().order_by().values("pk", *Category.STAT_FIELDS)
+        return {row.pop("pk"): row for row in rows}
+
+    return _cached("category-stats", compute)
+
+
+def attach_category_stats(categories):
+    """Set the cached stats as attributes on ``categories``; returns them as a list."""
+    stats = category_stats()
+    categories = list(categories)
+    for category in categories:
+        for field, value in stats.get(category.pk, {}).items():
+            setattr(category, field, value)
+    return categories
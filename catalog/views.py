@@ -2,15 +2,59 @@ from django.shortcuts import render, get_object_or_404
 from .models import Product, Category
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import condition
+from shop.conditional import is_anonymous_viewer, make_etag, viewer_fingerprint
+from shop.querybudget import query_budget
+from .versioning import attach_category_stats, category_stamp, product_detail_stamp, product_stamp
 
 
+def _categories():
+    """Categories for the sidebar with their cached stats, loaded only if the template uses them."""
+    return SimpleLazyObject(lambda: attach_category_stats(Category.objects.prefetch_related('images')))
+
+
+def _listing_etag(request, category_slug=None):
+    viewer = viewer_fingerprint(request)
+    if viewer is None:
+        return None
+    return make_etag(product_stamp(category_slug), category_stamp(), viewer)
+
+
+def _listing_last_modified(request, category_slug=None):
+    if not is_anonymous_viewer(request):
+        return None
+    stamps = [product_stamp(category_slug)[0], category_stamp()[0]]
+    return max((stamp for stamp in stamps if stamp), default=None)
+
+
+def _detail_etag(request, slug):
+    viewer = viewer_fingerprint(request)
+    if viewer is None:
+        return None
+    return make_etag(product_detail_stamp(slug), viewer)
+
+
+def _detail_last_modified(request, slug):
+    if not is_anonymous_viewer(request):
+        return None
+    stamps = product_detail_stamp(slug)
+    return max((stamp for stamp in stamps if stamp), default=None)
+
+
+listing_condition = condition(etag_func=_listing_etag, last_modified_func=_listing_last_modified)
+
+
+@query_budget(12)
+@listing_condition
 def category_list(request, category_slug=None):
     category = None
     products = Product.objects.prefetch_related('images').all()
-    categories = Category.objects.prefetch_related('images').all()
+    categories = _categories()
     
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
+        attach_category_stats([category])
         products = products.filter(category=category, is_active=True).order_by('-id')
         
     # products = Product.objects.all().order_by('-id')   # or any ordering you prefer
@@ -33,14 +77,17 @@ def category_list(request, category_slug=None):
     })
 
 
+@query_budget(12)
+@listing_condition
 def product_list(request, category_slug=None):
     category = None
     products = Product.objects.prefetch_related('images').all()
-    categories = Category.objects.prefetch_related('images').all()
+    categories = _categories()
 
     
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
+        attach_category_stats([category])
         products = products.filter(category=category, is_active=True).order_by('-id')
     
     # products = Product.objects.all().order_by('-id')   # or any ordering you prefer
@@ -58,11 +105,14 @@ def product_list(request, category_slug=None):
     return render(request, 'catalog/list.html', {'products': products, 'categories': categories, 'page_obj': page_obj, 'category': category})
 
 
+@query_budget(10)
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
 def product_detail(request, slug):
     product = get_object_or_404(Product.objects.prefetch_related('images'), slug=slug, is_active=True)
     return render(request, 'catalog/detail.html', {'product': product})
 
 
+@query_budget(10)
 def search_product(request):
     query = request.GET.get("q", "")
     products = Product.objects.prefetch_related('images').all()
@@ -0,0 +1,43 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory
+
+from shop.middleware import SecurityHeadersMiddleware
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead of SecurityHeadersMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        request = RequestFactory().get("/")
+        nonce_template = engines["django"].from_string("<script nonce=\"{{ request.csp_nonce }}\"></script>")
+
+        def plain_view(request):
+            return HttpResponse("ok")
+
+        def nonce_view(request):
+            return HttpResponse(nonce_template.render({"request": request}))
+
+        cases = [
+            ("no middleware", plain_view),
+            ("headers", SecurityHeadersMiddleware(plain_view)),
+            ("no middleware + template", nonce_view),
+            ("headers + nonce", SecurityHeadersMiddleware(nonce_view)),
+        ]
+        results = {}
+        for label, handler in cases:
+            seconds = min(timeit.repeat(lambda: handler(request), number=iterations, repeat=3))
+            results[label] = seconds / iterations * 1_000_000
+            self.stdout.write(f"{label:<26} {results[label]:8.2f} µs/request")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Overhead: {results['headers'] - results['no middleware']:.2f} µs/request, "
+            f"{results['headers + nonce'] - results['no middleware + template']:.2f} µs/request with a nonce"
+        ))
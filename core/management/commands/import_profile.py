@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a web worker imports before serving its first request: the WSGI
+# application (apps, models, middleware) and the URLconf with every view.
+BOOT_SCRIPT = (
+    "import {wsgi_module}\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``python -X importtime`` output into ``[(module, self_us, cumulative_us, depth)]``.
+    Depth 0 entries are the ones imported directly by the script.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip()
+        # One space after the bar, then two more per nesting level
+        depth = (len(name) - len(stripped) - 1) // 2
+        entries.append((stripped, int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def summarize(entries):
+    """Total self time per top-level package, largest first (adds up to the boot total)."""
+    packages = defaultdict(int)
+    for name, self_us, _cumulative_us, _depth in entries:
+        packages[name.split(".")[0]] += self_us
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+class Command(BaseCommand):
+    help = "Report per-module import time for a worker boot (summarized python -X importtime)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=25, help="Rows to show per table.")
+        parser.add_argument("--module", action="append", default=[], help="Also import this module after boot.")
+
+    def handle(self, *args, **options):
+        wsgi_module = settings.WSGI_APPLICATION.rsplit(".", 1)[0]
+        script = BOOT_SCRIPT.format(wsgi_module=wsgi_module)
+        script += "".join(f"import {module}\n" for module in options["module"])
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        entries = parse_importtime(result.stderr)
+        if result.returncode:
+            lines = result.stderr.strip().splitlines()
+            raise CommandError(lines[-1] if lines else f"Boot failed with exit status {result.returncode}")
+
+        limit = options["limit"]
+        total_us = sum(cumulative for _name, _self, cumulative, depth in entries if depth == 0)
+        self.stdout.write(f"{'package':<40} {'self total':>12}")
+        for package, self_us in summarize(entries)[:limit]:
+            self.stdout.write(f"{package:<40} {self_us / 1000:>9.1f} ms")
+
+        self.stdout.write(f"\n{'slowest imports':<40} {'cumulative':>12}")
+        for name, _self, cumulative_us, _depth in sorted(entries, key=lambda e: e[2], reverse=True)[:limit]:
+            self.stdout.write(f"{name:<40} {cumulative_us / 1000:>9.1f} ms")
+
+        self.stdout.write(self.style.SUCCESS(f"\n{len(entries)} modules imported in {total_us / 1000:.1f} ms"))
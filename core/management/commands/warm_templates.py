@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = "Compile every project template and report the compile time of each."
+
+    def add_arguments(self, parser):
+        parser.add_argument("templates", nargs="*", help="Template names (default: all under templates/).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        timings = warm_templates(options["templates"] or None)
+        for name, seconds in sorted(timings, key=lambda item: item[1], reverse=True):
+            self.stdout.write(f"{seconds * 1000:8.2f} ms  {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(timings)} template(s) compiled in {(time.perf_counter() - started) * 1000:.1f} ms"
+        ))
@@ -1,3 +1,72 @@
-from django.test import TestCase
+import subprocess
+import sys
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.template import engines
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from core.management.commands.import_profile import parse_importtime, summarize
+from core.warmup import project_templates, warm_templates
+
+
+class TemplateWarmupTest(SimpleTestCase):
+    """Test compiling templates into the cached loader at worker start."""
+
+    def setUp(self):
+        self.engine = engines["django"].engine
+        self.engine.template_loaders[0].reset()
+
+    def test_all_project_templates_compiled(self):
+        """Every template under templates/ is compiled and timed."""
+        timings = warm_templates()
+        self.assertEqual([name for name, _ in timings], project_templates())
+        self.assertIn("base.html", dict(timings))
+
+    def test_templates_cached_after_warmup(self):
+        """After the warm-up, the cached loader returns templates without reparsing."""
+        warm_templates(["base.html"])
+        loader = self.engine.template_loaders[0]
+        self.assertIn("base.html", {key.split("-")[0] for key in loader.get_template_cache})
+
+
+class ImportProfileTest(SimpleTestCase):
+    """Test parsing and summarizing ``python -X importtime`` output."""
+
+    OUTPUT = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |     botocore.utils\n"
+        "import time:       300 |        400 |   botocore\n"
+        "import time:        50 |        450 | boto3\n"
+        "import time:        20 |         20 | shop.compression\n"
+    )
+
+    def test_parse(self):
+        """Each line becomes (module, self, cumulative, depth)."""
+        entries = parse_importtime(self.OUTPUT)
+        self.assertEqual(entries[0], ("botocore.utils", 100, 100, 2))
+        self.assertEqual(entries[2], ("boto3", 50, 450, 0))
+
+    def test_summarize_by_package(self):
+        """Self time is totalled per top-level package."""
+        summary = summarize(parse_importtime(self.OUTPUT))
+        self.assertEqual(summary, [("botocore", 400), ("boto3", 50), ("shop", 20)])
+
+    def test_boot_does_not_import_heavy_modules(self):
+        """Loading the models and URLconf leaves the lazily imported modules alone."""
+        script = (
+            "import sys, django; django.setup()\n"
+            "from django.urls import get_resolver; get_resolver().url_patterns\n"
+            "print(' '.join(m for m in ('boto3', 'mailchimp_marketing', 'pycountry', 'phonenumbers') if m in sys.modules))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=settings.BASE_DIR)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_failed_boot_without_output(self):
+        """A boot that dies without printing anything still reports a clean error."""
+        failed = subprocess.CompletedProcess([], returncode=-9, stdout="", stderr="")
+        with mock.patch("subprocess.run", return_value=failed):
+            with self.assertRaisesMessage(CommandError, "exit status -9"):
+                call_command("import_profile")
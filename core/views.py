@@ -5,10 +5,29 @@ from datetime import datetime
 from django.core.exceptions import PermissionDenied
 from django.http import HttpResponse
 from django.conf import settings
+from django.views.decorators.http import condition
+from catalog.versioning import product_stamp
+from shop.conditional import is_anonymous_viewer, make_etag, viewer_fingerprint
+from shop.querybudget import query_budget
 
 CONSENT_COOKIE_NAME = "cookie_consent"
 CONSENT_MAX_AGE = 365 * 24 * 60 * 60  # one year
 
+def _home_etag(request):
+    viewer = viewer_fingerprint(request)
+    if viewer is None:
+        return None
+    return make_etag(product_stamp(), viewer)
+
+
+def _home_last_modified(request):
+    if not is_anonymous_viewer(request):
+        return None
+    return product_stamp()[0]
+
+
+@query_budget(8)
+@condition(etag_func=_home_etag, last_modified_func=_home_last_modified)
 def home(request):
     products = Product.objects.prefetch_related('images').filter(is_active=True)[:40]
     return render(request, 'core/home.html', {'products': products})
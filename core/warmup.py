@@ -0,0 +1,47 @@
+"""
+Template warm-up for freshly started workers.
+
+With the cached template loader each worker parses a template the first time
+it is used, so the first requests after a deploy pay the compile cost.
+``warm_templates`` compiles every template under the project templates dir
+up front; gunicorn calls it from ``post_worker_init`` (see gunicorn.conf.py).
+"""
+import logging
+import os
+import time
+
+from django.template import TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+
+def project_templates(engine=None):
+    """Names of every template under the engine's DIRS, relative to their dir."""
+    engine = engine or engines["django"].engine
+    names = []
+    for directory in engine.dirs:
+        for root, _dirs, files in os.walk(directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                names.append(os.path.relpath(path, directory).replace(os.sep, "/"))
+    return sorted(names)
+
+
+def warm_templates(names=None):
+    """
+    Compile the given templates (default: all project templates) into the
+    cached loader and return ``[(name, seconds)]``. Templates that fail to
+    compile are logged and skipped so a bad template cannot stop a worker
+    from booting; the error will surface again on the request that uses it.
+    """
+    engine = engines["django"].engine
+    timings = []
+    for name in names if names is not None else project_templates(engine):
+        started = time.perf_counter()
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError:
+            logger.exception("Template %s failed to compile during warm-up", name)
+            continue
+        timings.append((name, time.perf_counter() - started))
+    return timings
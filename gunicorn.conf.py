@@ -0,0 +1,19 @@
+"""Gunicorn settings (picked up automatically from the working directory)."""
+import time
+
+
+def post_worker_init(worker):
+    """Compile every template before the worker accepts its first request."""
+    from core.warmup import warm_templates
+
+    started = time.perf_counter()
+    timings = warm_templates()
+    slowest = sorted(timings, key=lambda item: item[1], reverse=True)[:5]
+    worker.log.info(
+        "Warmed %d templates in %.1f ms (slowest: %s)",
+        len(timings),
+        (time.perf_counter() - started) * 1000,
+        ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in slowest),
+    )
+    for name, seconds in timings:
+        worker.log.debug("Compiled %s in %.2f ms", name, seconds * 1000)
@@ -33,10 +33,16 @@ class Cart:
     def save(self):
         self.session.modified = True
  
+    def products(self):
+        """The cart's products, fetched once however many times items() is called."""
+        product_ids = sorted(int(pid) for pid in self.cart.keys())
+        if getattr(self, "_product_ids", None) != product_ids:
+            self._products = list(Product.objects.filter(id__in=product_ids))
+            self._product_ids = product_ids
+        return self._products
+
     def items(self):
-        product_ids = [int(pid) for pid in self.cart.keys()]
-        products = Product.objects.filter(id__in=product_ids)
-        for p in products:
+        for p in self.products():
             data = self.cart[str(p.id)]
             yield {
                 'title': data['title'],
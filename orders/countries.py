@@ -0,0 +1,53 @@
+"""
+Country choice tables for the checkout form.
+
+Building these walks every pycountry country and asks phonenumbers for its
+dialing code, which is far too slow to repeat per form. They are computed on
+first use and shared by every form in the process.
+"""
+import threading
+
+_lock = threading.Lock()
+_tables = None
+
+
+def _build():
+    import phonenumbers
+    import pycountry
+
+    country = [('', 'Select Country')]
+    phone = [('', '-- Select Country --')]
+    for c in pycountry.countries:
+        country.append((c.alpha_2, c.name))
+    for c in sorted(pycountry.countries, key=lambda x: x.name):
+        # Territories without a dialing code (e.g. Antarctica) are left out
+        phone_code = phonenumbers.country_code_for_region(c.alpha_2)
+        if phone_code:
+            phone.append((c.alpha_2, f"{c.name} (+{phone_code})"))
+    return tuple(country), tuple(phone)
+
+
+def _get_tables():
+    global _tables
+    if _tables is None:
+        with _lock:
+            if _tables is None:
+                _tables = _build()
+    return _tables
+
+
+def country_choices():
+    """``(alpha_2, name)`` choices for the address country."""
+    return _get_tables()[0]
+
+
+def phone_country_choices():
+    """``(alpha_2, "Name (+code)")`` choices for the phone number's country, sorted by name."""
+    return _get_tables()[1]
+
+
+def reset():
+    """Drop the cached tables (used by the checkout form benchmark)."""
+    global _tables
+    with _lock:
+        _tables = None
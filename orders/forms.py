@@ -1,30 +1,17 @@
 from django import forms
 from .models import Address
+from .countries import country_choices, phone_country_choices
 from django.utils.safestring import mark_safe
-import pycountry
-import phonenumbers
 import re
 
 class PhoneNumberWidget(forms.MultiWidget):
     """Custom widget for phone number with country code and area code."""
     
     def __init__(self, attrs=None):
-        # Get country codes with dialing prefixes
-        country_choices = [('', '-- Select Country --')]
-        for country in sorted(pycountry.countries, key=lambda x: x.name):
-            try:
-                # Try to get the dialing code
-                phone_code = phonenumbers.country_code_for_region(country.alpha_2)
-                if phone_code:
-                    country_choices.append(
-                        (country.alpha_2, f"{country.name} (+{phone_code})")
-                    )
-            except:
-                country_choices.append((country.alpha_2, country.name))
-        
+        # Country codes with dialing prefixes, built once per process
         widgets = (
             forms.Select(
-                choices=country_choices,
+                choices=phone_country_choices,
                 attrs={'class': 'form-control form-select', 'id': 'id_phone_country', "autocomplete": "phone country"}
             ),
             forms.TextInput(attrs={
@@ -38,6 +25,8 @@ class PhoneNumberWidget(forms.MultiWidget):
     
     def decompress(self, value):
         """Split phone number into country code and number."""
+        import phonenumbers
+
         if value:
             try:
                 parsed = phonenumbers.parse(value, None)
@@ -51,6 +40,10 @@ class PhoneNumberWidget(forms.MultiWidget):
 class CheckoutForm(forms.ModelForm):
     # Override phone field to use custom MultiWidget
     phone = forms.CharField(widget=PhoneNumberWidget(), required=True)
+    country = forms.ChoiceField(
+        choices=country_choices,
+        widget=forms.Select(attrs={'class': 'form-control', 'autocomplete': 'country'}),
+    )
     
     class Meta:
         model = Address
@@ -82,14 +75,6 @@ class CheckoutForm(forms.ModelForm):
         
         for field_name, suggestion in suggestions.items():
             self.fields[field_name].help_text = mark_safe(f'<small class="text-muted">{suggestion}</small>')
-        
-        # Setup country dropdown with pycountry
-        country_choices = [(country.alpha_2, country.name) for country in pycountry.countries]
-        self.fields['country'] = forms.ChoiceField(
-            choices=[('', 'Select Country')] + country_choices,
-            widget=forms.Select(attrs={'class': 'form-control', 'autocomplete': 'country'}),
-            help_text=self.fields['country'].help_text
-        )
 
     def clean_full_name(self):
         full_name = self.cleaned_data.get('full_name', '').strip()
@@ -109,6 +94,8 @@ class CheckoutForm(forms.ModelForm):
 
     def clean_phone(self):
         """Validate phone number using phonenumbers library."""
+        import phonenumbers
+
         phone_data = self.cleaned_data.get('phone')
         
         # phone_data comes from MultiWidget as [country_code, number]
@@ -144,6 +131,8 @@ class CheckoutForm(forms.ModelForm):
             raise forms.ValidationError(f"Phone number format is invalid: {str(e)}")
 
     def clean_country(self):
+        import pycountry
+
         country = self.cleaned_data.get('country', '').strip()
         if not country:
             raise forms.ValidationError("Country is required.")
@@ -158,6 +147,8 @@ class CheckoutForm(forms.ModelForm):
     
     def clean_state(self):
         """Clean and validate state/province."""
+        import pycountry
+
         state = self.cleaned_data.get('state', '').strip()
         country = self.cleaned_data.get('country', '')
         
@@ -0,0 +1,38 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from orders import countries
+from orders.forms import CheckoutForm
+
+
+class Command(BaseCommand):
+    help = "Measure CheckoutForm construction with cold and warm country tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+
+        def build():
+            form = CheckoutForm()
+            # Choices are lazy; iterate them as rendering would
+            list(form.fields["country"].choices)
+            list(form.fields["phone"].widget.widgets[0].choices)
+
+        def cold():
+            # What every form paid before the tables were shared
+            countries.reset()
+            build()
+
+        warm = build
+
+        results = {}
+        for label, func in (("cold (rebuilt per form)", cold), ("warm (shared tables)", warm)):
+            seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+            results[label] = seconds / iterations * 1000
+            self.stdout.write(f"{label:<24} {results[label]:8.3f} ms/form")
+
+        cold_ms, warm_ms = results.values()
+        self.stdout.write(self.style.SUCCESS(f"Saved {cold_ms - warm_ms:.3f} ms per form ({cold_ms / warm_ms:.1f}x)"))
@@ -3,7 +3,9 @@ from django.contrib.sessions.middleware import SessionMiddleware
 from django.core import mail
 from decimal import Decimal
 from catalog.models import Product, Category
+from orders import countries
 from orders.cart import Cart
+from orders.forms import CheckoutForm
 from orders.models import Order, Address, OrderItem
 from orders.shipping import (
     calculate_weight,
@@ -821,3 +823,22 @@ class AdminEmailNotificationTest(TestCase):
         self.assertIn("Admin Test Phone", email.body)
         self.assertIn("Premium Headphones", email.body)
         self.assertIn("2", email.body)  # Quantity of second item
+
+
+class CountryChoicesTest(TestCase):
+    """Test the shared country choice tables used by the checkout form."""
+
+    def test_tables_built_once(self):
+        """Forms share the same tables instead of rebuilding them."""
+        countries.reset()
+        first = countries.phone_country_choices()
+        CheckoutForm()
+        self.assertIs(countries.phone_country_choices(), first)
+
+    def test_checkout_form_choices(self):
+        """Both selects list countries, the phone one with dialing codes."""
+        form = CheckoutForm()
+        self.assertIn(("NG", "Nigeria"), list(form.fields["country"].choices))
+        phone_choices = list(form.fields["phone"].widget.widgets[0].choices)
+        self.assertIn(("NG", "Nigeria (+234)"), phone_choices)
+        self.assertNotIn("AQ", dict(phone_choices))
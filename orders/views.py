@@ -12,8 +12,8 @@ from dotenv import load_dotenv
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
 from django.http import HttpResponseRedirect, JsonResponse
-from shop.payments.paystack import initialize_transaction, verify_transaction
 from orders.shipping import get_all_shipping_options
+from shop.querybudget import query_budget
 from decimal import Decimal
 from django.contrib.auth.decorators import login_required
 
@@ -21,6 +21,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 load_dotenv(BASE_DIR / '.env')
 
+@query_budget(8)
 @login_required
 def cart_detail(request):
     cart = Cart(request)
@@ -60,6 +61,7 @@ def cart_remove(request, product_id):
     cart.remove(product_id)
     return redirect('orders:cart_detail')
 
+@query_budget(12)
 @login_required
 def checkout(request):
     cart = Cart(request)
@@ -111,6 +113,8 @@ def checkout(request):
                 )
 
             # Initialize a Paystack transaction and redirect the user
+            from shop.payments.paystack import initialize_transaction
+
             try:
                 callback = settings.PAYSTACK_CALLBACK_URL or request.build_absolute_uri(reverse('orders:verify_paystack'))
                 # Get customer details from the address
@@ -202,6 +206,8 @@ def verify_paystack(request):
         messages.error(request, 'Missing payment reference from Paystack.')
         return redirect('orders:checkout')
 
+    from shop.payments.paystack import verify_transaction
+
     try:
         data = verify_transaction(reference)
     except Exception as e:
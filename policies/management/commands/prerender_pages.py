@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from policies.prerender import prerender_pages, prerender_root
+
+
+class Command(BaseCommand):
+    help = "Render the policy, error and ads/limit pages to PRERENDER_ROOT."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--root", help="Output directory (default: PRERENDER_ROOT).")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = prerender_pages(options["root"])
+        self.stdout.write(f"{len(written)} page(s) written to {options['root'] or prerender_root()}")
+        self.stdout.write(self.style.SUCCESS(f"Pages prerendered in {time.monotonic() - started:.1f}s"))
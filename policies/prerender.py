@@ -0,0 +1,147 @@
+"""
+Build-time rendering of pages whose content only changes on deploy.
+
+`manage.py prerender_pages` renders the policy pages, error pages and the
+ads/limit text files as an anonymous visitor into PRERENDER_ROOT. The views
+then serve those bytes from memory with an ETag instead of rendering the
+template on every request. Logged-in visitors and visitors with a cart still
+get a live render, since the navbar shows their name and cart.
+
+Pages are rendered for CANONICAL_SCHEME://CANONICAL_HOST, so canonical and
+share links point at the live site. Forms on the page need the visitor's own
+CSRF token, so pages are rendered with a placeholder token that is
+substituted per request; error pages are served at whatever URL failed, so
+they get a placeholder path too.
+
+The pages are built with the slug (bin/post_compile), not when a dyno
+starts; until they exist the views render live.
+"""
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils.encoding import escape_uri_path
+from django.utils.html import escape
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+
+from shop.conditional import is_anonymous_viewer, make_etag, viewer_fingerprint
+
+CSRF_PLACEHOLDER = "PRERENDEREDCSRFTOKENPLACEHOLDER"
+PATH_PLACEHOLDER = "/prerendered-request-path-placeholder/"
+
+# template name -> URL name used for request.path (canonical link), or None
+# for pages served at the requested path
+PAGES = {
+    "policies/about.html": "policies:about",
+    "policies/privacy.html": "policies:privacy",
+    "policies/terms.html": "policies:terms",
+    "policies/affiliate.html": "policies:affiliate",
+    "policies/editorial.html": "policies:editorial",
+    "policies/advertising.html": "policies:advertising",
+    "policies/user-content.html": "policies:user_content",
+    "policies/accessibility.html": "policies:accessibility",
+    "policies/faqs.html": "policies:faqs",
+    "errors/403.html": None,
+    "errors/404.html": None,
+    "errors/500.html": None,
+    "ads.txt": None,
+    "limit.txt": None,
+}
+
+_loaded = {}
+
+
+class PrerenderedPage:
+    def __init__(self, name, content):
+        self.name = name
+        self.content = content
+        self.digest = hashlib.md5(content, usedforsecurity=False).hexdigest()
+        self.is_html = name.endswith(".html")
+        self.content_type = "text/html; charset=utf-8" if self.is_html else "text/plain"
+
+
+def prerender_root():
+    return Path(getattr(settings, "PRERENDER_ROOT", settings.BASE_DIR / "prerendered"))
+
+
+def render_page(template_name, context=None):
+    """Render one page as an anonymous visitor with an empty cart."""
+    from policies.views import policy_context
+
+    url_name = PAGES.get(template_name)
+    request = RequestFactory(SERVER_NAME=settings.CANONICAL_HOST).get(
+        reverse(url_name) if url_name else PATH_PLACEHOLDER,
+        secure=settings.CANONICAL_SCHEME == "https",
+    )
+    request.user = AnonymousUser()
+    request.session = {}
+    if context is None:
+        context = policy_context() if template_name.startswith("policies/") else {}
+    return render_to_string(template_name, {**context, "csrf_token": CSRF_PLACEHOLDER}, request=request)
+
+
+def prerender_pages(root=None):
+    """Render every page in PAGES to ``root``; returns the written paths."""
+    root = Path(root or prerender_root())
+    written = []
+    for template_name in PAGES:
+        path = root / template_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(render_page(template_name), encoding="utf-8")
+        written.append(path)
+    _loaded.clear()
+    return written
+
+
+def get_page(name):
+    """Return the prerendered page, loading it into memory on first use."""
+    page = _loaded.get(name)
+    if page is None:
+        path = prerender_root() / name
+        if name not in PAGES or not path.is_file():
+            return None
+        page = _loaded[name] = PrerenderedPage(name, path.read_bytes())
+    return page
+
+
+def serve_prerendered(request, name, status=200, any_viewer=False):
+    """
+    Return a response for a prerendered page, or None when the caller
+    should render it live (not built yet, or the page depends on the viewer).
+
+    ``any_viewer`` serves the anonymous copy to everyone without looking at
+    the session or user, for error pages where those may be what failed.
+    """
+    page = get_page(name)
+    if page is None:
+        return None
+    etag = None
+    if not page.is_html:
+        etag = quote_etag(page.digest)
+    elif not any_viewer:
+        if not is_anonymous_viewer(request):
+            return None
+        viewer = viewer_fingerprint(request)
+        if viewer is None:
+            return None
+        etag = quote_etag(make_etag(page.digest, viewer))
+
+    if status == 200 and etag:
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+    content = page.content
+    if page.is_html:
+        content = content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+        content = content.replace(PATH_PLACEHOLDER.encode(), escape(escape_uri_path(request.path)).encode())
+    response = HttpResponse(content, content_type=page.content_type, status=status)
+    if status == 200 and etag:
+        response["ETag"] = etag
+    return response
@@ -1,3 +1,107 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from policies import prerender
+
+
+class PolicyConditionalGetTest(TestCase):
+    """Test conditional GET on policy pages."""
+
+    def test_policy_page_returns_304(self):
+        """A repeat request with the ETag is answered without rendering."""
+        url = reverse("policies:privacy")
+        self.client.get(url)  # first visit sets the CSRF cookie, which is part of the ETag
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_policy_pages_have_distinct_etags(self):
+        """Each page is validated against its own template."""
+        about = self.client.get(reverse("policies:about"))
+        terms = self.client.get(reverse("policies:terms"))
+        self.assertNotEqual(about["ETag"], terms["ETag"])
+
+
+class PrerenderedPageTest(TestCase):
+    """Test serving pages rendered by prerender_pages."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        override = self.settings(PRERENDER_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command("prerender_pages", stdout=StringIO())
+        self.addCleanup(prerender._loaded.clear)
+
+    def test_pages_written(self):
+        """Every registered page is rendered to disk."""
+        for name in prerender.PAGES:
+            self.assertTrue(os.path.isfile(os.path.join(self.root, name)), name)
+
+    def test_served_from_memory(self):
+        """Anonymous visitors get the prerendered bytes without a template render."""
+        url = reverse("policies:terms")
+        with self.assertTemplateNotUsed("policies/terms.html"):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "JagofTrade")
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_csrf_placeholder_replaced(self):
+        """The newsletter form gets the visitor's own CSRF token."""
+        response = self.client.get(reverse("policies:about"))
+        self.assertNotContains(response, prerender.CSRF_PLACEHOLDER)
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
+
+    def test_returns_304(self):
+        """A repeat request with the ETag is answered with 304."""
+        url = reverse("policies:faqs")
+        self.client.get(url)
+        response = self.client.get(url)
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_logged_in_user_gets_live_render(self):
+        """The navbar shows the user's name, so they get a live render."""
+        user = get_user_model().objects.create_user("reader", "reader@example.com", "pw")
+        self.client.force_login(user)
+        with self.assertTemplateUsed("policies/terms.html"):
+            self.client.get(reverse("policies:terms"))
+
+    def test_text_files(self):
+        """ads.txt is served as plain text from the prerendered copy."""
+        response = self.client.get("/ads.txt/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain")
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_rendered_for_canonical_host(self):
+        """Share and canonical links point at the live site, not the render's request."""
+        response = self.client.get(reverse("policies:terms"))
+        self.assertContains(response, "https://www.jagoftrade.com" + reverse("policies:terms"))
+        self.assertNotContains(response, "testserver")
+
+    @override_settings(DEBUG=False)
+    def test_error_page_gets_request_path(self):
+        """Error pages link to the URL that failed."""
+        response = self.client.get("/no-such-page/")
+        self.assertEqual(response.status_code, 404)
+        self.assertContains(response, "https://www.jagoftrade.com/no-such-page/", status_code=404)
+        self.assertNotContains(response, prerender.PATH_PLACEHOLDER, status_code=404)
+
+    def test_missing_page_falls_back(self):
+        """Without a build, pages are rendered live."""
+        prerender._loaded.clear()
+        with self.settings(PRERENDER_ROOT=os.path.join(self.root, "missing")):
+            with self.assertTemplateUsed("policies/privacy.html"):
+                response = self.client.get(reverse("policies:privacy"))
+        self.assertEqual(response.status_code, 200)
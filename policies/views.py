@@ -1,9 +1,12 @@
 from datetime import date
 from django.shortcuts import render
+from shop.conditional import template_condition
+from .prerender import serve_prerendered
 
 # Create your views here.
-def about(request):
-    context = {
+def policy_context():
+    """Context shared by every policy page."""
+    return {
         "company_name": "JagofTrade",
         "mission_statement": "We empower shoppers in the US and beyond to make confident, value‑driven decisions.",
         "values_statement": "Integrity, clarity, and accessibility guide everything we publish.",
@@ -12,84 +15,50 @@ def about(request):
         "effective_date": date.today().strftime("%B %d, %Y"),
     }
 
-    return render(request, "policies/about.html", context)
 
-def privacy(request):
-    context = {
-        "company_name": "JagofTrade",
-        "contact_email": "support@jagoftrade.com",
-        "location": "Newark, Delaware, United States",
-        "effective_date": date.today().strftime("%B %d, %Y"),
-    }
+def _render_policy(request, template_name):
+    return render(request, template_name, policy_context())
 
-    return render(request, "policies/privacy.html", context)
 
-def terms(request):
-    context = {
-        "company_name": "JagofTrade",
-        "contact_email": "support@jagoftrade.com",
-        "location": "Newark, Delaware, United States",
-        "effective_date": date.today().strftime("%B %d, %Y"),
-    }
+def policy_page(request, template_name):
+    """Serve the prerendered page if there is one, otherwise render it."""
+    response = serve_prerendered(request, template_name)
+    if response is None:
+        response = template_condition(template_name)(_render_policy)(request, template_name)
+    return response
 
-    return render(request, "policies/terms.html", context)
 
-def affiliate(request):
-    context = {
-        "company_name": "JagofTrade",
-        "contact_email": "support@jagoftrade.com",
-        "location": "Newark, Delaware, United States",
-        "effective_date": date.today().strftime("%B %d, %Y"),
-    }
+def about(request):
+    return policy_page(request, "policies/about.html")
 
-    return render(request, "policies/affiliate.html", context)
+def privacy(request):
+    return policy_page(request, "policies/privacy.html")
 
-def editorial(request):
-    context = {
-        "company_name": "JagofTrade",
-        "contact_email": "support@jagoftrade.com",
-        "location": "Newark, Delaware, United States",
-        "effective_date": date.today().strftime("%B %d, %Y"),
-    }
+def terms(request):
+    return policy_page(request, "policies/terms.html")
 
-    return render(request, "policies/editorial.html", context)
+def affiliate(request):
+    return policy_page(request, "policies/affiliate.html")
 
-def advertising(request):
-    context = {
-        "company_name": "JagofTrade",
-        "contact_email": "support@jagoftrade.com",
-        "location": "Newark, Delaware, United States",
-        "effective_date": date.today().strftime("%B %d, %Y"),
-    }
+def editorial(request):
+    return policy_page(request, "policies/editorial.html")
 
-    return render(request, "policies/advertising.html", context)
+def advertising(request):
+    return policy_page(request, "policies/advertising.html")
 
 def user_content(request):
-    context = {
-        "company_name": "JagofTrade",
-        "contact_email": "support@jagoftrade.com",
-        "location": "Newark, Delaware, United States",
-        "effective_date": date.today().strftime("%B %d, %Y"),
-    }
-
-    return render(request, "policies/user-content.html", context)
+    return policy_page(request, "policies/user-content.html")
 
 def accessibility(request):
-    context = {
-        "company_name": "JagofTrade",
-        "contact_email": "support@jagoftrade.com",
-        "location": "Newark, Delaware, United States",
-        "effective_date": date.today().strftime("%B %d, %Y"),
-    }
-
-    return render(request, "policies/accessibility.html", context)
+    return policy_page(request, "policies/accessibility.html")
 
 def faqs(request):
-    context = {
-        "company_name": "JagofTrade",
-        "contact_email": "support@jagoftrade.com",
-        "location": "Newark, Delaware, United States",
-        "effective_date": date.today().strftime("%B %d, %Y"),
-    }
+    return policy_page(request, "policies/faqs.html")
+
 
-    return render(request, "policies/faqs.html", context)
\ No newline at end of file
+def text_file(request, template_name):
+    """ads.txt / limit.txt, served from the prerendered copy when available."""
+    response = serve_prerendered(request, template_name)
+    if response is None:
+        response = render(request, template_name, content_type="text/plain")
+    return response
@@ -0,0 +1,64 @@
+"""
+Brotli/gzip helpers shared by CompressionMiddleware and the static storage.
+
+Brotli is optional: without the package only gzip is offered.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+_accept_encoding_re = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*")
+
+
+def available_encodings():
+    """Encodings this process can produce, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding, encodings=None):
+    """
+    Pick the best of ``encodings`` (default: every available one) for an
+    Accept-Encoding header, or None. Encodings with ``q=0`` are treated as
+    refused.
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        match = _accept_encoding_re.fullmatch(part)
+        if not match:
+            continue
+        try:
+            quality = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+        accepted[match[1].lower()] = quality
+    for encoding in encodings or available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding, text=True, max_random_bytes=0):
+    """
+    Compress ``content`` (bytes) with the given encoding.
+
+    ``max_random_bytes`` pads gzip output with up to that many random bytes,
+    as GZipMiddleware does against BREACH; padded output uses Django's
+    ``compress_string`` and so its fixed level 6. Brotli is never padded.
+    """
+    if encoding == "br":
+        mode = brotli.MODE_TEXT if text else brotli.MODE_GENERIC
+        return brotli.compress(content, quality=getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5), mode=mode)
+    if encoding == "gzip":
+        if max_random_bytes:
+            return compress_string(content, max_random_bytes=max_random_bytes)
+        return gzip.compress(content, compresslevel=getattr(settings, "COMPRESSION_GZIP_LEVEL", 6), mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
@@ -0,0 +1,71 @@
+"""
+Helpers for conditional GET (ETag / Last-Modified) on HTML pages.
+
+Every page renders the navbar from the current user and cart, and most embed
+a CSRF token, so validators always include those along with whatever content
+stamp the view provides.
+"""
+import hashlib
+import os
+from datetime import datetime, time, timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib import messages
+from django.views.decorators.http import condition
+
+
+def viewer_fingerprint(request):
+    """
+    Return the per-viewer parts of a page, or None when the page must be
+    rendered anyway because flash messages are waiting to be shown.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    cart = request.session.get("cart") or {}
+    return (
+        request.user.pk,
+        sorted((product_id, item["quantity"]) for product_id, item in cart.items()),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+    )
+
+
+def is_anonymous_viewer(request):
+    """True when the page does not depend on who is asking (no login, empty cart)."""
+    return not request.user.is_authenticated and not request.session.get("cart")
+
+
+def make_etag(*parts):
+    """Hash the given stamp parts into an ETag value."""
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def templates_mtime():
+    """Newest modification time under the project templates dir (i.e. the deploy)."""
+    newest = 0.0
+    for directory in settings.TEMPLATES[0]["DIRS"]:
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+    return datetime.fromtimestamp(newest, tz=timezone.utc)
+
+
+def template_condition(template_name):
+    """
+    ``condition`` decorator for pages whose content only changes on deploy or
+    at midnight (the policy pages print today's date).
+    """
+    def last_modified(request, *args, **kwargs):
+        if not is_anonymous_viewer(request):
+            return None
+        midnight = datetime.combine(datetime.now(timezone.utc).date(), time.min, tzinfo=timezone.utc)
+        return max(templates_mtime(), midnight)
+
+    def etag(request, *args, **kwargs):
+        viewer = viewer_fingerprint(request)
+        if viewer is None:
+            return None
+        return make_etag(template_name, templates_mtime(), datetime.now(timezone.utc).date(), viewer)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,266 @@
+"""
+Per-request performance metrics.
+
+``InstrumentationMiddleware`` (first in MIDDLEWARE) gives each request a
+``RequestMetrics`` in a context variable and times its database queries
+through ``connection.execute_wrapper``. Everything else reports into the
+same object while the request is running:
+
+- ``TimedSessionMiddleware`` (in place of SessionMiddleware) times loading
+  and saving the session;
+- ``TimedDjangoTemplates`` (the TEMPLATES backend) times template rendering;
+- ``InstrumentedLocMemCache``/``InstrumentedRedisCache`` (CACHES) count
+  hits and misses and time cache reads;
+- outbound calls are wrapped in ``timed("http")`` (Paystack) and
+  ``TimedSMTPEmailBackend`` times SMTP.
+
+Outside a request (workers, management commands) they do nothing. Time is
+attributed to every timer it falls in: the queries that load the session
+count as both ``db`` and ``session``.
+
+The totals go out as a ``Server-Timing`` header to staff users, or to
+everyone when ``SERVER_TIMING`` is on (it exposes backend timings, so it is
+off by default). They are also logged as one JSON line on the
+``shop.requests`` logger for ``REQUEST_LOG_SAMPLE_RATE`` of requests, plus
+every request that errors or takes ``REQUEST_LOG_SLOW_MS`` or longer. LOGGING sends that logger to stdout,
+where it joins the gunicorn log stream.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+from django.db import connection
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger("shop.requests")
+
+_current = ContextVar("request_metrics", default=None)
+
+# Server-Timing metric names, in header order
+TIMINGS = {"db": "db", "session": "sess", "template": "tpl", "http": "http", "smtp": "smtp", "cache": "cache"}
+
+
+class RequestMetrics:
+    """Seconds spent and counts, by kind, for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = defaultdict(float)
+        self.counts = Counter()
+        # Kinds being timed right now, so nested timers (a template included
+        # by another, get_many calling get) are not counted twice
+        self.active = set()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def cache_hit_rate(self):
+        lookups = self.counts["cache_hits"] + self.counts["cache_misses"]
+        return self.counts["cache_hits"] / lookups if lookups else None
+
+    def server_timing(self):
+        """The ``Server-Timing`` header value."""
+        entries = []
+        for kind, name in TIMINGS.items():
+            if kind not in self.seconds:
+                continue
+            entry = f"{name};dur={self.seconds[kind] * 1000:.1f}"
+            if kind == "db":
+                entry += f';desc="{self.counts["db"]} queries"'
+            elif kind == "cache" and self.cache_hit_rate is not None:
+                entry += f';desc="hit {self.cache_hit_rate:.0%}"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(entries)
+
+    def as_dict(self):
+        data = {f"{kind}_ms": round(self.seconds[kind] * 1000, 1) for kind in TIMINGS}
+        data["db_queries"] = self.counts["db"]
+        data["cache_hits"] = self.counts["cache_hits"]
+        data["cache_misses"] = self.counts["cache_misses"]
+        rate = self.cache_hit_rate
+        data["cache_hit_rate"] = None if rate is None else round(rate, 3)
+        return data
+
+
+def current_metrics():
+    """The running request's RequestMetrics, or None outside a request."""
+    return _current.get()
+
+
+@contextmanager
+def timed(kind):
+    """Add the time spent in the block to the current request's ``kind``."""
+    metrics = _current.get()
+    if metrics is None or kind in metrics.active:
+        yield
+        return
+    metrics.active.add(kind)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.seconds[kind] += time.perf_counter() - started
+        metrics.counts[kind] += 1
+        metrics.active.discard(kind)
+
+
+def count(name, n=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.counts[name] += n
+
+
+@contextmanager
+def collect_metrics():
+    """Collect metrics for the block (a request, or a test)."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        with connection.execute_wrapper(_time_query):
+            yield metrics
+    finally:
+        _current.reset(token)
+
+
+def _time_query(execute, sql, params, many, context):
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+        if self.show_server_timing(request):
+            response["Server-Timing"] = metrics.server_timing()
+        if self.should_log(metrics, response):
+            logger.info(json.dumps(self.log_record(request, response, metrics)))
+        return response
+
+    def show_server_timing(self, request):
+        if settings.SERVER_TIMING:
+            return True
+        user = getattr(request, "user", None)
+        return user is not None and user.is_staff
+
+    def should_log(self, metrics, response):
+        return (
+            response.status_code >= 500
+            or metrics.elapsed * 1000 >= settings.REQUEST_LOG_SLOW_MS
+            or random.random() < settings.REQUEST_LOG_SAMPLE_RATE
+        )
+
+    def log_record(self, request, response, metrics):
+        match = request.resolver_match
+        return {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "duration_ms": round(metrics.elapsed * 1000, 1),
+            **metrics.as_dict(),
+        }
+
+
+class TimedSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware whose store reports load and save time as ``session``."""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        store = self.SessionStore
+
+        class TimedSessionStore(store):
+            def load(self):
+                with timed("session"):
+                    return super().load()
+
+            def save(self, *args, **kwargs):
+                with timed("session"):
+                    return super().save(*args, **kwargs)
+
+        TimedSessionStore.__name__ = TimedSessionStore.__qualname__ = store.__name__
+        self.SessionStore = TimedSessionStore
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed("template"):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose templates report their render time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+_missing = object()
+
+
+class CacheStatsMixin:
+    """Counts hits and misses of ``get``/``get_many`` and times them as ``cache``."""
+
+    def get(self, key, default=None, version=None):
+        metrics = _current.get()
+        with timed("cache"):
+            value = super().get(key, _missing, version)
+        # BaseCache.get_many is a loop over get(); it counts for itself
+        if metrics is not None and "cache_many" not in metrics.active:
+            count("cache_misses" if value is _missing else "cache_hits")
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.active.add("cache_many")
+        try:
+            with timed("cache"):
+                values = super().get_many(keys, version)
+        finally:
+            if metrics is not None:
+                metrics.active.discard("cache_many")
+        count("cache_hits", len(values))
+        count("cache_misses", len(keys) - len(values))
+        return values
+
+
+class InstrumentedLocMemCache(CacheStatsMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(CacheStatsMixin, RedisCache):
+    pass
+
+
+class TimedSMTPEmailBackend(SMTPEmailBackend):
+    def open(self):
+        with timed("smtp"):
+            return super().open()
+
+    def send_messages(self, email_messages):
+        with timed("smtp"):
+            return super().send_messages(email_messages)
@@ -1,251 +1,211 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponsePermanentRedirect
-from django.utils.deprecation import MiddlewareMixin
+from django.middleware.common import CommonMiddleware
+from django.http.response import ResponseHeaders
+from django.utils.cache import patch_vary_headers
+import hashlib
 import secrets
 
-# myapp/middleware.py
-class CSPReportOnlyMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+from shop.compression import compress, negotiate_encoding
 
-    def __call__(self, request):
-        response = self.get_response(request)
-        response["Content-Security-Policy-Report-Only"] = (
-            "script-src https://accounts.google.com/gsi/client; "
-            "frame-src https://accounts.google.com/gsi/; "
-            "connect-src https://accounts.google.com/gsi/;"
-        )
-        return response
-    
-class ForceWWWMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+NONCE_PLACEHOLDER = "{nonce}"
+NONCE_DIRECTIVES = ("script-src", "script-src-elem")
 
-    def __call__(self, request):
-        host = request.get_host()
-        if not host.startswith("www."):
-            new_url = request.build_absolute_uri().replace("://", "://www.", 1)
-            return HttpResponsePermanentRedirect(new_url)
-        return self.get_response(request)
 
-class RemoveWWWMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+def build_policy(directives, nonce=None):
+    """
+    Join a ``{directive: [sources]}`` mapping into a CSP header value.
+
+    When ``nonce`` is given it is added to the script directives, except
+    those still allowing ``'unsafe-inline'``: browsers that understand
+    nonces ignore ``'unsafe-inline'`` next to one, which would block every
+    inline script that isn't nonced (GTM, AdSense).
+    """
+    parts = []
+    for directive, sources in directives.items():
+        sources = list(sources)
+        if nonce and directive in NONCE_DIRECTIVES and "'unsafe-inline'" not in sources:
+            sources.append(f"'nonce-{nonce}'")
+        parts.append(" ".join([directive, *sources]))
+    return "; ".join(parts) + ";"
+
+
+def build_permissions_policy(features):
+    """Join a ``{feature: [origins]}`` mapping into a Permissions-Policy value."""
+    return ", ".join(f"{feature}=({' '.join(origins)})" for feature, origins in features.items())
 
-    def __call__(self, request):
-        host = request.get_host()
-        if host.startswith("www."):
-            new_url = request.build_absolute_uri().replace("://www.", "://")
-            return HttpResponsePermanentRedirect(new_url)
-        return self.get_response(request)
 
-class HTTPSRedirectMiddleware:
+class CSPNonce:
     """
-    Middleware that redirects all HTTP requests to HTTPS.
+    Per-request nonce that is only generated when a template asks for it
+    (``{{ request.csp_nonce }}``), so pages without nonced scripts keep the
+    precompiled policy.
     """
 
-    def __init__(self, get_response):
-        self.get_response = get_response
+    __slots__ = ("value",)
 
-    def __call__(self, request):
-        if not request.is_secure():
-            url = request.build_absolute_uri(request.get_full_path())
-            secure_url = url.replace("http://", "https://")
-            return HttpResponsePermanentRedirect(secure_url)
-        response = self.get_response(request)
-        return response
-    
-class HSTSMiddleware:
+    def __init__(self):
+        self.value = None
+
+    def __str__(self):
+        if self.value is None:
+            self.value = secrets.token_urlsafe(16)
+        return self.value
+
+    __html__ = __str__
+
+
+class SecurityHeadersMiddleware:
     """
-    Middleware that adds HSTS headers to responses.
+    Add the Content-Security-Policy, Permissions-Policy and other static
+    security headers to every response.
+
+    The header values are built from settings once, when the middleware is
+    loaded, and copied onto each response. HSTS,
+    nosniff, Referrer-Policy and X-Frame-Options are left to Django's
+    SecurityMiddleware and XFrameOptionsMiddleware.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
+        csp = getattr(settings, "CONTENT_SECURITY_POLICY", {})
+        report_only = getattr(settings, "CONTENT_SECURITY_POLICY_REPORT_ONLY", {})
+        permissions = getattr(settings, "PERMISSIONS_POLICY", {})
+
+        headers = dict(getattr(settings, "SECURITY_HEADERS", {}))
+        if csp:
+            headers["Content-Security-Policy"] = build_policy(csp)
+        if report_only:
+            headers["Content-Security-Policy-Report-Only"] = build_policy(report_only)
+        if permissions:
+            headers["Permissions-Policy"] = build_permissions_policy(permissions)
+
+        # Validate and normalise once
+        self.headers = dict(ResponseHeaders(headers).items())
+        nonce_policy = build_policy(csp, NONCE_PLACEHOLDER) if csp else None
+        self.nonce_policy = nonce_policy if nonce_policy and NONCE_PLACEHOLDER in nonce_policy else None
 
     def __call__(self, request):
+        nonce = request.csp_nonce = CSPNonce()
         response = self.get_response(request)
-        response['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains; preload'
+        for header, value in self.headers.items():
+            response.headers[header] = value
+        if nonce.value is not None and self.nonce_policy:
+            response["Content-Security-Policy"] = self.nonce_policy.replace(NONCE_PLACEHOLDER, nonce.value)
         return response
-    
-class SecurityHeadersMiddleware:
+
+
+class CanonicalHostMiddleware:
     """
-    Middleware that adds various security headers to responses.
+    Redirect requests for the site's domains to the canonical scheme, host
+    and path in a single 301.
+
+    Replaces SECURE_SSL_REDIRECT, PREPEND_WWW and the separate HTTPS/www
+    middlewares, which could each issue their own redirect. Hosts outside
+    CANONICAL_HOST_ALIASES (localhost, test clients) are passed through.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.host = settings.CANONICAL_HOST
+        self.scheme = settings.CANONICAL_SCHEME
+        self.secure = self.scheme == "https"
+        self.aliases = frozenset(settings.CANONICAL_HOST_ALIASES)
+        self.common = CommonMiddleware(get_response)
 
     def __call__(self, request):
-        response = self.get_response(request)
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['Referrer-Policy'] = 'same-origin'
-        response['Permissions-Policy'] = 'geolocation=(), microphone=()'
-        return response
+        host = request.get_host()
+        # Fast path: already canonical, nothing to rebuild.
+        if host == self.host and request.is_secure() is self.secure:
+            return self.get_response(request)
+        if host != self.host and host not in self.aliases:
+            return self.get_response(request)
 
-class ContentSecurityPolicyMiddleware(MiddlewareMixin):
-    def process_response(self, request, response):
-        cloudfront_domain = "https://d1234567890.cloudfront.net"
-        s3_bucket = "https://jagoftrade-bucket.s3.amazonaws.com"
-
-        csp_policy = (
-            # Default fallback
-            f"default-src 'self' {cloudfront_domain}; "
-
-            # Scripts: GTM, AdSense, Google Ads, Analytics, CDNs
-            f"script-src 'self' {cloudfront_domain} "
-            f"https://www.googletagmanager.com "
-            f"https://www.google-analytics.com "
-            f"https://pagead2.googlesyndication.com "
-            f"https://googleads.g.doubleclick.net "
-            f"https://www.gstatic.com "
-            f"https://code.jquery.com "
-            f"https://cdn.jsdelivr.net "
-            f"https://stackpath.bootstrapcdn.com "
-            f"https://cdnjs.cloudflare.com "
-            f"https://connect.facebook.net "
-            f"https://platform.twitter.com "
-            f"https://accounts.google.com/gsi/client "
-            f"https://ep2.adtrafficquality.google "
-            f"'unsafe-inline' 'unsafe-eval' strict-dynamic; "
-
-            # Script src elem (inline scripts)
-            f"script-src-elem 'self' {cloudfront_domain} "
-            f"https://www.googletagmanager.com/gtm.js "
-            f"https://www.googletagmanager.com/gtag/js "
-            f"https://pagead2.googlesyndication.com/pagead/js/adsbygoogle.js "
-            f"https://code.jquery.com/jquery-3.5.1.slim.min.js "
-            f"https://cdn.jsdelivr.net/npm/popper.js "
-            f"https://cdn.jsdelivr.net/npm/bootstrap "
-            f"https://ep2.adtrafficquality.google/sodar/sodar2.js "
-            f"https://cdn.jsdelivr.net/npm/popper.js@1.16.1/dist/umd/popper.min.js "
-            f"https://cdn.jsdelivr.net/npm/bootstrap@4.6.2/dist/js/bootstrap.bundle.min.js "
-            f"https://pagead2.googlesyndication.com "
-            f"https://googleads.g.doubleclick.net "
-            f"https://www.jagoftrade.com "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/theme.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/nav_sidebar.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/vendor/jquery/jquery.min.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/jquery.init.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/core.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/inlines.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/admin/RelatedObjectLookups.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/actions.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/urlify.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/prepopulate.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/vendor/xregexp/xregexp.min.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/change_form.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/prepopulate_init.js "
-            f"https://jagoftrade-bucket.s3.amazonaws.com/static/admin/js/filters.js "
-            f"'unsafe-inline'; "
-
-            # Styles: Fonts, CDNs, AdSense
-            f"style-src 'self' {cloudfront_domain} {s3_bucket} "
-            f"https://fonts.googleapis.com "
-            f"https://cdn.jsdelivr.net "
-            f"https://stackpath.bootstrapcdn.com "
-            f"https://cdnjs.cloudflare.com "
-            f"https://pagead2.googlesyndication.com "
-            f"'unsafe-inline'; "
-
-            # Fonts
-            f"font-src 'self' {cloudfront_domain} {s3_bucket} "
-            f"https://fonts.gstatic.com "
-            f"https://cdnjs.cloudflare.com "
-            f"data:; "
-
-            # Images: AdSense, Analytics, S3, CloudFront
-            f"img-src 'self' {cloudfront_domain} {s3_bucket} "
-            f"https://tpc.googlesyndication.com "
-            f"https://pagead2.googlesyndication.com "
-            f"https://googleads.g.doubleclick.net "
-            f"https://www.googletagmanager.com "
-            f"https://www.google-analytics.com "
-            f"https://ssl.gstatic.com "
-            f"https://www.gstatic.com "
-            f"https://stats.g.doubleclick.net "
-            f"https://ad.doubleclick.net "
-            f"https://www.facebook.com "
-            f"https://platform.twitter.com "
-            f"https://ep1.adtrafficquality.google "
-            f"https://www.jagoftrade.com "
-            f"data: blob:; "
-
-            # Media
-            f"media-src 'self' {cloudfront_domain} {s3_bucket} "
-            f"https://pagead2.googlesyndication.com; "
-
-            # Connections: XHR, fetch, WebSocket for ads, analytics, GTM
-            f"connect-src 'self' {cloudfront_domain} {s3_bucket} "
-            f"https://www.googletagmanager.com "
-            f"https://pagead2.googlesyndication.com "
-            f"https://googleads.g.doubleclick.net "
-            f"https://www.google-analytics.com "
-            f"https://www.google-analytics.com/g/collect "
-            f"https://analytics.google.com "
-            f"https://region1.analytics.google.com "
-            f"https://region2.analytics.google.com "
-            f"https://www.google.com "
-            f"https://accounts.google.com "
-            f"https://accounts.google.com/gsi/client "
-            f"https://apis.google.com "
-            f"https://ep1.adtrafficquality.google "
-            f"https://ep2.adtrafficquality.google "
-            f"https://cdn.jsdelivr.net "
-            f"https://api.github.com "
-            f"https://connect.facebook.net "
-            f"https://graph.instagram.com "
-            f"wss: https:; "
-
-            # Frames: Ad iframes, Google Sign-In, GTM
-            f"frame-src 'self' "
-            f"https://googleads.g.doubleclick.net "
-            f"https://tpc.googlesyndication.com "
-            f"https://pagead2.googlesyndication.com "
-            f"https://accounts.google.com/gsi "
-            f"https://accounts.google.com "
-            f"https://www.google.com/recaptcha "
-            f"https://recaptcha.net/recaptcha "
-            f"https://www.youtube.com "
-            f"https://youtube.com "
-            f"https://www.facebook.com "
-            f"https://platform.twitter.com "
-            f"https://ep2.adtrafficquality.google "
-            f"https://www.google.com; "   
-
-            # Strict restrictions
-            f"object-src 'none'; "
-            f"frame-ancestors 'self'; "
-            f"base-uri 'self'; "
-            f"form-action 'self'; "
-            f"upgrade-insecure-requests; "
-        )
-
-        response["Content-Security-Policy"] = csp_policy
-        response["Content-Security-Policy-Report-Only"] = csp_policy
-        
-        # Additional security headers
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'SAMEORIGIN'
-        response['X-XSS-Protection'] = '1; mode=block'
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        response['Permissions-Policy'] = (
-            'geolocation=(), microphone=(), camera=(), '
-            'payment=(), usb=(), magnetometer=(), gyroscope=(), '
-            'accelerometer=()'
-        )
-        
-        return response
+        # Fold CommonMiddleware's APPEND_SLASH redirect into the same hop.
+        if self.common.should_redirect_with_slash(request):
+            path = request.get_full_path(force_append_slash=True)
+        else:
+            path = request.get_full_path()
+        return HttpResponsePermanentRedirect(f"{self.scheme}://{self.host}{path}")
+
+
+# Images, archives (e.g. the gzip sitemap shards) and fonts are already compressed.
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/xml", "application/javascript", "image/svg+xml")
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with Brotli or gzip, whichever the client prefers.
+
+    Replaces Django's GZipMiddleware. Bodies shorter than
+    COMPRESSION_MIN_LENGTH are sent as-is, and the compressed bytes of
+    responses carrying an ETag (the conditional catalog and policy pages)
+    are cached, so identical pages are only compressed once.
+
+    Like GZipMiddleware, gzip bodies are padded with up to
+    ``max_random_bytes`` random bytes to blunt BREACH. Brotli output can't be
+    padded, so pages that used the CSRF token are only ever sent gzipped.
+    """
+
+    max_random_bytes = 100
 
-class ExpiredImageMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.min_length = getattr(settings, "COMPRESSION_MIN_LENGTH", 1024)
+        self.cache_timeout = getattr(settings, "COMPRESSION_CACHE_TIMEOUT", 60 * 60)
 
     def __call__(self, request):
         response = self.get_response(request)
-        if request.path.startswith('/media/') or request.path.startswith('/static/'):
-            if response.get('Content-Type', '').startswith('image/'):
-                response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-                response['Expires'] = 'Thu, 01 Jan 1970 00:00:00 GMT'
-                response['Pragma'] = 'no-cache'
-        return response
\ No newline at end of file
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < self.min_length
+        ):
+            return response
+        content_type = response.get("Content-Type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        encodings = ("gzip",) if request.META.get("CSRF_COOKIE_USED") else None
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), encodings)
+        if encoding is None:
+            return response
+
+        cache_key = self._cache_key(request, response, encoding)
+        compressed = cache.get(cache_key) if cache_key else None
+        if compressed is None:
+            compressed = compress(response.content, encoding, max_random_bytes=self.max_random_bytes)
+            if cache_key:
+                cache.set(cache_key, compressed, self.cache_timeout)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        # The compressed body is a different representation; like Django's
+        # GZipMiddleware, weaken the ETag so If-None-Match still matches.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+    def _cache_key(self, request, response, encoding):
+        etag = response.get("ETag")
+        if response.status_code != 200 or not etag or "no-store" in response.get("Cache-Control", ""):
+            return None
+        # The body carries this response's CSP nonce
+        if "'nonce-" in response.get("Content-Security-Policy", ""):
+            return None
+        csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        # A page that used the CSRF token carries a token for the viewer's
+        # secret. Without a cookie the secret was minted for this response,
+        # so the body is no use to anyone else.
+        if request.META.get("CSRF_COOKIE_NEEDS_UPDATE") and not csrf_cookie:
+            return None
+        session = getattr(request, "session", None)
+        # Some ETags (the listings) don't cover the query string or the viewer
+        key = (request.get_full_path(), etag, csrf_cookie, session.session_key if session is not None else None)
+        digest = hashlib.md5(repr(key).encode(), usedforsecurity=False).hexdigest()
+        return f"compressed:{encoding}:{digest}"
@@ -1,6 +1,8 @@
 import requests
 from django.conf import settings
 
+from shop.instrumentation import timed
+
 PAYSTACK_INITIALIZE_URL = "https://api.paystack.co/transaction/initialize"
 PAYSTACK_VERIFY_URL = "https://api.paystack.co/transaction/verify/{}"
 
@@ -80,7 +82,8 @@ def initialize_transaction(amount, email, reference=None, callback_url=None, ful
     if metadata:
         payload["metadata"] = metadata
 
-    resp = requests.post(PAYSTACK_INITIALIZE_URL, json=payload, headers=headers, timeout=15)
+    with timed("http"):
+        resp = requests.post(PAYSTACK_INITIALIZE_URL, json=payload, headers=headers, timeout=15)
     resp.raise_for_status()
     data = resp.json()
     if not data.get("status"):
@@ -94,7 +97,8 @@ def verify_transaction(reference):
         "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
     }
     url = PAYSTACK_VERIFY_URL.format(reference)
-    resp = requests.get(url, headers=headers, timeout=15)
+    with timed("http"):
+        resp = requests.get(url, headers=headers, timeout=15)
     resp.raise_for_status()
     data = resp.json()
     if not data.get("status"):
@@ -0,0 +1,136 @@
+"""
+Query budgets and N+1 detection, for development and tests.
+
+``QueryRecorder`` is installed with ``connection.execute_wrapper`` and
+records every query run while it is active. Queries are grouped by shape
+(the parameterized SQL, with ``IN (%s, %s, ...)`` lists collapsed), and a
+shape run ``QUERY_BUDGET_REPEAT_THRESHOLD`` or more times in one request is
+reported as a probable N+1.
+
+Views declare how many queries they may run with ``@query_budget(n)``.
+``QueryBudgetMiddleware`` (added to MIDDLEWARE when DEBUG is on) checks
+every request against its view's budget and logs, or raises when
+``QUERY_BUDGET_RAISE`` is set. Tests use ``QueryBudgetTestMixin``.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    return IN_LIST.sub("IN (...)", sql)
+
+
+class QueryRecorder:
+    """``execute_wrapper`` callable that records ``(sql, seconds)`` for each query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=None):
+        """``[(shape, count)]`` for shapes run at least ``threshold`` times, most frequent first."""
+        threshold = threshold or settings.QUERY_BUDGET_REPEAT_THRESHOLD
+        counts = Counter(query_shape(sql) for sql, _seconds in self.queries)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+
+
+def query_budget(max_queries):
+    """Declare the most queries a view (function, class-based view or viewset) may run."""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def budget_for(view_func):
+    """The budget declared on ``view_func``, on its class, or None."""
+    for view in (view_func, getattr(view_func, "view_class", None), getattr(view_func, "cls", None)):
+        budget = getattr(view, "query_budget", None)
+        if budget is not None:
+            return budget
+    return None
+
+
+def problems(recorder, budget, threshold=None):
+    """Human-readable budget and N+1 violations for one request."""
+    found = []
+    if budget is not None and len(recorder) > budget:
+        found.append(f"{len(recorder)} queries, budget is {budget}")
+    for shape, count in recorder.repeated(threshold):
+        found.append(f"{count}x {shape}")
+    return found
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = None
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        found = problems(recorder, request.query_budget)
+        if found:
+            message = f"{request.method} {request.path}: " + "; ".join(found)
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = budget_for(view_func)
+
+
+class QueryBudgetTestMixin:
+    """
+    Assertions for TestCase subclasses: ``assertQueryBudget`` around any
+    block, and ``assertViewWithinBudget`` to request a URL and hold it to
+    its view's declared budget. Both fail on repeated query shapes.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries=None, threshold=None):
+        with record_queries() as recorder:
+            yield recorder
+        found = problems(recorder, max_queries, threshold)
+        if found:
+            self.fail("Query budget exceeded:\n" + "\n".join(found))
+
+    def assertViewWithinBudget(self, path, method="get", data=None, **extra):
+        budget = budget_for(resolve(urlsplit(path).path).func)
+        self.assertIsNotNone(budget, f"No @query_budget on the view for {path}")
+        with self.assertQueryBudget(budget):
+            response = getattr(self.client, method)(path, data, **extra)
+        return response
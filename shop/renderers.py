@@ -0,0 +1,23 @@
+"""
+JSON renderer backed by orjson.
+
+orjson is optional: without the package (or for indented output, which it
+only supports at one width) this is DRF's JSONRenderer. The output is the
+same as DRF's encoder: datetimes in UTC end in ``Z`` and anything orjson
+doesn't know natively (Decimal, lazy strings) is rendered with ``str``.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=str, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
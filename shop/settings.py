@@ -49,7 +49,14 @@ if DEBUG:
     ALLOWED_HOSTS = ['*']
 
 ALLOWED_HOSTS = ['www.jagoftrade.com', 'jagoftrade.com', 'localhost', '127.0.0.1']
-PREPEND_WWW = True
+
+# shop.middleware.CanonicalHostMiddleware sends requests for any of these hosts
+# to CANONICAL_SCHEME://CANONICAL_HOST in one redirect, so PREPEND_WWW and
+# SECURE_SSL_REDIRECT are left off.
+CANONICAL_HOST = 'www.jagoftrade.com'
+CANONICAL_SCHEME = 'https'
+CANONICAL_HOST_ALIASES = ['jagoftrade.com']
+PREPEND_WWW = False
 
 # Application definition
 INSTALLED_APPS = [
@@ -149,37 +156,74 @@ SOCIALACCOUNT_ADAPTER = 'accounts.adapters.CustomSocialAccountAdapter'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'shop.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
+    # The Heroku router appends the client address to X-Forwarded-For
+    'NUM_PROXIES': 1,
 }
 
+# Login attempts allowed per (count, seconds) sliding window, by client IP
+# and by account name, before the password is even checked (accounts.throttling)
+LOGIN_THROTTLE_IP = (30, 300)
+LOGIN_THROTTLE_ACCOUNT = (10, 900)
+
+# Seconds an API user is cached by accounts.authentication.CachedJWTAuthentication
+JWT_USER_CACHE_TIMEOUT = 300
+
+# Seconds a catalog API response is cached (also invalidated by any catalog write)
+CATALOG_API_CACHE_TIMEOUT = 300
+
 MIDDLEWARE = [
+    'shop.instrumentation.InstrumentationMiddleware',
+    'shop.middleware.CanonicalHostMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.middleware.gzip.GZipMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'shop.middleware.CompressionMiddleware',
+    'shop.instrumentation.TimedSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
-    'shop.middleware.CSPReportOnlyMiddleware',
-    'shop.middleware.HTTPSRedirectMiddleware',
-    'shop.middleware.ForceWWWMiddleware',
-    'shop.middleware.HSTSMiddleware',
     'shop.middleware.SecurityHeadersMiddleware',
-    'shop.middleware.ExpiredImageMiddleware',
-    'shop.middleware.ContentSecurityPolicyMiddleware',
 ]
 
+# Development only: log views over their @query_budget or repeating a query
+# QUERY_BUDGET_REPEAT_THRESHOLD times (shop.querybudget). On with DEBUG or
+# QUERY_BUDGET=True
+if DEBUG or os.getenv('QUERY_BUDGET') == 'True':
+    MIDDLEWARE.insert(0, 'shop.querybudget.QueryBudgetMiddleware')
+QUERY_BUDGET_REPEAT_THRESHOLD = 5
+QUERY_BUDGET_RAISE = False
+
+# Per-request metrics (shop.instrumentation): a Server-Timing header for staff
+# users (for everyone with SERVER_TIMING, which exposes backend timings), and
+# a JSON line on the shop.requests logger for a sample of requests plus every
+# 5xx and every request slower than REQUEST_LOG_SLOW_MS
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False') == 'True'
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv('REQUEST_LOG_SAMPLE_RATE', '0'))
+REQUEST_LOG_SLOW_MS = int(os.getenv('REQUEST_LOG_SLOW_MS', '1000'))
+
 ROOT_URLCONF = 'shop.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'shop.instrumentation.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parse each template once per worker; core.warmup compiles them
+            # all at worker start (gunicorn.conf.py post_worker_init).
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -193,6 +237,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'shop.wsgi.application'
 
+# Response compression (shop.middleware.CompressionMiddleware)
+COMPRESSION_MIN_LENGTH = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_GZIP_LEVEL = 6  # precompressed static files; responses are padded at level 6
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 if DEBUG:
@@ -212,6 +261,22 @@ else:
         )
     }
     
+# Cache
+# Shared through Redis when REDIS_URL is set, otherwise per-process memory.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'shop.instrumentation.InstrumentedRedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'shop.instrumentation.InstrumentedLocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 AUTH_USER_MODEL = 'accounts.CustomUser'  # if using custom user
@@ -257,12 +322,20 @@ AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400', # Cache for 1 day
 }
 
+# Static and media names carry a content hash (manifest storage for static
+# files, shop.uploads.ContentHashedUploadTo for uploads), so they can be cached
+# forever; a changed file gets a new URL.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
 STATIC_LOCATION = 'static'
 STATIC_HOST=f'{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{STATIC_LOCATION}'
 STATIC_URL = f'https://{STATIC_HOST}/'
 STATIC_ROOT = BASE_DIR / 'staticfiles/'
 STATICFILES_DIRS = [BASE_DIR / 'static/']
 
+# collectstatic also uploads .br/.gz copies of these files (see shop.storage)
+STATIC_PRECOMPRESS_PATTERNS = ['css/*.css', 'js/*.js']
+
 # STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 PUBLIC_MEDIA_LOCATION = 'media'
@@ -272,26 +345,50 @@ MEDIA_ROOT = BASE_DIR / 'media/'
 
 STORAGES = {
     "staticfiles": {
-        "BACKEND": "storages.backends.s3boto3.S3StaticStorage",
+        "BACKEND": "shop.storage.StaticStorage",
         "OPTIONS": {
             "location": STATIC_LOCATION,
+            "object_parameters": {"CacheControl": IMMUTABLE_CACHE_CONTROL},
         },
     },
     "default": {
         "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
         "OPTIONS": {
             "location": PUBLIC_MEDIA_LOCATION,
+            "object_parameters": {"CacheControl": IMMUTABLE_CACHE_CONTROL},
         },
     },
 }
 
+# Without a bucket (local development, tests, CI) files stay on the local
+# filesystem, so nothing needs S3 credentials
+if not AWS_STORAGE_BUCKET_NAME:
+    STATIC_URL = '/static/'
+    MEDIA_URL = '/media/'
+    STORAGES = {
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    }
+
 PICTURES = {
     "USE_PLACEHOLDERS": False,              # Enables placeholders to avoid layout shifts
     "DEFAULT_MAX_WIDTHS": [246, 500, 1000, ],# Common responsive breakpoints
     "DEFAULT_FORMATS": ["avif", "webp", "jpeg"],   # WebP for modern browsers, JPEG fallback
     "CACHE": True,                         # Always cache for performance
+    "PROCESSOR": "catalog.renditions.enqueue_rendition",  # queued, see process_renditions
 }
 
+# Rendition worker (manage.py process_renditions, see catalog.renditions)
+RENDITION_MAX_ATTEMPTS = 5
+RENDITION_RETRY_DELAY = 60  # seconds, doubled on each retry
+
+# Prebuilt sitemaps (manage.py build_sitemaps, see shop.sitemaps)
+SITEMAP_LOCATION = 'sitemaps/'
+SITEMAP_SHARD_SIZE = 10000
+
+# Policy, error and ads/limit pages rendered when the slug is built (bin/post_compile runs manage.py prerender_pages)
+PRERENDER_ROOT = BASE_DIR / 'prerendered'
+
 # Login settings - redirect to login with 'next' parameter
 LOGIN_REDIRECT_URL = "core:home"   # where users go after login
 LOGOUT_REDIRECT_URL = "core:home"  # where users go after logout
@@ -314,32 +411,241 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', os.getenv('EMAIL_HOST_USER'))  # Defaults to EMAIL_HOST_USER if not set
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = 'shop.instrumentation.TimedSMTPEmailBackend'
+
+# Account emails are sent by the send_account_emails worker; failures are
+# retried with exponential backoff starting at ACCOUNT_EMAIL_RETRY_DELAY seconds
+ACCOUNT_EMAIL_MAX_ATTEMPTS = 5
+ACCOUNT_EMAIL_RETRY_DELAY = 60
 
 # Mailchimp settings
 MAILCHIMP_API_KEY = os.getenv('MAILCHIMP_API_KEY')
 MAILCHIMP_EMAIL_LIST_ID = os.getenv('MAILCHIMP_EMAIL_LIST_ID')
 MAILCHIMP_DATA_CENTER = os.getenv('MAILCHIMP_DATA_CENTER')
 
+# Newsletter signups that fail to reach Mailchimp are retried with exponential
+# backoff starting at NEWSLETTER_RETRY_DELAY seconds (see accounts.newsletter)
+NEWSLETTER_MAX_ATTEMPTS = 5
+NEWSLETTER_RETRY_DELAY = 60
+
+# Amazon Product Advertising API (manage.py sync_amazon_products, see catalog.amazon)
+AMAZON_PAAPI_KEY = os.getenv('AMAZON_PAAPI_KEY')
+AMAZON_PAAPI_SECRET = os.getenv('AMAZON_PAAPI_SECRET')
+AMAZON_PAAPI_TAG = os.getenv('AMAZON_PAAPI_TAG')
+AMAZON_PAAPI_COUNTRY = os.getenv('AMAZON_PAAPI_COUNTRY', 'US')
+AMAZON_PAAPI_RATE = float(os.getenv('AMAZON_PAAPI_RATE', '1'))  # GetItems calls per second
+AMAZON_PAAPI_BURST = int(os.getenv('AMAZON_PAAPI_BURST', '1'))
+
 # settings.py (production)
 SESSION_COOKIE_SECURE = True  # Set to True if you have SSL configured; Heroku handles SSL at the load balancer
 CSRF_COOKIE_SECURE = True     # Set to True if you have SSL configured; Heroku handles SSL at the load balancer
 SESSION_COOKIE_SAMESITE = "Lax"
 CSRF_COOKIE_SAMESITE = "Lax"
-SECURE_SSL_REDIRECT = True  # Set to True if you have SSL configured; Heroku handles SSL at the load balancer
+SECURE_SSL_REDIRECT = False  # HTTPS redirects are handled by shop.middleware.CanonicalHostMiddleware
 SECURE_HSTS_SECONDS = 31536000
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 SECURE_BROWSER_XSS_FILTER = True
+SECURE_REFERRER_POLICY = "same-origin"
+X_FRAME_OPTIONS = "DENY"
+
+# Security headers compiled once at startup by shop.middleware.SecurityHeadersMiddleware.
+# Templates that need a nonced inline script can use {{ request.csp_nonce }};
+# the nonce is only added to script-src on responses that actually render it.
+CSP_CLOUDFRONT_DOMAIN = "https://d1234567890.cloudfront.net"
+CSP_S3_BUCKET = "https://jagoftrade-bucket.s3.amazonaws.com"
+CSP_ADMIN_JS = f"{CSP_S3_BUCKET}/static/admin/js"
+
+CONTENT_SECURITY_POLICY = {
+    # Default fallback
+    "default-src": ["'self'", CSP_CLOUDFRONT_DOMAIN],
+    # Scripts: GTM, AdSense, Google Ads, Analytics, CDNs
+    "script-src": [
+        "'self'", CSP_CLOUDFRONT_DOMAIN,
+        "https://www.googletagmanager.com",
+        "https://www.google-analytics.com",
+        "https://pagead2.googlesyndication.com",
+        "https://googleads.g.doubleclick.net",
+        "https://www.gstatic.com",
+        "https://code.jquery.com",
+        "https://cdn.jsdelivr.net",
+        "https://stackpath.bootstrapcdn.com",
+        "https://cdnjs.cloudflare.com",
+        "https://connect.facebook.net",
+        "https://platform.twitter.com",
+        "https://accounts.google.com/gsi/client",
+        "https://ep2.adtrafficquality.google",
+        "'unsafe-inline'", "'unsafe-eval'", "strict-dynamic",
+    ],
+    # Script src elem (inline scripts)
+    "script-src-elem": [
+        "'self'", CSP_CLOUDFRONT_DOMAIN,
+        "https://www.googletagmanager.com/gtm.js",
+        "https://www.googletagmanager.com/gtag/js",
+        "https://pagead2.googlesyndication.com/pagead/js/adsbygoogle.js",
+        "https://code.jquery.com/jquery-3.5.1.slim.min.js",
+        "https://cdn.jsdelivr.net/npm/popper.js",
+        "https://cdn.jsdelivr.net/npm/bootstrap",
+        "https://ep2.adtrafficquality.google/sodar/sodar2.js",
+        "https://cdn.jsdelivr.net/npm/popper.js@1.16.1/dist/umd/popper.min.js",
+        "https://cdn.jsdelivr.net/npm/bootstrap@4.6.2/dist/js/bootstrap.bundle.min.js",
+        "https://pagead2.googlesyndication.com",
+        "https://googleads.g.doubleclick.net",
+        "https://www.jagoftrade.com",
+        f"{CSP_ADMIN_JS}/theme.js",
+        f"{CSP_ADMIN_JS}/nav_sidebar.js",
+        f"{CSP_ADMIN_JS}/vendor/jquery/jquery.min.js",
+        f"{CSP_ADMIN_JS}/jquery.init.js",
+        f"{CSP_ADMIN_JS}/core.js",
+        f"{CSP_ADMIN_JS}/inlines.js",
+        f"{CSP_ADMIN_JS}/admin/RelatedObjectLookups.js",
+        f"{CSP_ADMIN_JS}/actions.js",
+        f"{CSP_ADMIN_JS}/urlify.js",
+        f"{CSP_ADMIN_JS}/prepopulate.js",
+        f"{CSP_ADMIN_JS}/vendor/xregexp/xregexp.min.js",
+        f"{CSP_ADMIN_JS}/change_form.js",
+        f"{CSP_ADMIN_JS}/prepopulate_init.js",
+        f"{CSP_ADMIN_JS}/filters.js",
+        "'unsafe-inline'",
+    ],
+    # Styles: Fonts, CDNs, AdSense
+    "style-src": [
+        "'self'", CSP_CLOUDFRONT_DOMAIN, CSP_S3_BUCKET,
+        "https://fonts.googleapis.com",
+        "https://cdn.jsdelivr.net",
+        "https://stackpath.bootstrapcdn.com",
+        "https://cdnjs.cloudflare.com",
+        "https://pagead2.googlesyndication.com",
+        "'unsafe-inline'",
+    ],
+    # Fonts
+    "font-src": [
+        "'self'", CSP_CLOUDFRONT_DOMAIN, CSP_S3_BUCKET,
+        "https://fonts.gstatic.com",
+        "https://cdnjs.cloudflare.com",
+        "data:",
+    ],
+    # Images: AdSense, Analytics, S3, CloudFront
+    "img-src": [
+        "'self'", CSP_CLOUDFRONT_DOMAIN, CSP_S3_BUCKET,
+        "https://tpc.googlesyndication.com",
+        "https://pagead2.googlesyndication.com",
+        "https://googleads.g.doubleclick.net",
+        "https://www.googletagmanager.com",
+        "https://www.google-analytics.com",
+        "https://ssl.gstatic.com",
+        "https://www.gstatic.com",
+        "https://stats.g.doubleclick.net",
+        "https://ad.doubleclick.net",
+        "https://www.facebook.com",
+        "https://platform.twitter.com",
+        "https://ep1.adtrafficquality.google",
+        "https://www.jagoftrade.com",
+        "data:", "blob:",
+    ],
+    # Media
+    "media-src": [
+        "'self'", CSP_CLOUDFRONT_DOMAIN, CSP_S3_BUCKET,
+        "https://pagead2.googlesyndication.com",
+    ],
+    # Connections: XHR, fetch, WebSocket for ads, analytics, GTM
+    "connect-src": [
+        "'self'", CSP_CLOUDFRONT_DOMAIN, CSP_S3_BUCKET,
+        "https://www.googletagmanager.com",
+        "https://pagead2.googlesyndication.com",
+        "https://googleads.g.doubleclick.net",
+        "https://www.google-analytics.com",
+        "https://www.google-analytics.com/g/collect",
+        "https://analytics.google.com",
+        "https://region1.analytics.google.com",
+        "https://region2.analytics.google.com",
+        "https://www.google.com",
+        "https://accounts.google.com",
+        "https://accounts.google.com/gsi/client",
+        "https://apis.google.com",
+        "https://ep1.adtrafficquality.google",
+        "https://ep2.adtrafficquality.google",
+        "https://cdn.jsdelivr.net",
+        "https://api.github.com",
+        "https://connect.facebook.net",
+        "https://graph.instagram.com",
+        "wss:", "https:",
+    ],
+    # Frames: Ad iframes, Google Sign-In, GTM
+    "frame-src": [
+        "'self'",
+        "https://googleads.g.doubleclick.net",
+        "https://tpc.googlesyndication.com",
+        "https://pagead2.googlesyndication.com",
+        "https://accounts.google.com/gsi",
+        "https://accounts.google.com",
+        "https://www.google.com/recaptcha",
+        "https://recaptcha.net/recaptcha",
+        "https://www.youtube.com",
+        "https://youtube.com",
+        "https://www.facebook.com",
+        "https://platform.twitter.com",
+        "https://ep2.adtrafficquality.google",
+        "https://www.google.com",
+    ],
+    # Strict restrictions
+    "object-src": ["'none'"],
+    "frame-ancestors": ["'self'"],
+    "base-uri": ["'self'"],
+    "form-action": ["'self'"],
+    "upgrade-insecure-requests": [],
+}
+
+# Google Identity Services is monitored separately in report-only mode.
+CONTENT_SECURITY_POLICY_REPORT_ONLY = {
+    "script-src": ["https://accounts.google.com/gsi/client"],
+    "frame-src": ["https://accounts.google.com/gsi/"],
+    "connect-src": ["https://accounts.google.com/gsi/"],
+}
+
+PERMISSIONS_POLICY = {
+    "geolocation": [],
+    "microphone": [],
+    "camera": [],
+    "payment": [],
+    "usb": [],
+    "magnetometer": [],
+    "gyroscope": [],
+    "accelerometer": [],
+}
+
+SECURITY_HEADERS = {
+    "X-XSS-Protection": "1; mode=block",
+}
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "SIGNING_KEY": SECRET_KEY,
+    # Tokens carry a hash of the password and stop working when it changes
+    "CHECK_REVOKE_TOKEN": True,
 }
 
 SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "default": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"},
+        # shop.requests lines are already JSON
+        "json": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "default"},
+        "requests": {"class": "logging.StreamHandler", "formatter": "json", "stream": "ext://sys.stdout"},
+    },
+    "loggers": {
+        "shop.requests": {"handlers": ["requests"], "level": "INFO", "propagate": False},
+    },
+    "root": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "WARNING")},
+}
+
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')  # Heroku sets this header for SSL
 
 
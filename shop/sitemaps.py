@@ -1,6 +1,18 @@
 # shop/sitemaps.py
+import gzip
+import tempfile
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps.views import sitemap
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse
 from django.urls import reverse
+from django.utils import timezone
 from catalog.models import Product, Category
 
 class ProductSitemap(Sitemap):
@@ -11,7 +23,7 @@ class ProductSitemap(Sitemap):
         return Product.objects.filter(is_active=True)
 
     def lastmod(self, obj):
-        return obj.created_at  # assuming you track updates
+        return obj.updated_at
 
 class CategorySitemap(Sitemap):
     changefreq = "weekly"
@@ -43,4 +55,170 @@ class StaticViewSitemap(Sitemap):
         ]
 
     def location(self, item):
-        return reverse(item)
\ No newline at end of file
+        return reverse(item)
+
+
+# Prebuilt sitemaps
+#
+# `manage.py build_sitemaps` streams the catalog into gzip-compressed shards
+# of at most SITEMAP_SHARD_SIZE URLs plus a sitemap index, all written to the
+# default storage under SITEMAP_LOCATION. The sitemap views below only read
+# those files (through the cache), so crawler traffic never touches the
+# database. Until the first build they fall back to Django's dynamic sitemap.
+
+SITEMAP_INDEX_NAME = "sitemap.xml"
+
+URLSET_HEADER = b'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_FOOTER = b"</urlset>\n"
+
+
+def sitemap_location():
+    return getattr(settings, "SITEMAP_LOCATION", "sitemaps/")
+
+
+def site_url():
+    return f"{settings.CANONICAL_SCHEME}://{settings.CANONICAL_HOST}"
+
+
+def shard_name(section, page):
+    return f"sitemap-{section}-{page}.xml.gz"
+
+
+def _url_entry(loc, lastmod=None, changefreq=None, priority=None):
+    parts = [f"<url><loc>{escape(loc)}</loc>"]
+    if lastmod:
+        parts.append(f"<lastmod>{lastmod:%Y-%m-%d}</lastmod>")
+    if changefreq:
+        parts.append(f"<changefreq>{changefreq}</changefreq>")
+    if priority is not None:
+        parts.append(f"<priority>{priority}</priority>")
+    parts.append("</url>\n")
+    return "".join(parts).encode()
+
+
+def product_entries(base_url):
+    """Stream sitemap entries for active products without loading them all."""
+    # Reverse once and substitute slugs; reversing per row dominates otherwise.
+    placeholder = "__slug__"
+    pattern = base_url + reverse("catalog:detail", args=[placeholder])
+    rows = (
+        Product.objects.filter(is_active=True)
+        .order_by("pk")
+        .values_list("slug", "updated_at")
+        .iterator(chunk_size=2000)
+    )
+    for slug, updated_at in rows:
+        yield _url_entry(
+            pattern.replace(placeholder, slug),
+            updated_at,
+            ProductSitemap.changefreq,
+            ProductSitemap.priority,
+        )
+
+
+def sitemap_entries(sitemap, base_url):
+    """Entries for the small, non-product sitemaps."""
+    for item in sitemap.items():
+        lastmod = sitemap.lastmod(item) if hasattr(sitemap, "lastmod") else None
+        yield _url_entry(base_url + sitemap.location(item), lastmod, sitemap.changefreq, sitemap.priority)
+
+
+def _write_shard(storage, name, entries):
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as buffer:
+        with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as archive:
+            archive.write(URLSET_HEADER)
+            for entry in entries:
+                archive.write(entry)
+            archive.write(URLSET_FOOTER)
+        buffer.seek(0)
+        path = sitemap_location() + name
+        if storage.exists(path):
+            storage.delete(path)
+        storage.save(path, File(buffer, name=name))
+
+
+def write_sitemaps(storage=None, base_url=None, shard_size=None):
+    """
+    Build every sitemap shard and the index. Returns ``{section: shard count}``.
+    The index is written last, so it never points at shards that do not exist.
+    """
+    storage = storage or default_storage
+    base_url = base_url or site_url()
+    shard_size = shard_size or getattr(settings, "SITEMAP_SHARD_SIZE", 10_000)
+    location = sitemap_location()
+    sources = {
+        "products": product_entries(base_url),
+        "categories": sitemap_entries(CategorySitemap(), base_url),
+        "static": sitemap_entries(StaticViewSitemap(), base_url),
+    }
+
+    written = []
+    counts = {}
+    for section, entries in sources.items():
+        page = 0
+        while True:
+            shard = list(islice(entries, shard_size))
+            if not shard and page:
+                break
+            page += 1
+            name = shard_name(section, page)
+            _write_shard(storage, name, shard)
+            written.append(name)
+            if len(shard) < shard_size:
+                break
+        counts[section] = page
+
+    now = timezone.now()
+    index = [b'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for name in written:
+        loc = base_url + reverse("sitemap_shard", args=[name])
+        index.append(f"<sitemap><loc>{escape(loc)}</loc><lastmod>{now:%Y-%m-%d}</lastmod></sitemap>\n".encode())
+    index.append(b"</sitemapindex>\n")
+    index_path = location + SITEMAP_INDEX_NAME
+    if storage.exists(index_path):
+        storage.delete(index_path)
+    storage.save(index_path, ContentFile(b"".join(index)))
+
+    # Only now that the index no longer lists them, drop shards left over
+    # from a previous, larger build. List the prefix directly: exists() is
+    # always False for an S3 "directory".
+    try:
+        _dirs, files = storage.listdir(location)
+    except FileNotFoundError:
+        files = []
+    stale = [name for name in files if name.startswith("sitemap-") and name not in written]
+    for name in stale:
+        storage.delete(location + name)
+
+    cache.delete_many([f"sitemap:{name}" for name in [SITEMAP_INDEX_NAME, *written, *stale]])
+    return counts
+
+
+def _read_prebuilt(name):
+    """Return a prebuilt sitemap file's bytes, or None if it was never built."""
+    key = f"sitemap:{name}"
+    content = cache.get(key)
+    if content is None:
+        path = sitemap_location() + name
+        if not default_storage.exists(path):
+            return None
+        with default_storage.open(path) as prebuilt:
+            content = prebuilt.read()
+        cache.set(key, content, getattr(settings, "SITEMAP_CACHE_TIMEOUT", 60 * 60))
+    return content
+
+
+def sitemap_index(request, sitemaps):
+    """Serve the prebuilt sitemap index, or render it dynamically if not built yet."""
+    content = _read_prebuilt(SITEMAP_INDEX_NAME)
+    if content is None:
+        return sitemap(request, sitemaps)
+    return HttpResponse(content, content_type="application/xml")
+
+
+def sitemap_shard(request, name):
+    """Serve one prebuilt, gzip-compressed sitemap shard."""
+    content = _read_prebuilt(name)
+    if content is None:
+        raise Http404
+    return HttpResponse(content, content_type="application/gzip")
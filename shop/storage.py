@@ -0,0 +1,106 @@
+import mimetypes
+import os
+from fnmatch import fnmatch
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from storages.backends.s3boto3 import S3ManifestStaticStorage
+
+from shop.compression import available_encodings, compress
+# Referenced by catalog migration 0002, from before it moved to shop.uploads
+from shop.uploads import ContentHashedUploadTo  # noqa: F401
+
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class PrecompressedStaticMixin:
+    """
+    After collectstatic's manifest pass, write ``.br`` and ``.gz`` copies of
+    the hashed files matching STATIC_PRECOMPRESS_PATTERNS next to them, for
+    a CDN or edge rule to pick from based on Accept-Encoding.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        patterns = getattr(settings, "STATIC_PRECOMPRESS_PATTERNS", [])
+        for name in paths:
+            if not any(fnmatch(name, pattern) for pattern in patterns):
+                continue
+            hashed_name = self.stored_name(name)
+            with self.open(hashed_name) as original:
+                content = original.read()
+            for encoding in available_encodings():
+                compressed_name = hashed_name + PRECOMPRESSED_SUFFIXES[encoding]
+                if self.exists(compressed_name):
+                    self.delete(compressed_name)
+                self._save(compressed_name, ContentFile(compress(content, encoding)))
+                yield name, compressed_name, True
+
+
+class LazyManifestMixin:
+    """
+    Read the manifest the first time a hashed name is needed instead of when
+    the storage is created, so importing code that holds the storage (or
+    running ``manage.py check``) doesn't reach S3.
+    """
+
+    _loading_deferred = False
+
+    def __init__(self, *args, **kwargs):
+        self._hashed_files = self._manifest_hash = None
+        self._loading_deferred = True
+        try:
+            super().__init__(*args, **kwargs)
+        finally:
+            self._loading_deferred = False
+
+    def load_manifest(self):
+        if self._loading_deferred:
+            return None, None
+        return super().load_manifest()
+
+    def _load(self):
+        if self._hashed_files is None:
+            self._hashed_files, self._manifest_hash = self.load_manifest()
+
+    @property
+    def hashed_files(self):
+        self._load()
+        return self._hashed_files
+
+    @hashed_files.setter
+    def hashed_files(self, value):
+        self._hashed_files = value
+
+    @property
+    def manifest_hash(self):
+        self._load()
+        return self._manifest_hash
+
+    @manifest_hash.setter
+    def manifest_hash(self, value):
+        self._manifest_hash = value
+
+
+class StaticStorage(LazyManifestMixin, PrecompressedStaticMixin, S3ManifestStaticStorage):
+    """
+    S3 static storage that writes content-hashed copies of every file
+    (``css/styles.<hash>.css``) plus a manifest, so the files can be served
+    with an immutable Cache-Control header and busted by name.
+    """
+
+    # Templates reference a few files that are not shipped (site.webmanifest);
+    # fall back to the unhashed name instead of raising at render time.
+    manifest_strict = False
+
+    def get_object_parameters(self, name):
+        """Label precompressed copies with the original's type and their encoding."""
+        params = super().get_object_parameters(name)
+        base, suffix = os.path.splitext(name)
+        for encoding, encoded_suffix in PRECOMPRESSED_SUFFIXES.items():
+            if suffix == encoded_suffix:
+                params["ContentEncoding"] = encoding
+                params["ContentType"] = mimetypes.guess_type(base)[0] or "application/octet-stream"
+        return params
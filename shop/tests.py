@@ -0,0 +1,570 @@
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Category, Product, ProductImage
+from orders.cart import Cart
+from shop.sitemaps import write_sitemaps
+from shop import middleware as shop_middleware
+from shop.compression import negotiate_encoding
+from shop.instrumentation import InstrumentationMiddleware, InstrumentedLocMemCache, collect_metrics, timed
+from shop.middleware import CanonicalHostMiddleware, CompressionMiddleware, SecurityHeadersMiddleware, build_policy
+from shop.querybudget import QueryBudgetExceeded, QueryBudgetMiddleware, QueryBudgetTestMixin, query_budget, record_queries
+from shop.storage import LazyManifestMixin, PrecompressedStaticMixin
+from shop.uploads import ContentHashedUploadTo
+
+
+@override_settings(
+    CONTENT_SECURITY_POLICY={"default-src": ["'self'"], "script-src": ["'self'", "https://cdn.example.com"]},
+    CONTENT_SECURITY_POLICY_REPORT_ONLY={"frame-src": ["https://accounts.google.com/gsi/"]},
+    PERMISSIONS_POLICY={"geolocation": [], "camera": ["self"]},
+    SECURITY_HEADERS={"X-XSS-Protection": "1; mode=block"},
+)
+class SecurityHeadersMiddlewareTest(SimpleTestCase):
+    """Test the consolidated, precompiled security headers."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_build_policy(self):
+        """Directives are joined in order and terminated with a semicolon."""
+        policy = build_policy({"default-src": ["'self'"], "upgrade-insecure-requests": []})
+        self.assertEqual(policy, "default-src 'self'; upgrade-insecure-requests;")
+
+    def test_headers_applied(self):
+        """Every configured header is set on the response."""
+        middleware = SecurityHeadersMiddleware(lambda request: HttpResponse("ok"))
+        response = middleware(self.factory.get("/"))
+        self.assertEqual(
+            response["Content-Security-Policy"],
+            "default-src 'self'; script-src 'self' https://cdn.example.com;",
+        )
+        self.assertEqual(response["Content-Security-Policy-Report-Only"], "frame-src https://accounts.google.com/gsi/;")
+        self.assertEqual(response["Permissions-Policy"], "geolocation=(), camera=(self)")
+        self.assertEqual(response["X-XSS-Protection"], "1; mode=block")
+
+    def test_headers_are_compiled_once(self):
+        """The policies are built when the middleware loads, not per response."""
+        with mock.patch.object(shop_middleware, "build_policy", wraps=shop_middleware.build_policy) as build:
+            middleware = SecurityHeadersMiddleware(lambda request: HttpResponse("ok"))
+            built = build.call_count
+            middleware(self.factory.get("/"))
+            middleware(self.factory.get("/"))
+        self.assertEqual(build.call_count, built)
+
+    def test_nonce_only_added_when_used(self):
+        """The policy only carries a nonce when the response rendered one."""
+        template = engines["django"].from_string('<script nonce="{{ request.csp_nonce }}"></script>')
+
+        plain = SecurityHeadersMiddleware(lambda request: HttpResponse("ok"))(self.factory.get("/"))
+        self.assertNotIn("nonce-", plain["Content-Security-Policy"])
+
+        middleware = SecurityHeadersMiddleware(
+            lambda request: HttpResponse(template.render({"request": request}))
+        )
+        request = self.factory.get("/")
+        response = middleware(request)
+        nonce = request.csp_nonce.value
+        self.assertContains(response, f'nonce="{nonce}"')
+        self.assertIn(f"script-src 'self' https://cdn.example.com 'nonce-{nonce}';", response["Content-Security-Policy"])
+
+    def test_no_nonce_next_to_unsafe_inline(self):
+        """A nonce would switch off 'unsafe-inline', so it is left out of those directives."""
+        self.assertEqual(
+            build_policy({"script-src": ["'self'", "'unsafe-inline'"], "style-src": ["'self'"]}, nonce="abc"),
+            "script-src 'self' 'unsafe-inline'; style-src 'self';",
+        )
+        csp = {"script-src": ["'self'", "'unsafe-inline'"]}
+        template = engines["django"].from_string('<script nonce="{{ request.csp_nonce }}"></script>')
+        with override_settings(CONTENT_SECURITY_POLICY=csp):
+            middleware = SecurityHeadersMiddleware(lambda request: HttpResponse(template.render({"request": request})))
+        response = middleware(self.factory.get("/"))
+        self.assertEqual(response["Content-Security-Policy"], "script-src 'self' 'unsafe-inline';")
+
+    def test_base_template_renders_request_nonce(self):
+        """The site's nonced scripts carry the request's nonce."""
+        request = self.factory.get("/")
+        request.user = AnonymousUser()
+        request.session = {}
+        request.csp_nonce = shop_middleware.CSPNonce()
+        html = render_to_string("base.html", request=request)
+        self.assertIn(f'<script nonce="{request.csp_nonce}">', html)
+        self.assertNotIn('nonce=""', html)
+        self.assertNotIn("</script nonce", html)
+
+
+@override_settings(
+    ALLOWED_HOSTS=["www.jagoftrade.com", "jagoftrade.com", "testserver"],
+    CANONICAL_HOST="www.jagoftrade.com",
+    CANONICAL_SCHEME="https",
+    CANONICAL_HOST_ALIASES=["jagoftrade.com"],
+    SECURE_PROXY_SSL_HEADER=None,
+)
+class CanonicalHostMiddlewareTest(SimpleTestCase):
+    """Test the single-hop scheme/host/slash redirect."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = CanonicalHostMiddleware(lambda request: HttpResponse("ok"))
+
+    def test_bare_http_host_redirects_once(self):
+        """http://jagoftrade.com goes straight to https://www.jagoftrade.com."""
+        request = self.factory.get("/catalog/?page=2", HTTP_HOST="jagoftrade.com")
+        response = self.middleware(request)
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response["Location"], "https://www.jagoftrade.com/catalog/?page=2")
+
+    def test_missing_slash_folded_into_redirect(self):
+        """APPEND_SLASH is applied in the same redirect."""
+        request = self.factory.get("/policies/about", HTTP_HOST="jagoftrade.com")
+        response = self.middleware(request)
+        self.assertEqual(response["Location"], "https://www.jagoftrade.com/policies/about/")
+
+    def test_insecure_canonical_host_redirects(self):
+        """The canonical host over plain HTTP is upgraded to HTTPS."""
+        request = self.factory.get("/", HTTP_HOST="www.jagoftrade.com")
+        response = self.middleware(request)
+        self.assertEqual(response["Location"], "https://www.jagoftrade.com/")
+
+    def test_canonical_request_passes_through(self):
+        """Already canonical requests reach the view."""
+        request = self.factory.get("/", HTTP_HOST="www.jagoftrade.com", secure=True)
+        self.assertEqual(self.middleware(request).status_code, 200)
+
+    def test_other_hosts_pass_through(self):
+        """Development and test hosts are never redirected."""
+        request = self.factory.get("/")
+        self.assertEqual(self.middleware(request).status_code, 200)
+
+
+class ContentHashedUploadToTest(SimpleTestCase):
+    """Test content-hashed upload names used for cache busting."""
+
+    def test_name_includes_content_hash(self):
+        """Identical content maps to the same name, different content does not."""
+        upload_to = ContentHashedUploadTo("product_images/")
+        first = upload_to(ProductImage(image=SimpleUploadedFile("Shoe.JPG", b"one")), "Shoe.JPG")
+        again = upload_to(ProductImage(image=SimpleUploadedFile("Shoe.JPG", b"one")), "Shoe.JPG")
+        other = upload_to(ProductImage(image=SimpleUploadedFile("Shoe.JPG", b"two")), "Shoe.JPG")
+        self.assertRegex(first, r"^product_images/Shoe\.[0-9a-f]{12}\.jpg$")
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+
+    def test_content_is_rewound(self):
+        """The upload can still be read after hashing."""
+        image = ProductImage(image=SimpleUploadedFile("a.png", b"data"))
+        ContentHashedUploadTo("product_images/")(image, "a.png")
+        self.assertEqual(image.image.file.read(), b"data")
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    """Test Brotli/gzip negotiation and compressed-body caching."""
+
+    body = b"<p>" + b"jagoftrade " * 500 + b"</p>"
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def get(self, view, accept="gzip, deflate, br"):
+        return CompressionMiddleware(view)(self.factory.get("/", HTTP_ACCEPT_ENCODING=accept))
+
+    def test_negotiate_encoding(self):
+        """Brotli is preferred, q=0 refuses an encoding."""
+        self.assertEqual(negotiate_encoding("gzip, br"), "br")
+        self.assertEqual(negotiate_encoding("gzip, br;q=0"), "gzip")
+        self.assertEqual(negotiate_encoding("identity"), None)
+        self.assertEqual(negotiate_encoding(""), None)
+
+    def test_brotli_when_accepted(self):
+        """Brotli-capable clients get a Brotli body."""
+        response = self.get(lambda request: HttpResponse(self.body))
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), self.body)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_gzip_fallback(self):
+        """Clients without Brotli support get gzip."""
+        response = self.get(lambda request: HttpResponse(self.body), accept="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_csrf_pages_padded_gzip(self):
+        """Pages that used the CSRF token get randomly padded gzip, never Brotli."""
+        def view(request):
+            request.META["CSRF_COOKIE_USED"] = True
+            return HttpResponse(self.body)
+
+        first = self.get(view)
+        second = self.get(view)
+        self.assertEqual(first["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(first.content), self.body)
+        self.assertNotEqual(first.content, second.content)
+
+    def test_small_bodies_skipped(self):
+        """Bodies under COMPRESSION_MIN_LENGTH are left alone."""
+        response = self.get(lambda request: HttpResponse(b"tiny"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, b"tiny")
+
+    def test_pages_with_etag_compressed_once(self):
+        """Compressed bytes for ETag-validated pages come from the cache."""
+        def view(request):
+            response = HttpResponse(self.body)
+            response["ETag"] = '"abc"'
+            return response
+
+        with mock.patch.object(shop_middleware, "compress", wraps=shop_middleware.compress) as compress:
+            first = self.get(view)
+            second = self.get(view)
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second["ETag"], 'W/"abc"')
+
+    def test_cache_keyed_on_query_string_and_viewer(self):
+        """Another page or another visitor with the same ETag gets its own body."""
+        def view(request):
+            response = HttpResponse(b"<p>" + request.get_full_path().encode() * 200 + b"</p>")
+            response["ETag"] = '"listing"'
+            return response
+
+        middleware = CompressionMiddleware(view)
+        page1 = middleware(self.factory.get("/catalog/", HTTP_ACCEPT_ENCODING="gzip"))
+        page3 = middleware(self.factory.get("/catalog/?page=3", HTTP_ACCEPT_ENCODING="gzip"))
+        self.assertIn(b"page=3", gzip.decompress(page3.content))
+        self.assertNotEqual(page1.content, page3.content)
+
+        other = self.factory.get("/catalog/", HTTP_ACCEPT_ENCODING="gzip")
+        other.COOKIES[settings.CSRF_COOKIE_NAME] = "other-visitor"
+        with mock.patch.object(shop_middleware, "compress", wraps=shop_middleware.compress) as compress:
+            middleware(other)
+        compress.assert_called_once()
+
+    def test_nonced_bodies_not_cached(self):
+        """A body whose scripts carry this response's CSP nonce is not reused."""
+        def view(request):
+            response = HttpResponse(self.body)
+            response["ETag"] = '"abc"'
+            response["Content-Security-Policy"] = "script-src 'self' 'nonce-xyz';"
+            return response
+
+        with mock.patch.object(shop_middleware, "compress", wraps=shop_middleware.compress) as compress:
+            self.get(view)
+            self.get(view)
+        self.assertEqual(compress.call_count, 2)
+
+    def test_fresh_csrf_token_not_cached(self):
+        """A body with a CSRF token minted for a first-time visitor is not cached."""
+        def view(request):
+            request.META["CSRF_COOKIE_NEEDS_UPDATE"] = True
+            response = HttpResponse(self.body)
+            response["ETag"] = '"abc"'
+            return response
+
+        with mock.patch.object(shop_middleware, "compress", wraps=shop_middleware.compress) as compress:
+            self.get(view)
+            self.get(view)
+        self.assertEqual(compress.call_count, 2)
+
+
+class PrecompressedStaticTest(SimpleTestCase):
+    """Test the .br/.gz copies written during collectstatic."""
+
+    def test_post_process_writes_compressed_copies(self):
+        """Matching hashed files get Brotli and gzip siblings."""
+        with tempfile.TemporaryDirectory() as root:
+            css = Path(root, "css")
+            css.mkdir()
+            css.joinpath("styles.css").write_text("body { color: red; }" * 50)
+
+            class LocalStorage(PrecompressedStaticMixin, ManifestStaticFilesStorage):
+                pass
+
+            storage = LocalStorage(location=root, base_url="/static/")
+            with override_settings(STATIC_PRECOMPRESS_PATTERNS=["css/*.css"]):
+                processed = list(storage.post_process({"css/styles.css": (storage, "css/styles.css")}))
+
+            hashed = storage.stored_name("css/styles.css")
+            self.assertIn(("css/styles.css", hashed + ".gz", True), processed)
+            with storage.open(hashed + ".br") as compressed, storage.open(hashed) as original:
+                self.assertEqual(brotli.decompress(compressed.read()), original.read())
+
+    def test_manifest_read_on_first_use(self):
+        """Creating the storage doesn't read the manifest; the first URL does."""
+        with tempfile.TemporaryDirectory() as root:
+            Path(root, "staticfiles.json").write_text('{"version": "1.1", "paths": {"a.css": "a.123.css"}, "hash": "h"}')
+
+            class LazyStorage(LazyManifestMixin, ManifestStaticFilesStorage):
+                pass
+
+            with mock.patch.object(ManifestStaticFilesStorage, "read_manifest", autospec=True,
+                                   side_effect=ManifestStaticFilesStorage.read_manifest) as read:
+                storage = LazyStorage(location=root, base_url="/static/")
+                read.assert_not_called()
+                self.assertEqual(storage.url("a.css"), "/static/a.123.css")
+                self.assertEqual(storage.url("a.css"), "/static/a.123.css")
+            self.assertEqual(read.call_count, 1)
+
+    def test_favicon_resolved_per_request(self):
+        response = self.client.get("/favicon.ico/")
+        self.assertRedirects(response, "/static/img/jagoftrade.png", fetch_redirect_response=False)
+
+
+@override_settings(CANONICAL_SCHEME="https", CANONICAL_HOST="www.jagoftrade.com")
+class PrebuiltSitemapTest(TestCase):
+    """Test the sharded sitemap build and the views serving it."""
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        storages = {
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": media.name}},
+        }
+        storage_override = override_settings(STORAGES=storages)
+        storage_override.enable()
+        self.addCleanup(storage_override.disable)
+
+        category = Category.objects.create(name="Games", slug="games")
+        for number in range(5):
+            Product.objects.create(category=category, title=f"Game {number}", slug=f"game-{number}", price=10)
+        Product.objects.create(category=category, title="Hidden", slug="hidden", price=10, is_active=False)
+
+    def test_products_are_sharded(self):
+        """Products are split into gzip shards listed in the index."""
+        counts = write_sitemaps(shard_size=2)
+        self.assertEqual(counts["products"], 3)
+
+        index = self.client.get(reverse("django_sitemap"))
+        self.assertEqual(index.status_code, 200)
+        self.assertContains(index, "https://www.jagoftrade.com/sitemap-products-3.xml.gz")
+
+        shard = self.client.get("/sitemap-products-1.xml.gz")
+        self.assertEqual(shard["Content-Type"], "application/gzip")
+        xml = gzip.decompress(shard.content).decode()
+        self.assertIn("<loc>https://www.jagoftrade.com/catalog/game-0/</loc>", xml)
+        self.assertEqual(xml.count("<url>"), 2)
+
+    def test_inactive_products_excluded(self):
+        """Only active products are listed."""
+        write_sitemaps(shard_size=100)
+        xml = gzip.decompress(self.client.get("/sitemap-products-1.xml.gz").content).decode()
+        self.assertNotIn("hidden", xml)
+
+    def test_prebuilt_files_served_without_queries(self):
+        """Once built and cached, crawler requests do no database work."""
+        write_sitemaps(shard_size=100)
+        self.client.get(reverse("django_sitemap"))
+        self.client.get("/sitemap-products-1.xml.gz")
+        with self.assertNumQueries(0):
+            self.client.get(reverse("django_sitemap"))
+            self.client.get("/sitemap-products-1.xml.gz")
+
+    def test_stale_shards_removed(self):
+        """A smaller rebuild deletes the shards it no longer needs."""
+        write_sitemaps(shard_size=2)
+        self.assertEqual(self.client.get("/sitemap-products-3.xml.gz").status_code, 200)
+        write_sitemaps(shard_size=100)
+        # The deleted shard is not served from the cache either
+        self.assertEqual(self.client.get("/sitemap-products-3.xml.gz").status_code, 404)
+
+    def test_stale_shards_removed_after_index(self):
+        """The old index is replaced before the shards it lists are deleted."""
+        write_sitemaps(shard_size=2)
+        calls = []
+        storage = default_storage._wrapped
+        save, delete = storage.save, storage.delete
+        with mock.patch.object(storage, "save", lambda name, *args, **kwargs: calls.append(("save", name)) or save(name, *args, **kwargs)), \
+                mock.patch.object(storage, "delete", lambda name: calls.append(("delete", name)) or delete(name)):
+            write_sitemaps(shard_size=100)
+        index_saved = calls.index(("save", "sitemaps/sitemap.xml"))
+        self.assertGreater(calls.index(("delete", "sitemaps/sitemap-products-3.xml.gz")), index_saved)
+
+    def test_stale_shards_removed_without_directory_exists(self):
+        """Cleanup lists the prefix, as S3 never reports a "directory" as existing."""
+        write_sitemaps(shard_size=2)
+        exists = FileSystemStorage.exists
+        with mock.patch.object(FileSystemStorage, "exists", lambda storage, name: not name.endswith("/") and exists(storage, name)):
+            write_sitemaps(shard_size=100)
+        self.assertFalse(default_storage.exists("sitemaps/sitemap-products-3.xml.gz"))
+
+    @override_settings(SITEMAP_LOCATION="crawl/")
+    def test_settings_read_at_call_time(self):
+        write_sitemaps(shard_size=100)
+        self.assertTrue(default_storage.exists("crawl/sitemap.xml"))
+        self.assertEqual(self.client.get("/sitemap-products-1.xml.gz").status_code, 200)
+
+    def test_falls_back_to_dynamic_sitemap(self):
+        """Before the first build the index is rendered by Django."""
+        response = self.client.get(reverse("django_sitemap"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "/catalog/game-0/")
+
+
+@override_settings(QUERY_BUDGET_REPEAT_THRESHOLD=3)
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """Test the query budget and N+1 detection."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Tools", slug="tools")
+        self.products = [
+            Product.objects.create(category=self.category, title=f"Tool {i}", slug=f"tool-{i}", price=1) for i in range(4)
+        ]
+
+    def n_plus_one(self):
+        for product in Product.objects.all():
+            product.category.name
+
+    def test_repeated_shapes(self):
+        """One query per row is reported; IN lists of any length share a shape."""
+        with record_queries() as recorder:
+            self.n_plus_one()
+            for n in range(1, 4):
+                list(Product.objects.filter(pk__in=[p.pk for p in self.products[:n]]))
+        repeated = dict(recorder.repeated())
+        self.assertEqual(len(repeated), 2)
+        self.assertIn(4, repeated.values())
+        self.assertTrue(any("IN (...)" in shape for shape in repeated))
+
+    def test_mixin_fails_on_n_plus_one(self):
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget():
+                self.n_plus_one()
+        with self.assertQueryBudget(1):
+            list(Product.objects.select_related("category"))
+
+    def middleware(self, view):
+        def get_response(request):
+            # What the handler does between the middleware's call and the view
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryBudgetMiddleware(get_response)
+        return middleware, RequestFactory().get("/tools/")
+
+    def test_middleware(self):
+        """Requests over their view's budget are logged, or raise when configured."""
+        @query_budget(2)
+        def view(request):
+            self.n_plus_one()
+            return HttpResponse()
+
+        middleware, request = self.middleware(view)
+        with self.assertLogs("shop.querybudget", "WARNING") as logs:
+            middleware(request)
+        self.assertIn("5 queries, budget is 2", logs.output[0])
+        with override_settings(QUERY_BUDGET_RAISE=True), self.assertRaises(QueryBudgetExceeded):
+            middleware(request)
+
+    def test_cart_fetches_products_once(self):
+        request = RequestFactory().get("/")
+        request.session = {"cart": {str(p.pk): {"quantity": 1, "price": "1.00", "title": p.title} for p in self.products}}
+        cart = Cart(request)
+        with self.assertNumQueries(1):
+            list(cart.items())
+            cart.totals()
+
+
+@override_settings(SERVER_TIMING=True, REQUEST_LOG_SAMPLE_RATE=0, REQUEST_LOG_SLOW_MS=60_000)
+class InstrumentationTest(TestCase):
+    """Test the per-request metrics, Server-Timing header and request log."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Tools", slug="tools")
+        self.cache = InstrumentedLocMemCache("instrumentation-test", {})
+        self.cache.set("hit", 1)
+
+    def view(self, request):
+        list(Category.objects.all())
+        list(Product.objects.all())
+        self.cache.get("hit")
+        self.cache.get("miss")
+        self.cache.get_many(["hit", "miss"])
+        with timed("http"):
+            pass
+        html = engines["django"].from_string("{% for c in categories %}{{ c.name }}{% endfor %}").render(
+            {"categories": Category.objects.all()},
+        )
+        return HttpResponse(html, status=int(request.GET.get("status", 200)))
+
+    def test_metrics(self):
+        """Queries run while rendering count as both db and template time."""
+        with collect_metrics() as metrics:
+            self.view(RequestFactory().get("/"))
+        data = metrics.as_dict()
+        self.assertEqual(data["db_queries"], 3)
+        self.assertEqual((data["cache_hits"], data["cache_misses"]), (2, 2))
+        self.assertEqual(data["cache_hit_rate"], 0.5)
+        self.assertGreater(metrics.seconds["template"], 0)
+        self.assertEqual(metrics.counts["http"], 1)
+
+    def test_outside_request(self):
+        """Timers and cache counting do nothing without a request."""
+        with timed("db"):
+            self.assertEqual(self.cache.get("miss", "default"), "default")
+
+    def test_server_timing_header(self):
+        response = InstrumentationMiddleware(self.view)(RequestFactory().get("/"))
+        header = response["Server-Timing"]
+        self.assertIn('db;dur=', header)
+        self.assertIn('desc="3 queries"', header)
+        self.assertIn('cache;dur=', header)
+        self.assertIn('desc="hit 50%"', header)
+        self.assertIn("tpl;dur=", header)
+        self.assertIn("total;dur=", header)
+        self.assertNotIn("smtp", header)
+        with override_settings(SERVER_TIMING=False):
+            response = InstrumentationMiddleware(self.view)(RequestFactory().get("/"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_request_log_sampling(self):
+        """Errors are always logged; other requests by sample rate or when slow."""
+        middleware = InstrumentationMiddleware(self.view)
+        with self.assertNoLogs("shop.requests"):
+            middleware(RequestFactory().get("/"))
+        with self.assertLogs("shop.requests", "INFO") as logs:
+            middleware(RequestFactory().get("/", {"status": 500}))
+            with override_settings(REQUEST_LOG_SAMPLE_RATE=1):
+                middleware(RequestFactory().get("/"))
+            with override_settings(REQUEST_LOG_SLOW_MS=0):
+                middleware(RequestFactory().get("/"))
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual([r["status"] for r in records], [500, 200, 200])
+        self.assertEqual(records[0]["db_queries"], 3)
+        self.assertEqual(records[0]["cache_hit_rate"], 0.5)
+        self.assertEqual(records[0]["method"], "GET")
+
+    def test_site_response(self):
+        """Session load and save are timed on their own."""
+        session = self.client.session
+        session["seen"] = True
+        session.save()
+        response = self.client.get(reverse("core:home"))
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertIn("sess;dur=", response["Server-Timing"])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_staff_only_by_default(self):
+        """Backend timings are only shown to staff unless SERVER_TIMING is on."""
+        url = reverse("core:home")
+        self.assertFalse(self.client.get(url).has_header("Server-Timing"))
+        user = get_user_model().objects.create_user("staff", "staff@example.com", "pw", is_staff=True)
+        self.client.force_login(user)
+        self.assertTrue(self.client.get(url).has_header("Server-Timing"))
@@ -0,0 +1,51 @@
+"""
+Upload naming for media files. Kept apart from shop.storage so models can
+import it without loading boto3 at startup.
+"""
+import hashlib
+import os
+
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentHashedUploadTo:
+    """
+    ``upload_to`` callable that appends a hash of the uploaded content to the
+    file name (``product_images/shoe.3f2a9c1b7d4e.jpg``).
+
+    django-pictures derives rendition names from the original's name, so the
+    avif/webp/jpeg variants get the same hash and can be cached forever too.
+    """
+
+    hash_length = 12
+
+    def __init__(self, prefix, field_name="image"):
+        self.prefix = prefix
+        self.field_name = field_name
+
+    def __call__(self, instance, filename):
+        content = getattr(instance, self.field_name).file
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return self.name_for(filename, digest.hexdigest())
+
+    def name_for(self, filename, hexdigest):
+        """The stored name for ``filename`` whose content has the given sha256."""
+        stem, ext = os.path.splitext(os.path.basename(filename))
+        return f"{self.prefix}{stem}.{hexdigest[:self.hash_length]}{ext.lower()}"
+
+    def digest_from_name(self, name):
+        """The (truncated) content hash embedded in a stored name, or None."""
+        parts = os.path.basename(name).split(".")
+        if len(parts) >= 3 and len(parts[-2]) == self.hash_length:
+            return parts[-2]
+        return None
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ContentHashedUploadTo)
+            and (self.prefix, self.field_name) == (other.prefix, other.field_name)
+        )
@@ -15,16 +15,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.shortcuts import render
+from django.shortcuts import redirect, render
 from django.conf.urls import handler404, handler500, handler403
 from django.contrib.staticfiles.storage import staticfiles_storage
-from django.views.generic.base import RedirectView
-from django.views.generic import TemplateView
-from django.contrib.sitemaps.views import sitemap
-from shop.sitemaps import ProductSitemap, CategorySitemap, StaticViewSitemap
+from shop.sitemaps import ProductSitemap, CategorySitemap, StaticViewSitemap, sitemap_index, sitemap_shard
+from policies.prerender import serve_prerendered
+from catalog.api import router as catalog_api_router
+from policies.views import text_file
 
 admin.site.site_header = "JagofTrade Administration"
 admin.site.site_title = "JagofTrade Portal"
@@ -37,13 +37,19 @@ sitemaps_dict = {
 }
 
 def custom_permission_denied(request, exception):
-    return render(request, "errors/403.html", status=403)
+    return serve_prerendered(request, "errors/403.html", status=403) or render(request, "errors/403.html", status=403)
 
 def custom_page_not_found(request, exception):
-    return render(request, "errors/404.html", status=404)
+    return serve_prerendered(request, "errors/404.html", status=404) or render(request, "errors/404.html", status=404)
 
 def custom_server_error(request):
-    return render(request, "errors/500.html", status=500)
+    # Always use the prerendered copy when there is one: whatever broke the
+    # request (database, session store) may also break a live render.
+    return serve_prerendered(request, "errors/500.html", status=500, any_viewer=True) or render(request, "errors/500.html", status=500)
+
+def favicon(request):
+    # Resolved per request, so loading the URLconf doesn't set up the storage
+    return redirect(staticfiles_storage.url('img/jagoftrade.png'))
 
 handler403 = custom_permission_denied
 handler404 = custom_page_not_found
@@ -64,14 +70,18 @@ urlpatterns = [
     path('accounts/', include(('accounts.urls', 'accounts'), namespace="accounts")),
     path('auth-accounts/', include('allauth.urls')),
 
+    # Versioned read-only API
+    path('api/v1/', include((catalog_api_router.urls, 'api'), namespace='v1')),
+
     # Favicon
-    path('favicon.ico/', RedirectView.as_view(url=staticfiles_storage.url('img/jagoftrade.png'))),
+    path('favicon.ico/', favicon),
 
     # Sitemap
-    path('sitemap.xml/', sitemap, {"sitemaps": sitemaps_dict}, name="django_sitemap"),
+    path('sitemap.xml/', sitemap_index, {"sitemaps": sitemaps_dict}, name="django_sitemap"),
+    re_path(r'^(?P<name>sitemap-[a-z]+-\d+\.xml\.gz)$', sitemap_shard, name="sitemap_shard"),
     
-    path("ads.txt/", TemplateView.as_view(template_name="ads.txt", content_type="text/plain")),
-    path("limit.txt/", TemplateView.as_view(template_name="limit.txt", content_type="text/plain")),
+    path("ads.txt/", text_file, {"template_name": "ads.txt"}),
+    path("limit.txt/", text_file, {"template_name": "limit.txt"}),
 
     
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)